@@ -0,0 +1,114 @@
+import argparse
+import json
+import math
+import sys
+import time
+from enum import Enum
+from typing import Dict, List, Optional
+
+from basic.budget import Budget, SearchLimit
+from basic.cell import CellData, CellDirection, _cell_mask
+from basic.components import components
+
+# score (bits of run combinations left) from which a puzzle is worth a dedicated worker, about 100ms of search on the corpus
+HARD_SCORE = 256.0
+
+
+class Difficulty(Enum):
+    TRIVIAL = 1  # the propagation alone solves or refutes it
+    EASY = 2
+    HARD = 3
+
+
+class Analysis(object):
+    def __init__(self):
+        self.runs: List[dict] = []  # position, direction, target, length and combinations of every run, as parsed
+        self.combinations = 0  # sum of the combinations of the runs, as parsed
+        self.domains: Dict[int, int] = {}  # number of open cells per number of candidates, after the propagation
+        self.open_cells = 0
+        self.components: List[int] = []  # open cells of every independent part
+        self.score = 0.0  # log2 of the combinations the search still has to choose from, summed on the open runs
+        self.difficulty = Difficulty.TRIVIAL
+        self.unsat = False
+        self.complete = True  # False when the step budget stopped the propagation first
+        self.time = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            'difficulty': self.difficulty.name.lower(),
+            'score': round(self.score, 2),
+            'unsat': self.unsat,
+            'complete': self.complete,
+            'open_cells': self.open_cells,
+            'components': self.components,
+            'domains': {str(k): v for k, v in sorted(self.domains.items())},
+            'combinations': self.combinations,
+            'runs': self.runs,
+            'time': self.time,
+        }
+
+
+def analyze(cell_data: CellData, max_steps: Optional[int] = None) -> Analysis:
+    # propagation only, no choice is made: the CellData is left propagated and a solve can go on from it
+    if not cell_data.use_mask:
+        raise ValueError('The analysis needs a puzzle parsed with use_mask=True')
+    start_time = time.perf_counter()
+    res = Analysis()
+    res.runs = [_run_info(sub_cell) for instr in cell_data.instr for sub_cell in (instr.right, instr.down) if sub_cell]
+    res.combinations = sum(run['combinations'] for run in res.runs)
+
+    budget, cell_data.budget = cell_data.budget, Budget(max_steps=max_steps) if max_steps is not None else None
+    try:
+        cell_data.propagate_to_fixpoint()
+    except SearchLimit:
+        res.complete = False  # the runs not propagated yet stay queued for the solve
+    finally:
+        cell_data.budget = budget
+
+    if cell_data.conflict:
+        res.unsat = True  # the conflict stays set, a solve from this state reports UNSAT
+    else:
+        for part in components(cell_data):
+            res.components.append(len(part.cells))
+            res.score += sum(math.log2(len(run.possible_masks)) for run in part.runs if run.possible_masks)
+            for cell in part.cells:
+                size = _cell_mask(cell).bit_count()
+                res.domains[size] = res.domains.get(size, 0) + 1
+        res.open_cells = sum(res.components)
+    if res.open_cells or not res.complete:
+        res.difficulty = Difficulty.HARD if res.score >= HARD_SCORE else Difficulty.EASY
+    res.time = time.perf_counter() - start_time
+    return res
+
+
+def _run_info(sub_cell) -> dict:
+    return {
+        'x': sub_cell.position.x,
+        'y': sub_cell.position.y,
+        'direction': 'right' if sub_cell.direction == CellDirection.RIGHT else 'down',
+        'target': sub_cell.fixed_value,
+        'length': len(sub_cell.associated_cells),
+        'combinations': len(sub_cell.possible_masks),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from basic.batch import list_puzzles
+    from basic.parser import parser
+
+    arg_parser = argparse.ArgumentParser(description='Estimate how hard kakuro puzzles are without solving them, one JSON line per puzzle')
+    arg_parser.add_argument('puzzles', nargs='+', help='puzzle files, directories or glob patterns')
+    arg_parser.add_argument('-s', '--max-steps', type=int, default=None, help='propagation steps before giving up on a complete analysis')
+    arg_parser.add_argument('--runs', action='store_true', help='also list the combinations of every run')
+    args = arg_parser.parse_args(argv)
+
+    for filename in list_puzzles(args.puzzles):
+        res = analyze(parser(filename, True), args.max_steps).to_dict()
+        if not args.runs:
+            del res['runs']
+        sys.stdout.write(json.dumps({'file': filename, **res}) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
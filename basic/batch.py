@@ -0,0 +1,146 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from typing import List, Optional
+
+from basic.analysis import Difficulty, analyze
+from basic.budget import Budget, SearchLimit
+from basic.cache import SolutionCache, result_key
+from basic.parser import parse_lines
+from basic.solver import STOPPED, solve, count_solutions
+from basic.trace import Tracer
+
+
+def list_puzzles(patterns: List[str]) -> List[str]:
+    res = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            res.extend(glob.glob(os.path.join(pattern, '*.csv')))
+        elif glob.has_magic(pattern):
+            res.extend(glob.glob(pattern))
+        else:
+            res.append(pattern)
+    return sorted(set(res))
+
+
+def solve_file(filename: str, timeout: Optional[float] = None, metrics: bool = False, max_nodes: Optional[int] = None,
+               trace_dir: Optional[str] = None, route: bool = False, defer_hard: bool = False) -> dict:
+    # route: analysis first, the solve goes on from the propagated puzzle; defer_hard: a HARD puzzle is only analysed,
+    # the caller sends it again to the workers kept for them
+    start_time = time.time()
+    routing = {}
+    try:
+        with open(filename) as f:
+            lines = f.readlines()
+        cell_data = parse_lines(lines, True)
+        if route:
+            analysis = analyze(cell_data)
+            routing = {'difficulty': analysis.difficulty.name.lower(), 'score': round(analysis.score, 2)}
+            if defer_hard and analysis.difficulty == Difficulty.HARD:
+                return {'file': filename, **routing, 'deferred': True}
+        trace = None
+        if trace_dir:
+            # the trace keeps the puzzle, python -m basic.trace replay runs the same search again
+            trace = Tracer(lines)
+            trace.attach(cell_data)
+        res = solve(cell_data, metrics=metrics, budget=Budget(timeout, max_nodes)).to_dict()
+        if trace is not None:
+            trace.save(os.path.join(trace_dir, os.path.basename(filename) + '.ktr'))
+    except Exception as e:
+        res = {'status': f'error: {e}', 'grid': []}
+    return {'file': filename, **res, **routing, 'time': time.time() - start_time}
+
+
+def count_file(filename: str, limit: int = 2, timeout: Optional[float] = None, max_nodes: Optional[int] = None) -> dict:
+    start_time = time.time()
+    budget = Budget(timeout, max_nodes)
+    try:
+        res = count_solutions(filename, limit, budget=budget).to_dict()
+    except SearchLimit:
+        # a partial count would not mean anything, the outcome is the status a stopped solve gives
+        res = {'outcome': STOPPED[budget.exhausted].name.lower(), 'count': 0, 'solutions': [], 'budget': budget.to_dict()}
+    except Exception as e:
+        res = {'outcome': f'error: {e}', 'count': 0, 'solutions': []}
+    return {'file': filename, **res, 'time': time.time() - start_time}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(description='Solve a batch of kakuro puzzles, one JSON line per puzzle')
+    arg_parser.add_argument('puzzles', nargs='+', help='puzzle files, directories or glob patterns')
+    arg_parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    arg_parser.add_argument('-t', '--timeout', type=float, default=None, help='timeout per puzzle in seconds')
+    arg_parser.add_argument('-n', '--max-nodes', type=int, default=None, help='branches per puzzle before giving up')
+    arg_parser.add_argument('-c', '--cache', help='SQLite solution cache, known puzzles are not solved again')
+    arg_parser.add_argument('-u', '--count', type=int, default=None, metavar='LIMIT',
+                            help='count solutions up to LIMIT instead of solving (2 checks uniqueness)')
+    arg_parser.add_argument('-m', '--metrics', action='store_true', help='add per rule counters and timers to the output')
+    arg_parser.add_argument('-r', '--route', action='store_true',
+                            help='analyze first, in the workers: the hard puzzles go to the --hard-workers when there are some')
+    arg_parser.add_argument('--trace', metavar='DIR', help='write the search trace of every puzzle solved by the workers to DIR')
+    arg_parser.add_argument('--hard-workers', type=int, default=0, help='with --route, separate worker processes for the hard puzzles')
+    args = arg_parser.parse_args(argv)
+    if args.trace:
+        os.makedirs(args.trace, exist_ok=True)
+
+    filenames = list_puzzles(args.puzzles)
+    cache = SolutionCache(args.cache) if args.cache else None
+    failed = 0
+
+    def output(res: dict) -> int:
+        sys.stdout.write(json.dumps(res) + '\n')
+        sys.stdout.flush()
+        return res['outcome'] != 'unique' if args.count else res['status'] != 'solved'
+
+    try:
+        keys = {}
+        if args.count:
+            with ProcessPoolExecutor(max_workers=args.workers) as executor:
+                futures = [executor.submit(count_file, filename, args.count, args.timeout, args.max_nodes) for filename in filenames]
+                for future in as_completed(futures):
+                    failed += output(future.result())
+            return 1 if failed else 0
+
+        if cache:
+            # cached puzzles are answered from the main process, only the others go to the pool
+            for filename in list(filenames):
+                start_time = time.time()
+                with open(filename, 'rb') as f:
+                    keys[filename] = key = result_key(cache.key_for(f.read()))
+                res = cache.get(key)
+                if res is not None:
+                    failed += output({'file': filename, **res, 'cached': True, 'time': time.time() - start_time})
+                    filenames.remove(filename)
+
+        def store(res: dict):
+            if cache:
+                cache.put(keys[res['file']], {k: v for k, v in res.items() if k not in ('file', 'time', 'difficulty', 'score')})
+
+        # with --route the workers analyse the puzzles themselves, the parent only hands the hard ones over
+        defer_hard = args.route and args.hard_workers > 0
+        routes = {}
+        with ProcessPoolExecutor(max_workers=args.workers) as executor, ProcessPoolExecutor(max_workers=args.hard_workers or 1) as hard_executor:
+            pending = {executor.submit(solve_file, filename, args.timeout, args.metrics, args.max_nodes, args.trace, args.route, defer_hard)
+                       for filename in filenames}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    res = future.result()
+                    if res.pop('deferred', False):
+                        routes[res['file']] = res
+                        pending.add(hard_executor.submit(solve_file, res['file'], args.timeout, args.metrics, args.max_nodes, args.trace))
+                        continue
+                    res.update({k: v for k, v in routes.get(res['file'], {}).items() if k != 'file'})
+                    store(res)
+                    failed += output(res)
+    finally:
+        if cache:
+            cache.close()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
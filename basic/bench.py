@@ -0,0 +1,187 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import List, Optional, Dict
+
+from basic import np_engine
+from basic.batch import list_puzzles
+from basic.cell import CellData, EXTRA_RULES, NoSolution
+from basic.components import search_components
+from basic.generator import MAX_SIZE, generate
+from basic.metrics import Metrics, RULES
+from basic.parser import parser
+from basic.solver import _reduce_loop, _solve
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+def generate_puzzles(sizes: List[int], seed: int, directory: str) -> List[str]:
+    # one square grid per size, the same seed gives the same grids from one run to the next
+    filenames = []
+    for size in sizes:
+        filename = os.path.join(directory, f'generated_{size}x{size}_{seed}.csv')
+        with open(filename, 'w') as f:
+            f.write(generate(size, size, seed=seed))
+        filenames.append(filename)
+    return filenames
+
+
+def bench_puzzle(filename: str, repeat: int, metrics: bool = False, use_numpy: bool = False, rules: Optional[List[str]] = None,
+                 use_mask: bool = True) -> dict:
+    times: Dict[str, List[float]] = {'parse_time': [], 'propagate_time': [], 'search_time': []}
+    solved = False
+    cell_data = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        cell_data = _parse(filename, rules, use_mask)
+        parse_time = time.perf_counter()
+        if not use_mask:
+            consistent = _reduce_root(cell_data)
+            propagate_time = time.perf_counter()
+            solved = consistent and _solve(cell_data)
+        elif use_numpy:
+            grid = np_engine.compile_grid(cell_data)
+            candidates = grid.candidates.copy()
+            consistent = np_engine.propagate(grid, candidates)
+            propagate_time = time.perf_counter()
+            solved = consistent and np_engine.search(grid, cell_data, candidates) is not None
+        else:
+            cell_data.propagate_to_fixpoint()
+            propagate_time = time.perf_counter()
+            solved = search_components(cell_data)
+        search_time = time.perf_counter()
+        times['parse_time'].append(parse_time - start_time)
+        times['propagate_time'].append(propagate_time - parse_time)
+        times['search_time'].append(search_time - propagate_time)
+
+    tracemalloc.start()
+    try:
+        _solve(_parse(filename, rules, use_mask), use_numpy)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        # what a parsed puzzle keeps alive, the footprint of a puzzle held resident by the service
+        tracemalloc.clear_traces()
+        resident = _parse(filename, rules, use_mask)
+        resident_memory = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    nb_cells = sum(len(line) for line in resident.cell_map.values())
+
+    res = {name: min(values) for name, values in times.items()}
+    res['total_time'] = sum(res.values())
+    res.update({
+        'file': os.path.basename(filename),
+        'status': 'solved' if solved else 'unsat',
+        'nodes': cell_data.branch_count,
+        'failed_branch': cell_data.failed_branch,
+        'peak_memory': peak_memory,
+        'bytes_per_cell': resident_memory / nb_cells if nb_cells else 0.0,
+    })
+
+    if metrics:
+        # separate run, the timings above are taken without instrumentation
+        cell_data = _parse(filename, rules, use_mask)
+        cell_data.metrics = Metrics()
+        _solve(cell_data)
+        res['metrics'] = cell_data.metrics.to_dict()
+    return res
+
+
+def _parse(filename: str, rules: Optional[List[str]], use_mask: bool = True) -> CellData:
+    cell_data = parser(filename, use_mask)
+    if rules:
+        cell_data.set_rules(rules)
+    return cell_data
+
+
+def _reduce_root(cell_data: CellData) -> bool:
+    # the list engine has no worklist, its propagation is the reduce loop run until nothing changes before any branch
+    try:
+        while _reduce_loop(cell_data):
+            pass
+    except NoSolution:
+        return False
+    return True
+
+
+def compare(results: List[dict], baseline: List[dict], threshold: float, min_time: float) -> List[str]:
+    base_map = {i['file']: i for i in baseline}
+    regressions = []
+    for res in results:
+        base = base_map.get(res['file'])
+        if base is None:
+            continue
+        if res['total_time'] > base['total_time'] * (1 + threshold) and res['total_time'] - base['total_time'] > min_time:
+            regressions.append(f"{res['file']}: time {base['total_time'] * 1000:.2f}ms -> {res['total_time'] * 1000:.2f}ms")
+        if res['peak_memory'] > base['peak_memory'] * (1 + threshold):
+            regressions.append(f"{res['file']}: memory {base['peak_memory']} -> {res['peak_memory']}")
+        if 'bytes_per_cell' in base and res['bytes_per_cell'] > base['bytes_per_cell'] * (1 + threshold):
+            regressions.append(f"{res['file']}: bytes per cell {base['bytes_per_cell']:.0f} -> {res['bytes_per_cell']:.0f}")
+        if res['status'] != base['status']:
+            regressions.append(f"{res['file']}: status {base['status']} -> {res['status']}")
+    return regressions
+
+
+def print_results(results: List[dict]):
+    print(f"{'puzzle':<24} {'status':<7} {'parse':>9} {'propag.':>9} {'search':>9} {'nodes':>7} {'peak KB':>9} {'B/cell':>7}")
+    for res in results:
+        print(f"{res['file']:<24} {res['status']:<7} {res['parse_time'] * 1000:>7.2f}ms {res['propagate_time'] * 1000:>7.2f}ms "
+              f"{res['search_time'] * 1000:>7.2f}ms {res['nodes']:>7} {res['peak_memory'] / 1024:>9.1f} {res['bytes_per_cell']:>7.0f}")
+
+
+def print_metrics(results: List[dict]):
+    print(f"{'rule':<36} {'calls':>9} {'pruned':>9} {'combin.':>9} {'time':>11} {'pruned/ms':>10}")
+    for name in RULES.values():
+        rules = [res['metrics']['rules'][name] for res in results if 'metrics' in res]
+        calls, pruned, combinations, total_time = (sum(i[key] for i in rules) for key in ('calls', 'pruned', 'combinations', 'time'))
+        rate = pruned / (total_time * 1000) if total_time else 0
+        print(f"{name:<36} {calls:>9} {pruned:>9} {combinations:>9} {total_time * 1000:>9.2f}ms {rate:>10.1f}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(description='Benchmark the solver and compare with a JSON baseline')
+    arg_parser.add_argument('puzzles', nargs='*', default=[DEFAULT_CORPUS], help='puzzle files, directories or glob patterns')
+    arg_parser.add_argument('-r', '--repeat', type=int, default=5, help='runs per puzzle, the fastest one is kept')
+    arg_parser.add_argument('--sizes', type=int, nargs='*', default=[16, 30, 50],
+                            help=f'also bench a generated square grid of each size (max {MAX_SIZE})')
+    arg_parser.add_argument('--seed', type=int, default=0, help='seed of the generated grids')
+    arg_parser.add_argument('-b', '--baseline', help='JSON baseline to compare with (or to write with --save)')
+    arg_parser.add_argument('--save', action='store_true', help='write the results as the new baseline')
+    arg_parser.add_argument('--threshold', type=float, default=0.2, help='allowed relative regression')
+    arg_parser.add_argument('--rules', nargs='*', default=[], choices=list(EXTRA_RULES), help='optional propagation rules to enable')
+    arg_parser.add_argument('--numpy', action='store_true', help='bench the numpy engine instead')
+    arg_parser.add_argument('--list', action='store_true', help='bench the list engine instead')
+    arg_parser.add_argument('-m', '--metrics', action='store_true', help='also print per rule counters and timers')
+    arg_parser.add_argument('--min-time', type=float, default=0.001, help='ignore time regressions smaller than this (s)')
+    args = arg_parser.parse_args(argv)
+    if args.list and (args.numpy or args.rules):
+        arg_parser.error('--list runs neither the numpy engine nor the extra rules')
+
+    filenames = list_puzzles(args.puzzles)
+    with tempfile.TemporaryDirectory() as directory:
+        filenames += generate_puzzles(args.sizes, args.seed, directory)
+        results = [bench_puzzle(filename, args.repeat, args.metrics, args.numpy, args.rules, not args.list) for filename in filenames]
+    print_results(results)
+    if args.metrics:
+        print_metrics(results)
+
+    if not args.baseline:
+        return 0
+    if args.save or not os.path.exists(args.baseline):
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'## Baseline written to {args.baseline}')
+        return 0
+
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.threshold, args.min_time)
+    for regression in regressions:
+        print(f'## REGRESSION {regression}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
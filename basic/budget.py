@@ -0,0 +1,60 @@
+import time
+from typing import Optional
+
+CHECK_EVERY = 16  # propagation steps between two looks at the clock and the cancellation
+
+
+class SearchLimit(Exception):
+    pass
+
+
+class CancelToken(object):
+    # set from another thread or an asyncio task, the solver stops at its next check
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def is_set(self) -> bool:
+        return self.cancelled
+
+
+class Budget(object):
+    # limits of a solve, the deadline runs from the creation of the budget
+    def __init__(self, timeout: Optional[float] = None, max_nodes: Optional[int] = None, max_steps: Optional[int] = None,
+                 cancel=None):
+        self.timeout = timeout
+        self.max_nodes = max_nodes  # branches tried
+        self.max_steps = max_steps  # runs propagated, or rule sweeps without masks
+        self.cancel = cancel  # anything with is_set(): CancelToken, threading.Event, multiprocessing.Event
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+        self.nodes = 0
+        self.steps = 0
+        self.exhausted: Optional[str] = None  # 'timeout', 'nodes', 'steps' or 'cancelled' once the budget ran out
+
+    def node(self):
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            self._stop('nodes', f'Search stopped after {self.max_nodes} nodes')
+        self.nodes += 1
+        self._check()
+
+    def step(self):
+        if self.max_steps is not None and self.steps >= self.max_steps:
+            self._stop('steps', f'Search stopped after {self.max_steps} propagation steps')
+        self.steps += 1
+        if not self.steps % CHECK_EVERY:
+            self._check()
+
+    def _check(self):
+        if self.cancel is not None and self.cancel.is_set():
+            self._stop('cancelled', 'Search cancelled')
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self._stop('timeout', f'Search stopped after {self.timeout}s')
+
+    def _stop(self, reason: str, message: str):
+        self.exhausted = reason
+        raise SearchLimit(message)
+
+    def to_dict(self) -> dict:
+        return {'nodes': self.nodes, 'steps': self.steps, 'exhausted': self.exhausted}
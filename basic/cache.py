@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from basic.budget import Budget
+from basic.cell import CellData, CellType
+from basic.parser import parse_lines
+from basic.solver import solve, SolveResult, SolveStatus
+
+CACHE_PATH = os.path.join(os.path.dirname(__file__), 'solutions.db')
+CACHE_VERSION = 1
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS solution (key TEXT PRIMARY KEY, result TEXT NOT NULL, size INTEGER NOT NULL, used REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS alias (raw TEXT PRIMARY KEY, key TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS solution_used ON solution (used);
+CREATE INDEX IF NOT EXISTS alias_key ON alias (key);
+'''
+
+
+def puzzle_key(cell_data: CellData) -> str:
+    # one token per cell, blocks and uncovered cells are the same; trailing ones are dropped so that layout noise does not matter
+    rows = []
+    for x in range(1, len(cell_data.cell_map) + 1):
+        line = cell_data.cell_map[x]
+        row = [_cell_token(line[y]) for y in range(1, len(line) + 1)]
+        while row and row[-1] == '#':
+            row.pop()
+        rows.append(','.join(row))
+    while rows and not rows[-1]:
+        rows.pop()
+    return hashlib.sha256(f'{CACHE_VERSION}\n{'\n'.join(rows)}'.encode()).hexdigest()
+
+
+def result_key(key: str, use_mask: bool = True, rules: Optional[List[str]] = None) -> str:
+    # the results are kept per engine and rules: the grid picked among several solutions and the counters depend on them
+    return f"{key}/{'mask' if use_mask else 'list'}/{'+'.join(sorted(rules or []))}"
+
+
+def _cell_token(cell) -> str:
+    if cell.type == CellType.INSTRUCTION:
+        parts = ([f'd{cell.right.fixed_value}'] if cell.right else []) + ([f'b{cell.down.fixed_value}'] if cell.down else [])
+        return ';'.join(parts) or '#'
+    if cell.type == CellType.FIXED:
+        sub_cell = cell.down if cell.down else cell.right
+        return str(sub_cell.fixed_value)
+    if cell.type == CellType.TARGET:
+        return '.'
+    return '#'
+
+
+class SolutionCache(object):
+    # in-memory LRU in front of an optional SQLite store, results are kept as SolveResult.to_dict()
+    def __init__(self, path: Optional[str] = CACHE_PATH, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.memory: OrderedDict[str, dict] = OrderedDict()
+        self.aliases: OrderedDict[str, str] = OrderedDict()  # hash of the raw file -> puzzle key, saves the parsing
+        self.hits = 0
+        self.misses = 0
+        self.db: Optional[sqlite3.Connection] = None
+        if path:
+            try:
+                self.db = sqlite3.connect(path, timeout=30)
+                self.db.executescript(_SCHEMA)
+            except sqlite3.Error:
+                self.db = None  # read-only install, memory only
+
+    def key_for(self, data: bytes, use_mask: bool = True) -> str:
+        raw = hashlib.sha256(data).hexdigest()
+        key = self.aliases.get(raw)
+        if key is None and self.db is not None:
+            row = self.db.execute('SELECT key FROM alias WHERE raw = ?', (raw,)).fetchone()
+            key = row[0] if row else None
+        if key is None:
+            key = puzzle_key(parse_lines(data.decode().splitlines(), use_mask))
+            if self.db is not None:
+                with self.db:
+                    self.db.execute('INSERT OR REPLACE INTO alias (raw, key) VALUES (?, ?)', (raw, key))
+        _lru_put(self.aliases, raw, key, self.max_entries)
+        return key
+
+    def get(self, key: str) -> Optional[dict]:
+        res = self.memory.get(key)
+        if res is not None:
+            self.memory.move_to_end(key)
+        elif self.db is not None:
+            row = self.db.execute('SELECT result FROM solution WHERE key = ?', (key,)).fetchone()
+            if row:
+                res = json.loads(row[0])
+                with self.db:
+                    self.db.execute('UPDATE solution SET used = ? WHERE key = ?', (time.time(), key))
+                _lru_put(self.memory, key, res, self.max_entries)
+        if res is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return res
+
+    def put(self, key: str, res: dict):
+        if res['status'] not in (SolveStatus.SOLVED.name.lower(), SolveStatus.UNSAT.name.lower()):
+            return  # a timeout says nothing about the puzzle
+        _lru_put(self.memory, key, res, self.max_entries)
+        if self.db is None:
+            return
+        data = json.dumps(res)
+        with self.db:
+            self.db.execute('INSERT OR REPLACE INTO solution (key, result, size, used) VALUES (?, ?, ?, ?)', (key, data, len(data), time.time()))
+            self._evict()
+
+    def _evict(self):
+        total = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM solution').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self.db.execute('SELECT key, size FROM solution ORDER BY used').fetchall():
+            self.db.execute('DELETE FROM solution WHERE key = ?', (key,))
+            self.db.execute('DELETE FROM alias WHERE key = ?', (key.split('/')[0],))
+            self.memory.pop(key, None)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def solve(self, filename: str, use_mask: bool = True, timeout: Optional[float] = None, budget: Optional[Budget] = None,
+              rules: Optional[List[str]] = None) -> SolveResult:
+        with open(filename, 'rb') as f:
+            data = f.read()
+        key = result_key(self.key_for(data, use_mask), use_mask, rules)
+        res = self.get(key)
+        if res is not None:
+            return SolveResult.from_dict({**res, 'cached': True})
+        result = solve(parse_lines(data.decode().splitlines(), use_mask), use_mask, timeout, rules=rules, budget=budget)
+        self.put(key, result.to_dict())
+        return result
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+
+def _lru_put(lru: OrderedDict, key, value, max_entries: int):
+    lru[key] = value
+    lru.move_to_end(key)
+    while len(lru) > max_entries:
+        lru.popitem(last=False)
@@ -1,11 +1,26 @@
-from collections import defaultdict
+import heapq
+import itertools
+import logging
+from array import array
+from collections import defaultdict, deque
 from enum import Enum
 from functools import reduce
-from typing import Optional, List, Set, Dict
+from typing import Optional, List, Set, Dict, Tuple, Callable, Sequence
+
+from basic.budget import Budget, SearchLimit
+from basic.mask import to_mask, union_masks, mask_is_single, mask_value, mask_size, mask_lowest
+from basic.metrics import Metrics
+from basic.trace import Tracer, START, DECIDE, FIXPOINT, CONFLICT, BACKTRACK, SOLUTION, END, UNSAT, SOLVED, STOPPED
 
 activate_debug = False
 activate_map_print = False
 
+logger = logging.getLogger(__name__)
+
+
+class NoSolution(Exception):
+    pass
+
 
 class CellType(Enum):
     INSTRUCTION = 1
@@ -20,6 +35,8 @@ class CellDirection(Enum):
 
 
 class Position(object):
+    __slots__ = ('x', 'y')
+
     def __init__(self, x: int, y: int):
         self.x: int = x
         self.y: int = y
@@ -28,23 +45,42 @@ class Position(object):
         return self.x == other.x and self.y == other.y
 
 
+# flyweights: the candidates of a cell without values or of a fixed digit are shared, they are only ever replaced
+_NO_VALUES: frozenset = frozenset()
+_SINGLE_VALUES = [frozenset((value,)) for value in range(10)]
+_SINGLE_MASKS = [(to_mask([value]),) if value else () for value in range(10)]
+
+
+def _single_values(value: Optional[int]) -> Tuple[Set[int], Sequence[int]]:
+    # a run target is not a digit, its set and masks are its own
+    if value is None or value < 10:
+        return _SINGLE_VALUES[value] if value else _NO_VALUES, _SINGLE_MASKS[value or 0]
+    return frozenset((value,)), (to_mask([value]),)
+
+
 class SubCell(object):
-    def __init__(self, position: Position, value: Optional[int] = None):
+    __slots__ = ('fixed_value', 'possible_values', 'possible_values_set', 'associated_cells', 'possible_values_backup',
+                 'possible_mask', 'possible_masks', 'trail_stamp', 'reason', 'position', 'direction', 'run', 'queued')
+
+    def __init__(self, position: Position, value: Optional[int] = None, direction: Optional[CellDirection] = None,
+                 use_mask: bool = False):
         self.fixed_value = value
-        self.possible_values: List[List[int]] = [] if not value else [[value]]
-        self.possible_values_set: Set[int] = set() if not value else {value}  # to be computed each time possible_values changes
+        # the combinations are set by the parser, a fixed digit keeps its own list as the reduce rules edit them in place
+        # the mask engine never reads the lists, its cells share the empty tuple
+        self.possible_values: List[List[int]] = () if not value or use_mask else [[value]]
+        values_set, masks = _single_values(value)
+        self.possible_values_set: Set[int] = values_set  # to be computed each time possible_values changes
         self.associated_cells: List[Cell] = []
-        self.possible_values_backup: List[List[List[int]]] = []
-        self.old_possible_values_backup: List[List[List[int]]] = []
+        self.possible_values_backup: List[List[List[int]]] = () if use_mask else []
+        # bitmask representation (CellData.use_mask), never mutated in place: the parser shares one tuple between the cells of a run
+        self.possible_mask: int = 0 if not value else to_mask([value])
+        self.possible_masks: Sequence[int] = masks
+        self.trail_stamp = 0  # choice point at which the masks were last saved on the CellData trail
+        self.reason = 0  # search levels the current masks depend on, bit k for the choice made at depth k
         self.position = position
-
-    @property
-    def possible_values(self):
-        return self._possible_values
-
-    @possible_values.setter
-    def possible_values(self, values: List[List[int]]):
-        self._possible_values = values
+        self.direction = direction
+        self.run: Optional[SubCell] = None  # instruction SubCell of the run this SubCell belongs to
+        self.queued = False
 
     def has_one_value(self):
         return len(self.possible_values_set) == 1
@@ -52,8 +88,13 @@ class SubCell(object):
     def build_set(self):
         self.possible_values_set = set(i for j in self.possible_values for i in j)
 
+    def has_one_mask(self):
+        return mask_is_single(self.possible_mask)
+
+    def build_mask(self):
+        self.possible_mask = union_masks(self.possible_masks)
+
     def print_debug(self) -> str:
-        a = [','.join([str(j) for j in i]) for i in self.possible_values]
         return ' ; '.join([','.join([str(j) for j in i]) for i in self.possible_values])
 
 
@@ -67,24 +108,60 @@ def sub_cell_value(down: SubCell, right: SubCell):
     return 'x'
 
 
+def sub_cell_has_one_mask(down: SubCell, right: SubCell):
+    return (down is None or down.has_one_mask()) and (right is None or right.has_one_mask())
+
+
+def sub_cell_mask_value(down: SubCell, right: SubCell):
+    if sub_cell_has_one_mask(down, right):
+        return mask_value(down.possible_mask if down is not None else right.possible_mask)
+    return 'x'
+
+
 class Cell(object):
-    def __init__(self, value: str, x: int, y: int):
+    __slots__ = ('type', 'position', 'right', 'down', 'id')
+
+    def __init__(self, value: str, x: int, y: int, use_mask: bool = False):
         value = value.strip()
-        self.type: CellType = get_cell_type(value)
+        cell_type = get_cell_type(value)
+        right = down = fixed = None
+        if cell_type == CellType.INSTRUCTION:
+            for value in value.split(';'):
+                if value[1:] == '0':
+                    continue  # d0 / b0: block without run in that direction
+                if value.startswith('d'):
+                    right = int(value[1:])
+                if value.startswith('b'):
+                    down = int(value[1:])
+        else:
+            fixed = int(value) if value != '' and value != 'x' else None
+        self._init(cell_type, x, y, right, down, fixed, use_mask)
+
+    @staticmethod
+    def from_values(cell_type: CellType, x: int, y: int, right: Optional[int] = None, down: Optional[int] = None,
+                    fixed: Optional[int] = None, use_mask: bool = False) -> 'Cell':
+        # same as the CSV constructor with the values already decoded: run targets of an instruction, digit of a fixed cell
+        cell = Cell.__new__(Cell)
+        cell._init(cell_type, x, y, right, down, fixed, use_mask)
+        return cell
+
+    def _init(self, cell_type: CellType, x: int, y: int, right: Optional[int], down: Optional[int], fixed: Optional[int],
+              use_mask: bool):
+        self.type: CellType = cell_type
         self.position: Position = Position(x, y)
+        self.id: int = x << 16 | y  # unique in a grid, identity checks compare it rather than the positions
         self.right = None
         self.down = None
         if self.type == CellType.INSTRUCTION:
-            value_list = value.split(';')
-            for value in value_list:
-                if value.startswith('d'):
-                    self.right: SubCell = SubCell(self.position, int(value[1:]))
-                if value.startswith('b'):
-                    self.down: SubCell = SubCell(self.position, int(value[1:]))
+            if right:
+                self.right: SubCell = SubCell(self.position, right, CellDirection.RIGHT, use_mask)
+                self.right.run = self.right
+            if down:
+                self.down: SubCell = SubCell(self.position, down, CellDirection.DOWN, use_mask)
+                self.down.run = self.down
         else:
-            value_int = int(value) if value != '' and value != 'x' else None
-            self.down: SubCell = SubCell(self.position, value_int)
-            self.right: SubCell = SubCell(self.position, value_int)
+            self.down: SubCell = SubCell(self.position, fixed, CellDirection.DOWN, use_mask)
+            self.right: SubCell = SubCell(self.position, fixed, CellDirection.RIGHT, use_mask)
 
     def __str__(self):
         type_cell = 'I' if self.type == CellType.INSTRUCTION else 'T' if self.type == CellType.TARGET else 'F'
@@ -96,7 +173,10 @@ class Cell(object):
             return f'{type_cell}-' + sub_cell_value(self.down, self.right)
 
     def __eq__(self, other):
-        return self.position == other.position
+        return self.id == other.id
+
+    def __hash__(self):
+        return self.id
 
     def get_sub_cell(self, direction: CellDirection) -> SubCell:
         return self.right if direction == CellDirection.RIGHT else self.down
@@ -110,6 +190,15 @@ class Cell(object):
         if self.right:
             self.right.build_set()
 
+    def has_one_mask(self) -> bool:
+        return sub_cell_has_one_mask(self.down, self.right)
+
+    def build_mask(self):
+        if self.down:
+            self.down.build_mask()
+        if self.right:
+            self.right.build_mask()
+
     def print_debug(self, label: str) -> None:
         if not activate_debug:
             return
@@ -119,12 +208,32 @@ class Cell(object):
 
 
 class CellData(object):
-    def __init__(self):
+    def __init__(self, use_mask: bool = False):
         self.instr: List[Cell] = []
         self.cell_map: Dict[int, Dict[int, Cell]] = defaultdict(dict)
         self.failed_branch = 0
         self.branch_count = 0
         self.active_branch = 0
+        self.use_mask = use_mask
+        self.queue: deque[SubCell] = deque()
+        self.conflict = False
+        # undo log: (sub_cell, masks, mask, trail_stamp, reason) saved on first change after a choice point
+        self.trail: List[Tuple[SubCell, List[int], int, int, int]] = []
+        self.trail_marks: List[Tuple[int, int]] = []
+        self.trail_stamp = 0
+        self.trail_counter = 0
+        self.branch_index: Optional[BranchIndex] = None
+        self.metrics: Optional[Metrics] = None
+        self.trace: Optional[Tracer] = None  # records the choices of the search, see Tracer.attach
+        self.budget: Optional[Budget] = None  # checked on every branch and propagation step, SearchLimit once spent
+        self.extra_rules: List[Tuple[str, Callable[[CellData, SubCell], bool]]] = []  # optional rules run after A to D, see EXTRA_RULES
+        # conflict analysis of the search: levels behind the changes being made, nogoods by (x, y, digit bit)
+        self.track_reasons = False
+        self.reason = 0
+        self.nogoods: Dict[Tuple[int, int, int], List[Tuple[Tuple[Cell, int], ...]]] = defaultdict(list)
+        self.nogood_count = 0
+        self.nogood_prunes = 0
+        self.backjumps = 0
 
     def a_intersection_internal(self) -> bool:
         cells = get_cells(self.cell_map, cell_filter_target_not_unique)
@@ -159,17 +268,120 @@ class CellData(object):
 
         return False
 
+    def set_masks(self, sub_cell: SubCell, masks: List[int], mask: int):
+        if self.trail_marks and sub_cell.trail_stamp != self.trail_stamp:
+            self.trail.append((sub_cell, sub_cell.possible_masks, sub_cell.possible_mask, sub_cell.trail_stamp, sub_cell.reason))
+            sub_cell.trail_stamp = self.trail_stamp
+        sub_cell.reason |= self.reason
+        if self.branch_index is not None:
+            self.branch_index.dirty.append(sub_cell)
+        if self.metrics is not None:
+            self.metrics.prune(sub_cell, masks, mask)
+        sub_cell.possible_masks = masks
+        sub_cell.possible_mask = mask
+        if mask == 0:
+            self.conflict = True
+        self.schedule(sub_cell.run)
+
+    def push_mark(self):
+        self.trail_marks.append((len(self.trail), self.trail_stamp))
+        self.trail_counter += 1
+        self.trail_stamp = self.trail_counter
+
+    def undo(self):
+        if self.metrics is None:
+            _e_undo(self)
+            return
+        self.metrics.restores += 1
+        self.metrics.measure('e', _e_undo, self)
+
+    def schedule(self, run: Optional[SubCell]):
+        if run is not None and not run.queued:
+            run.queued = True
+            self.queue.append(run)
+
+    def schedule_all(self):
+        for instr in self.instr:
+            self.schedule(instr.down)
+            self.schedule(instr.right)
+
+    def clear_queue(self):
+        for run in self.queue:
+            run.queued = False
+        self.queue.clear()
+        self.conflict = False
+
+    def propagate_to_fixpoint(self) -> bool:
+        has_changed = False
+        budget = self.budget
+        while self.queue and not self.conflict:
+            if budget is not None:
+                budget.step()
+            run = self.queue.popleft()
+            run.queued = False
+            has_changed = _propagate_run(self, run) or has_changed
+        return has_changed
+
+    def search(self, on_solution: Optional[Callable[[], bool]] = None, cells: Optional[List[Cell]] = None) -> bool:
+        trace = self.trace
+        if trace is None:
+            return _search(self, on_solution, cells)
+        trace.event(START, len(self.trail_marks))
+        outcome = STOPPED
+        try:
+            res = _search(self, on_solution, cells)
+            outcome = SOLVED if res else UNSAT
+            return res
+        finally:
+            trace.event(END, digit=outcome)
+
+    def set_rules(self, names: List[str]):
+        if names and not self.use_mask:
+            raise ValueError('The extra rules need a puzzle parsed with use_mask=True')
+        unknown = [name for name in names if name not in EXTRA_RULES]
+        if unknown:
+            raise ValueError(f'Unknown rules {unknown}, available: {list(EXTRA_RULES)}')
+        self.extra_rules = [EXTRA_RULES[name] for name in names]
+        if self.use_mask:
+            self.schedule_all()
+
+    def snapshot(self) -> bytes:
+        return _snapshot(self)
+
+    def restore(self, data: bytes):
+        _restore(self, data)
+
+    def restore_from_backup(self):
+        _e_restore_from_backup(self)
+        if self.trace is not None:
+            self.trace.event(BACKTRACK, self.active_branch)
+
     def create_branches(self):
-        print('############ CREATE BRANCH ! ############')
-        _branch_creation(self)
+        logger.debug('############ CREATE BRANCH ! ############')
+        if self.budget is not None:
+            self.budget.node()
+        cell = _branch_creation(self)
+        if self.trace is not None:
+            self.trace.event(DECIDE, self.active_branch, cell.position.x, cell.position.y, self.cell_value(cell))
         self.active_branch += 1
+        if self.metrics is not None:
+            self.metrics.branch(self.active_branch, self.active_branch)
+
+    def active_cells(self) -> List[Cell]:
+        return get_cells(self.cell_map, filter_cell=cell_filter_target_not_unique_mask if self.use_mask else cell_filter_target_not_unique)
 
     def is_invalid(self):
+        is_instr_invalid = _is_instr_invalid_mask if self.use_mask else _is_instr_invalid
         for instr in self.instr:
-            if _is_instr_invalid(instr.down) or _is_instr_invalid(instr.right):
+            if is_instr_invalid(instr.down) or is_instr_invalid(instr.right):
                 return True
         return False
 
+    def cell_value(self, cell: Cell):
+        if self.use_mask:
+            return sub_cell_mask_value(cell.down, cell.right)
+        return sub_cell_value(cell.down, cell.right)
+
     def print_res(self):
         print(f'### Res: NbBranch=[{self.branch_count}] - triedBranch=[{self.failed_branch}]')
         for i in range(1, len(self.cell_map) + 1):
@@ -179,7 +391,7 @@ class CellData(object):
                 if cell.type == CellType.INSTRUCTION:
                     line_print.append('I')
                 else:
-                    line_print.append(str(sub_cell_value(cell.down, cell.right)))
+                    line_print.append(str(self.cell_value(cell)))
             print(' '.join(line_print))
 
     def print_investigation(self, label):
@@ -206,6 +418,44 @@ class CellData(object):
         print(f'################# INVESTIGATION - END   [{label}] ###################')
 
 
+class BranchIndex(object):
+    # lazy min-heap of (domain size, run combinations, position, sub_cell), refreshed from the SubCells changed since the last pop
+    def __init__(self, cell_data: CellData, cells: Optional[List[Cell]] = None):
+        # cells: only branch on these, the other ones are left to someone else (see components)
+        self.cell_data = cell_data
+        self.heap: List[Tuple[int, int, int, int, int, int, SubCell]] = []
+        self.counter = 0
+        cells = cell_data.active_cells() if cells is None else cells
+        self.dirty: List[SubCell] = [sub_cell for cell in cells for sub_cell in (cell.down, cell.right) if sub_cell]
+        self.size = len(self.dirty)
+        self.keep: Optional[Set[SubCell]] = set(self.dirty) if cells is not None else None
+
+    def pop(self) -> Optional[Cell]:
+        heap = self.heap
+        if len(heap) > 4 * self.size + 64:
+            self.heap = heap = [entry for entry in heap if _branch_key(entry[-1]) == entry[:2]]
+            heapq.heapify(heap)
+        for sub_cell in dict.fromkeys(self.dirty):
+            if not sub_cell.has_one_mask() and sub_cell.run is not sub_cell and (self.keep is None or sub_cell in self.keep):
+                # ties are broken on the position so that the search is reproducible
+                self.counter += 1
+                position = sub_cell.position
+                heapq.heappush(heap, (*_branch_key(sub_cell), position.x, position.y, sub_cell.direction.value, self.counter, sub_cell))
+        self.dirty.clear()
+
+        while heap:
+            size, nb_combinations, *_, sub_cell = heap[0]
+            if sub_cell.has_one_mask() or _branch_key(sub_cell) != (size, nb_combinations):
+                heapq.heappop(heap)  # solved or stale, a fresh entry was pushed when it changed
+                continue
+            return self.cell_data.cell_map[sub_cell.position.x][sub_cell.position.y]
+        return None
+
+
+def _branch_key(sub_cell: SubCell) -> Tuple[int, int]:
+    return mask_size(sub_cell.possible_mask), len(sub_cell.possible_masks)
+
+
 def get_cell_type(value: str) -> CellType:
     if value.startswith('d') or value.startswith('b'):
         return CellType.INSTRUCTION
@@ -217,7 +467,8 @@ def get_cell_type(value: str) -> CellType:
 # ##### REDUCE A - intersection in cell.right and cell.down #####
 def _a_intersection_internal(cell: Cell) -> bool:
     has_changed = False
-    cell.print_debug('A-START')
+    if activate_debug:
+        cell.print_debug('A-START')
     if not cell.down or not cell.right:
         return False
     intersection = cell.down.possible_values_set ^ cell.right.possible_values_set
@@ -230,7 +481,8 @@ def _a_intersection_internal(cell: Cell) -> bool:
         cell.right.build_set()
         has_changed = True
 
-    cell.print_debug(f'A-END [{has_changed}]')
+    if activate_debug:
+        cell.print_debug(f'A-END [{has_changed}]')
     return has_changed
 
 
@@ -244,13 +496,34 @@ def remove_elements(list: List[List[int]], elements: set[int]) -> bool:
     return res
 
 
+def _a_intersection_internal_mask(cell_data: CellData, cell: Cell) -> bool:
+    if not cell.down or not cell.right:
+        return False
+    difference = cell.down.possible_mask ^ cell.right.possible_mask
+    if not difference:
+        return False
+    has_changed = _remove_mask(cell_data, cell.down, difference)
+    has_changed = _remove_mask(cell_data, cell.right, difference) or has_changed
+    return has_changed
+
+
+def _remove_mask(cell_data: CellData, sub_cell: SubCell, mask: int) -> bool:
+    if not sub_cell.possible_mask & mask:
+        return False
+    keep = ~mask
+    cell_data.set_masks(sub_cell, [m & keep for m in sub_cell.possible_masks], sub_cell.possible_mask & keep)
+    return True
+
+
 # ##### REDUCE B - intersection between target and instruction
 def _b_intersection_target_instruction(instr: Cell) -> bool:
     has_changed = False
-    instr.print_debug('B-START')
+    if activate_debug:
+        instr.print_debug('B-START')
     has_changed = _b_intersection_target_instruction_sub_cell(instr.down, CellDirection.DOWN) or has_changed
     has_changed = _b_intersection_target_instruction_sub_cell(instr.right, CellDirection.RIGHT) or has_changed
-    instr.print_debug(f'B-END [{has_changed}]')
+    if activate_debug:
+        instr.print_debug(f'B-END [{has_changed}]')
     return has_changed
 
 
@@ -288,12 +561,34 @@ def _b_remove_values(sub_cell: SubCell, values: set) -> bool:
     return True
 
 
+def _b_intersection_target_instruction_sub_cell_mask(cell_data: CellData, sub_instr: SubCell, direction: CellDirection) -> bool:
+    if not sub_instr:
+        return False
+
+    has_changed = False
+    global_target_mask = 0
+    for target in sub_instr.associated_cells:
+        sub_target = target.get_sub_cell(direction)
+        global_target_mask |= sub_target.possible_mask
+        if target.type == CellType.FIXED:
+            continue
+        only_in_target = sub_target.possible_mask & ~sub_instr.possible_mask
+        if only_in_target:
+            has_changed = _remove_mask(cell_data, sub_target, only_in_target) or has_changed
+
+    only_in_instr = sub_instr.possible_mask & ~global_target_mask
+    if only_in_instr:
+        has_changed = _remove_mask(cell_data, sub_instr, only_in_instr) or has_changed
+    return has_changed
+
+
 # ##### REDUCE C - single value in cell -> remove value from other cells ######
 def _c_remove_value_from_lines(cell: Cell) -> bool:
     if not sub_cell_has_one_value(cell.down, cell.right):
         return False
 
-    cell.print_debug('C-START')
+    if activate_debug:
+        cell.print_debug('C-START')
     has_changed = False
     value = list(cell.down.possible_values_set)[0] if cell.down else list(cell.right.possible_values_set)[0]
     if cell.down:
@@ -303,7 +598,8 @@ def _c_remove_value_from_lines(cell: Cell) -> bool:
         for instr in cell.right.associated_cells:
             has_changed = _c_remove_value_from_cells(instr.right.associated_cells, cell, value) or has_changed
 
-    cell.print_debug(f'C-END [{has_changed}]')
+    if activate_debug:
+        cell.print_debug(f'C-END [{has_changed}]')
     return has_changed
 
 
@@ -332,17 +628,33 @@ def _c_remove_value_from_cells(cells: List[Cell], origin_cell: Cell, value: int)
     return has_changed
 
 
+def _c_remove_value_from_cells_mask(cell_data: CellData, cells: List[Cell], origin_cell: Cell, mask: int) -> bool:
+    has_changed = False
+    for c in cells:
+        if c is origin_cell:
+            continue
+        if c.down:
+            has_changed = _remove_mask(cell_data, c.down, mask) or has_changed
+        if c.right:
+            has_changed = _remove_mask(cell_data, c.right, mask) or has_changed
+    return has_changed
+
+
 # ###### REDUCE D - if possible_values empty, remove possibility from line / col + instr
 def _d_remove_empty_possibility(cell: Cell) -> bool:
-    cell.print_debug('D-START')
+    if activate_debug:
+        cell.print_debug('D-START')
     change_down = _d_remove_empty_possibility_for_sub_cells(cell.down, CellDirection.DOWN)
     change_right = _d_remove_empty_possibility_for_sub_cells(cell.right, CellDirection.RIGHT)
 
-    cell.print_debug(f'D-END [{change_right or change_down}]')
+    if activate_debug:
+        cell.print_debug(f'D-END [{change_right or change_down}]')
     return change_right or change_down
 
 
 def _d_remove_empty_possibility_for_sub_cells(sub_cell: SubCell, direction: CellDirection) -> bool:
+    if not sub_cell:
+        return False
     empty_indexes = [idx for (idx, elt) in enumerate(sub_cell.possible_values) if len(elt) == 0]
     if len(empty_indexes) == 0:
         return False
@@ -362,27 +674,209 @@ def _d_remove_empty_possibility_for_sub_cells(sub_cell: SubCell, direction: Cell
     for cell in cells:
         for idx in empty_indexes:
             if idx >= len(cell.possible_values):
-                print('oups')
+                logger.debug('oups')
             del cell.possible_values[idx]
         cell.build_set()
     return True
 
 
+def _d_keep_indexes_in_run(cell_data: CellData, sub_instr: SubCell, kept: List[int]):
+    _d_keep_indexes(cell_data, sub_instr, kept)
+    for elt in sub_instr.associated_cells:
+        if elt.type == CellType.FIXED:
+            continue
+        _d_keep_indexes(cell_data, elt.get_sub_cell(sub_instr.direction), kept)
+
+
+def _d_keep_indexes(cell_data: CellData, sub_cell: SubCell, kept: List[int]):
+    masks = sub_cell.possible_masks
+    masks = [masks[idx] for idx in kept]
+    cell_data.set_masks(sub_cell, masks, union_masks(masks))
+
+
+# ###### PROPAGATE - apply reductions A to D on a single run, only queued runs are visited ######
+def _propagate_run(cell_data: CellData, sub_instr: SubCell) -> bool:
+    if cell_data.track_reasons:
+        # the rules read the run and both SubCells of its cells, what they remove depends on all of them
+        cell_data.reason = _run_reason(sub_instr)
+    metrics = cell_data.metrics
+    if metrics is not None:
+        has_changed = metrics.measure('b', _b_intersection_target_instruction_sub_cell_mask, cell_data, sub_instr, sub_instr.direction)
+        has_changed = metrics.measure('c', _c_remove_value_in_run_mask, cell_data, sub_instr) or has_changed
+        has_changed = metrics.measure('d', _d_remove_empty_possibility_in_run_mask, cell_data, sub_instr) or has_changed
+        has_changed = metrics.measure('a', _a_intersection_in_run_mask, cell_data, sub_instr) or has_changed
+        for rule, apply_rule in cell_data.extra_rules:
+            has_changed = metrics.measure(rule, apply_rule, cell_data, sub_instr) or has_changed
+    else:
+        has_changed = _b_intersection_target_instruction_sub_cell_mask(cell_data, sub_instr, sub_instr.direction)
+        has_changed = _c_remove_value_in_run_mask(cell_data, sub_instr) or has_changed
+        has_changed = _d_remove_empty_possibility_in_run_mask(cell_data, sub_instr) or has_changed
+        has_changed = _a_intersection_in_run_mask(cell_data, sub_instr) or has_changed
+        for rule, apply_rule in cell_data.extra_rules:
+            has_changed = apply_rule(cell_data, sub_instr) or has_changed
+
+    if _is_instr_invalid_mask(sub_instr):
+        cell_data.conflict = True
+    return has_changed
+
+
+def _run_reason(sub_instr: SubCell) -> int:
+    reason = sub_instr.reason
+    for cell in sub_instr.associated_cells:
+        if cell.down:
+            reason |= cell.down.reason
+        if cell.right:
+            reason |= cell.right.reason
+    return reason
+
+
+def _c_remove_value_in_run_mask(cell_data: CellData, sub_instr: SubCell) -> bool:
+    has_changed = False
+    cells = sub_instr.associated_cells
+    for cell in cells:
+        if cell.type == CellType.TARGET and cell.has_one_mask():
+            has_changed = _c_remove_value_from_cells_mask(cell_data, cells, cell, cell.get_sub_cell(sub_instr.direction).possible_mask) or has_changed
+    return has_changed
+
+
+def _d_remove_empty_possibility_in_run_mask(cell_data: CellData, sub_instr: SubCell) -> bool:
+    sub_cells = [cell.get_sub_cell(sub_instr.direction) for cell in sub_instr.associated_cells if cell.type != CellType.FIXED]
+    if all(all(sub_cell.possible_masks) for sub_cell in sub_cells):
+        return False
+    kept = [idx for idx in range(len(sub_instr.possible_masks)) if all(sub_cell.possible_masks[idx] for sub_cell in sub_cells)]
+    _d_keep_indexes_in_run(cell_data, sub_instr, kept)
+    return True
+
+
+def _a_intersection_in_run_mask(cell_data: CellData, sub_instr: SubCell) -> bool:
+    has_changed = False
+    for cell in sub_instr.associated_cells:
+        if cell.type != CellType.FIXED:
+            has_changed = _a_intersection_internal_mask(cell_data, cell) or has_changed
+    return has_changed
+
+
+# ###### REDUCE F - hidden single: a digit of a combination that a single cell of the run can hold goes there ######
+def _f_hidden_single_mask(cell_data: CellData, sub_instr: SubCell) -> bool:
+    sub_cells, fixed_mask = _run_targets(sub_instr)
+    columns = [list(sub_cell.possible_masks) for sub_cell in sub_cells]
+    kept = []
+    for idx, combination in enumerate(sub_instr.possible_masks):
+        needed = combination & ~fixed_mask
+        once = twice = 0
+        for column in columns:
+            twice |= once & column[idx]
+            once |= column[idx]
+        valid = not needed & ~once  # a digit nobody can hold, the combination is dead
+        hidden = needed & once & ~twice
+        if hidden and valid:
+            for column in columns:
+                mask = column[idx] & hidden
+                if mask:
+                    valid = valid and mask_is_single(mask)
+                    column[idx] = mask
+        if valid:
+            kept.append(idx)
+
+    if len(kept) < len(sub_instr.possible_masks):
+        _d_keep_indexes_in_run(cell_data, sub_instr, kept)
+        return True
+    has_changed = False
+    for sub_cell, column in zip(sub_cells, columns):
+        if column != list(sub_cell.possible_masks):
+            cell_data.set_masks(sub_cell, column, union_masks(column))
+            has_changed = True
+    return has_changed
+
+
+# ###### REDUCE G - naked pair / triple: n cells sharing n digits, the other cells of the run cannot use them ######
+def _g_naked_subset_mask(cell_data: CellData, sub_instr: SubCell) -> bool:
+    sub_cells, _ = _run_targets(sub_instr)
+    has_changed = False
+    for size in (2, 3):
+        if len(sub_cells) <= size:
+            break
+        candidates = [sub_cell for sub_cell in sub_cells if 1 < mask_size(sub_cell.possible_mask) <= size]
+        for group in itertools.combinations(candidates, size):
+            union = union_masks([sub_cell.possible_mask for sub_cell in group])
+            if mask_size(union) != size:
+                continue
+            for sub_cell in sub_cells:
+                if sub_cell not in group:
+                    has_changed = _remove_mask(cell_data, sub_cell, union) or has_changed
+    return has_changed
+
+
+# ###### REDUCE H - sum bounds: each open cell lies between what the others can take at most and at least ######
+def _h_sum_bounds_mask(cell_data: CellData, sub_instr: SubCell) -> bool:
+    direction = sub_instr.direction
+    remaining = sub_instr.fixed_value
+    open_cells = []
+    for cell in sub_instr.associated_cells:
+        sub_cell = cell.get_sub_cell(direction)
+        if sub_cell.has_one_mask():
+            remaining -= mask_value(sub_cell.possible_mask)
+        elif sub_cell.possible_mask:
+            open_cells.append(sub_cell)
+    if not open_cells:
+        return False
+
+    lows = [mask_value(mask_lowest(sub_cell.possible_mask)) for sub_cell in open_cells]
+    highs = [mask_value(sub_cell.possible_mask) for sub_cell in open_cells]
+    total_low, total_high = sum(lows), sum(highs)
+    has_changed = False
+    for sub_cell, cell_low, cell_high in zip(open_cells, lows, highs):
+        low = max(1, remaining - (total_high - cell_high))
+        high = min(9, remaining - (total_low - cell_low))
+        bounds = ((1 << high) - 1) & ~((1 << (low - 1)) - 1) if low <= high else 0
+        has_changed = _remove_mask(cell_data, sub_cell, sub_cell.possible_mask & ~bounds) or has_changed
+    return has_changed
+
+
+def _run_targets(sub_instr: SubCell) -> Tuple[List[SubCell], int]:
+    sub_cells = []
+    fixed_mask = 0
+    for cell in sub_instr.associated_cells:
+        if cell.type == CellType.FIXED:
+            fixed_mask |= cell.get_sub_cell(sub_instr.direction).possible_mask
+        else:
+            sub_cells.append(cell.get_sub_cell(sub_instr.direction))
+    return sub_cells, fixed_mask
+
+
+EXTRA_RULES: Dict[str, Tuple[str, Callable[[CellData, SubCell], bool]]] = {
+    'hidden_single': ('f', _f_hidden_single_mask),
+    'naked_subset': ('g', _g_naked_subset_mask),
+    'sum_bounds': ('h', _h_sum_bounds_mask),
+}
+
+
 # ###### REDUCE E - Restore from Backup #######
 def _e_restore_from_backup(cell_data: CellData):
-    print('######## RESTORE FROM BACKUP ##########')
+    logger.debug('######## RESTORE FROM BACKUP ##########')
     cells = get_cells(cell_data.cell_map)
     for cell in cells:
         if (cell.down and len(cell.down.possible_values) == 0) or (cell.right and len(cell.right.possible_values) == 0):
             if cell_data.failed_branch == cell_data.branch_count:
-                print('*' * 10, f' No more possibilities left !! Tried {cell_data.failed_branch} ', '*' * 10)
-                raise Exception('No more possibilities left !')
+                logger.debug('%s No more possibilities left !! Tried %s %s', '*' * 10, cell_data.failed_branch, '*' * 10)
+                raise NoSolution('No more possibilities left !')
 
         _e_restore_cell(cell)
+    if cell_data.metrics is not None:
+        cell_data.metrics.restores += 1
     cell_data.failed_branch += 1
     cell_data.active_branch -= 1
 
 
+def _e_undo(cell_data: CellData):
+    size, cell_data.trail_stamp = cell_data.trail_marks.pop()
+    trail = cell_data.trail
+    while len(trail) > size:
+        sub_cell, sub_cell.possible_masks, sub_cell.possible_mask, sub_cell.trail_stamp, sub_cell.reason = trail.pop()
+        if cell_data.branch_index is not None:
+            cell_data.branch_index.dirty.append(sub_cell)
+
+
 def _e_restore_cell(cell: Cell):
     if cell.down:
         cell.down.possible_values = cell.down.possible_values_backup.pop()
@@ -393,7 +887,7 @@ def _e_restore_cell(cell: Cell):
 
 
 # ###### BRANCH - create a branch ######
-def _branch_creation(cell_data: CellData):
+def _branch_creation(cell_data: CellData) -> Cell:
     active_cells = get_cells(cell_data.cell_map, filter_cell=cell_filter_target_not_unique)
     cell_data.branch_count += 1
 
@@ -406,6 +900,7 @@ def _branch_creation(cell_data: CellData):
         if cell == branch_cell:
             continue
         _branch_create_backup(cell)
+    return branch_cell
 
 
 def _branch_cell_priority(cell: Cell):
@@ -433,6 +928,207 @@ def _branch_create_backup(cell: Cell):
         cell.right.possible_values_backup.append([[j for j in i] for i in cell.right.possible_values])
 
 
+# ###### SEARCH - complete depth first search, minimum remaining values first ######
+# every change made below a choice point carries the levels it depends on (SubCell.reason): when all the values of a
+# cell failed, the search jumps back to the deepest level the failures depend on and learns these choices as a nogood
+MAX_NOGOOD_SIZE = 12
+MAX_NOGOODS = 100000
+
+
+def _search(cell_data: CellData, on_solution: Optional[Callable[[], bool]] = None, cells: Optional[List[Cell]] = None) -> bool:
+    # on_solution is called on every solution found, the search goes on while it returns False
+    # SearchLimit once cell_data.budget is spent, the masks are then back to how the search found them
+    budget = cell_data.budget
+    trace = cell_data.trace
+    depth = len(cell_data.trail_marks)  # choice points of the caller, left as they are
+    try:
+        cell_data.propagate_to_fixpoint()
+        if cell_data.conflict:
+            cell_data.clear_queue()
+            return False
+
+        cell_data.branch_index = branch_index = BranchIndex(cell_data, cells)
+        cell_data.track_reasons = True
+        cell = branch_index.pop()
+        if cell is None:
+            return on_solution is None or on_solution()
+        stack: List[List] = [_search_frame(cell)]
+        while stack:
+            level = len(stack) - 1
+            frame = stack[-1]
+            if frame[1] == 0:
+                # every value failed below, back to the deepest level the failures depend on
+                stack.pop()
+                levels = frame[3]
+                if not frame[4]:
+                    _learn_nogood(cell_data, stack, levels)
+                target = levels.bit_length() - 1
+                if trace is not None:
+                    trace.event(BACKTRACK, target + 1)
+                if target < 0:
+                    for _ in range(level):
+                        cell_data.undo()
+                    break
+                for _ in range(level - target):
+                    cell_data.undo()  # the value of every level from target to here is wrong
+                cell_data.backjumps += level - 1 - target
+                solution_below = frame[4] or any(f[4] for f in stack[target + 1:])
+                del stack[target + 1:]
+                parent = stack[target]
+                parent[3] |= levels & ~(1 << target)
+                if solution_below:
+                    parent[3] |= (1 << target) - 1
+                    parent[4] = True
+                cell_data.active_branch = len(stack)
+                continue
+
+            if budget is not None:
+                budget.node()
+            bit = mask_lowest(frame[1])
+            frame[1] &= ~bit
+            frame[2] = bit
+            cell_data.branch_count += 1
+            if trace is not None:
+                trace.event(DECIDE, level, frame[0].position.x, frame[0].position.y, mask_value(bit))
+            cell_data.push_mark()
+            cell_data.reason = 1 << level
+            _search_assign(cell_data, frame[0], bit)
+            cell_data.propagate_to_fixpoint()
+            if not cell_data.conflict and cell_data.nogoods:
+                _apply_nogoods(cell_data, frame[0], bit)
+            if trace is not None:
+                trace.event(CONFLICT if cell_data.conflict else FIXPOINT, level)
+            if cell_data.conflict:
+                cell_data.failed_branch += 1
+                cell_data.clear_queue()
+                cell_data.undo()
+                frame[3] |= cell_data.reason & ~(1 << level)
+                if not cell_data.reason >> level & 1:
+                    frame[1] = 0  # the failure does not depend on this value, the other ones fail the same way
+                continue
+
+            cell = branch_index.pop()
+            if cell is None:
+                if trace is not None:
+                    trace.event(SOLUTION, level)
+                if on_solution is None or on_solution():
+                    return True
+                cell_data.undo()
+                frame[3] |= (1 << level) - 1  # no jump and no nogood above a solution
+                frame[4] = True
+                continue
+            stack.append(_search_frame(cell))
+            cell_data.active_branch = len(stack)
+            if cell_data.metrics is not None:
+                cell_data.metrics.branch(len(stack), sum(1 for f in stack if f[1]))
+        return False
+    except SearchLimit:
+        cell_data.clear_queue()
+        while len(cell_data.trail_marks) > depth:
+            cell_data.undo()
+        cell_data.active_branch = 0
+        raise
+    finally:
+        cell_data.branch_index = None
+        cell_data.track_reasons = False
+        cell_data.reason = 0
+
+
+def _search_frame(cell: Cell) -> List:
+    # [branch cell, values not tried yet, value being tried, levels the failures depend on, solution found below]
+    # the values already removed from the cell are failures too, they start the levels
+    return [cell, _cell_mask(cell), 0, _cell_reason(cell), False]
+
+
+def _cell_reason(cell: Cell) -> int:
+    return (cell.down.reason if cell.down else 0) | (cell.right.reason if cell.right else 0)
+
+
+def _learn_nogood(cell_data: CellData, stack: List[List], levels: int):
+    # the choices made at these levels cannot all be part of a solution
+    if not levels or levels.bit_count() > MAX_NOGOOD_SIZE or cell_data.nogood_count >= MAX_NOGOODS:
+        return
+    nogood = tuple((stack[k][0], stack[k][2]) for k in range(len(stack)) if levels >> k & 1)
+    for cell, bit in nogood:
+        cell_data.nogoods[(cell.position.x, cell.position.y, bit)].append(nogood)
+    cell_data.nogood_count += 1
+
+
+def _apply_nogoods(cell_data: CellData, cell: Cell, bit: int):
+    # nogoods containing the choice just made: all the choices hold is a conflict, all but one removes the last digit
+    for nogood in cell_data.nogoods.get((cell.position.x, cell.position.y, bit), ()):
+        open_literal = None
+        reason = 0
+        for other, other_bit in nogood:
+            mask = _cell_mask(other)
+            if not mask & other_bit:
+                break  # cannot hold anymore
+            if mask != other_bit:
+                if open_literal is not None:
+                    break
+                open_literal = other, other_bit
+            reason |= _cell_reason(other)
+        else:
+            cell_data.reason = reason
+            cell_data.nogood_prunes += 1
+            if open_literal is None:
+                cell_data.conflict = True
+                return
+            other, other_bit = open_literal
+            for sub_cell in (other.down, other.right):
+                if sub_cell:
+                    _remove_mask(cell_data, sub_cell, other_bit)
+            cell_data.propagate_to_fixpoint()
+            if cell_data.conflict:
+                return
+
+
+def _cell_mask(cell: Cell) -> int:
+    if cell.down and cell.right:
+        return cell.down.possible_mask & cell.right.possible_mask
+    return cell.down.possible_mask if cell.down else cell.right.possible_mask
+
+
+def _search_assign(cell_data: CellData, cell: Cell, bit: int):
+    for sub_cell in (cell.down, cell.right):
+        if sub_cell:
+            cell_data.set_masks(sub_cell, [m & bit for m in sub_cell.possible_masks], bit)
+
+
+# ###### SNAPSHOT - masks of every SubCell, in cell_map order: [nb masks, *masks, mask] ######
+def _snapshot(cell_data: CellData) -> bytes:
+    res = array('H')
+    for sub_cell in _sub_cells(cell_data):
+        res.append(len(sub_cell.possible_masks))
+        res.extend(sub_cell.possible_masks)
+        res.append(sub_cell.possible_mask)
+    return res.tobytes()
+
+
+def _restore(cell_data: CellData, data: bytes):
+    values = array('H')
+    values.frombytes(data)
+    k = 0
+    for sub_cell in _sub_cells(cell_data):
+        size = values[k]
+        sub_cell.possible_masks = values[k + 1:k + 1 + size].tolist()
+        sub_cell.possible_mask = values[k + 1 + size]
+        sub_cell.trail_stamp = 0
+        sub_cell.reason = 0
+        k += size + 2
+    cell_data.trail.clear()
+    cell_data.trail_marks.clear()
+    cell_data.trail_stamp = 0
+    cell_data.clear_queue()
+    # nogoods hold only under the choices made before they were learned, not under the state restored
+    cell_data.nogoods.clear()
+    cell_data.nogood_count = 0
+
+
+def _sub_cells(cell_data: CellData) -> List[SubCell]:
+    return [sub_cell for cell in get_cells(cell_data.cell_map) for sub_cell in (cell.down, cell.right) if sub_cell]
+
+
 def cell_filter_target(cell: Cell) -> Optional[Cell]:
     if cell.type == CellType.TARGET:
         return cell
@@ -445,6 +1141,12 @@ def cell_filter_target_not_unique(cell: Cell) -> Optional[Cell]:
     return None
 
 
+def cell_filter_target_not_unique_mask(cell: Cell) -> Optional[Cell]:
+    if cell.type == CellType.TARGET and not cell.has_one_mask():
+        return cell
+    return None
+
+
 def get_cells(cell_data: Dict[int, Dict[int, Cell]], filter_cell=lambda c: c) -> List[Cell]:
     res = []
     for x in range(1, len(cell_data) + 1):
@@ -463,4 +1165,15 @@ def _is_instr_invalid(instr: SubCell) -> bool:
         if not cell.has_one_value():
             return False
         sum += list(cell.down.possible_values_set)[0] if cell.down else list(cell.right.possible_values_set)[0]
-    return instr.fixed_value != sum
\ No newline at end of file
+    return instr.fixed_value != sum
+
+
+def _is_instr_invalid_mask(instr: SubCell) -> bool:
+    if not instr:
+        return False
+    sum = 0
+    for cell in instr.associated_cells:
+        if not cell.has_one_mask():
+            return False
+        sum += mask_value(cell.down.possible_mask if cell.down else cell.right.possible_mask)
+    return instr.fixed_value != sum
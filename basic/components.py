@@ -0,0 +1,215 @@
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from basic.cell import Cell, CellData, SubCell
+from basic.parser import parse_lines
+from basic.solver import SolveResult, SolveStatus
+
+logger = logging.getLogger(__name__)
+
+
+class Component(object):
+    # open cells linked by the runs they share, nothing outside can change what happens inside
+    def __init__(self, cells: List[Cell], runs: List[SubCell]):
+        self.cells = cells
+        self.runs = runs
+
+    def positions(self) -> List[Tuple[int, int]]:
+        return [(cell.position.x, cell.position.y) for cell in self.cells]
+
+
+# ##### SPLIT - union of the open cells of every run, solved and FIXED cells link nothing #####
+def components(cell_data: CellData) -> List[Component]:
+    cells = cell_data.active_cells()
+    index = {(cell.position.x, cell.position.y): k for k, cell in enumerate(cells)}
+    parent = list(range(len(cells)))
+    runs = _open_runs(cell_data, index)
+    for _, members in runs:
+        for k in members[1:]:
+            _union(parent, members[0], k)
+
+    groups: Dict[int, Component] = {}
+    for k, cell in enumerate(cells):
+        groups.setdefault(_find(parent, k), Component([], [])).cells.append(cell)
+    for run, members in runs:
+        groups[_find(parent, members[0])].runs.append(run)
+    return list(groups.values())
+
+
+def _open_runs(cell_data: CellData, index: Dict[Tuple[int, int], int]) -> List[Tuple[SubCell, List[int]]]:
+    res = []
+    for instr in cell_data.instr:
+        for run in (instr.right, instr.down):
+            if run:
+                members = [index[key] for key in ((c.position.x, c.position.y) for c in run.associated_cells) if key in index]
+                if members:
+                    res.append((run, members))
+    return res
+
+
+def _find(parent: List[int], k: int) -> int:
+    while parent[k] != k:
+        parent[k] = parent[parent[k]]
+        k = parent[k]
+    return k
+
+
+def _union(parent: List[int], a: int, b: int):
+    a, b = _find(parent, a), _find(parent, b)
+    if a != b:
+        parent[max(a, b)] = min(a, b)
+
+
+# ##### ARTICULATION - cells whose assignment would split their component, on the cell / run graph #####
+def articulation_cells(component: Component) -> List[Cell]:
+    index = {(cell.position.x, cell.position.y): k for k, cell in enumerate(component.cells)}
+    nb_cells = len(component.cells)
+    adjacency: List[List[int]] = [[] for _ in range(nb_cells + len(component.runs))]
+    for r, run in enumerate(component.runs):
+        for cell in run.associated_cells:
+            k = index.get((cell.position.x, cell.position.y))
+            if k is not None:
+                adjacency[k].append(nb_cells + r)
+                adjacency[nb_cells + r].append(k)
+
+    # iterative Tarjan, a vertex is an articulation point when a child cannot reach above it
+    order = [0] * len(adjacency)
+    low = [0] * len(adjacency)
+    points = set()
+    counter = 1
+    for root in range(len(adjacency)):
+        if order[root]:
+            continue
+        order[root] = low[root] = counter
+        counter += 1
+        root_children = 0
+        stack = [(root, -1, iter(adjacency[root]))]
+        while stack:
+            vertex, parent, neighbours = stack[-1]
+            for other in neighbours:
+                if not order[other]:
+                    order[other] = low[other] = counter
+                    counter += 1
+                    stack.append((other, vertex, iter(adjacency[other])))
+                    break
+                if other != parent:
+                    low[vertex] = min(low[vertex], order[other])
+            else:
+                stack.pop()
+                if parent < 0:
+                    continue
+                low[parent] = min(low[parent], low[vertex])
+                if parent == root:
+                    root_children += 1
+                elif low[vertex] >= order[parent]:
+                    points.add(parent)
+        if root_children > 1:
+            points.add(root)
+    return [component.cells[k] for k in sorted(points) if k < nb_cells]
+
+
+# ##### SOLVE - one search per component, the efforts add up instead of multiplying #####
+def search_components(cell_data: CellData) -> bool:
+    # the state is left on the solution, the components already solved stay solved if a later one has none
+    cell_data.propagate_to_fixpoint()
+    if cell_data.conflict:
+        cell_data.clear_queue()
+        return False
+    parts = components(cell_data)
+    logger.debug('## %s components %s', len(parts), [len(part.cells) for part in parts])
+    for part in sorted(parts, key=lambda p: len(p.cells)):
+        if not cell_data.search(cells=part.cells):
+            return False
+    return True
+
+
+_worker_lines: Optional[List[str]] = None
+
+
+def solve_parallel_components(lines: List[str], workers: Optional[int] = None) -> SolveResult:
+    # the components are solved by separate processes, each one sends back the masks of its own cells
+    start_time = time.time()
+    cell_data = parse_lines(lines, True)
+    cell_data.propagate_to_fixpoint()
+    parts = [] if cell_data.conflict else components(cell_data)
+    parse_time = time.time()
+
+    solved = not cell_data.conflict
+    if parts:
+        with ProcessPoolExecutor(workers or os.cpu_count(), initializer=_init_worker, initargs=(lines,)) as executor:
+            for part, res in zip(parts, executor.map(_solve_component, [part.positions() for part in parts])):
+                found, branch_count, failed_branch = res
+                cell_data.branch_count += branch_count
+                cell_data.failed_branch += failed_branch
+                if found is None:
+                    solved = False
+                    break
+                for cell, masks in zip(part.cells, found):
+                    _set_cell_masks(cell, masks)
+    return SolveResult(SolveStatus.SOLVED if solved else SolveStatus.UNSAT, cell_data, {
+        'parse_time': parse_time - start_time,
+        'solve_time': time.time() - parse_time,
+        'branch_count': cell_data.branch_count,
+        'failed_branch': cell_data.failed_branch,
+        'components': len(parts),
+    })
+
+
+def _init_worker(lines: List[str]):
+    global _worker_lines
+    _worker_lines = lines
+
+
+def _solve_component(positions: List[Tuple[int, int]]) -> Tuple[Optional[list], int, int]:
+    cell_data = parse_lines(_worker_lines, True)
+    cells = [cell_data.cell_map[x][y] for x, y in positions]
+    if not cell_data.search(cells=cells):
+        return None, cell_data.branch_count, cell_data.failed_branch
+    return [_cell_masks(cell) for cell in cells], cell_data.branch_count, cell_data.failed_branch
+
+
+def _cell_masks(cell: Cell) -> list:
+    return [(sub_cell.possible_masks, sub_cell.possible_mask) if sub_cell else None for sub_cell in (cell.down, cell.right)]
+
+
+def _set_cell_masks(cell: Cell, masks: list):
+    for sub_cell, values in zip((cell.down, cell.right), masks):
+        if sub_cell:
+            sub_cell.possible_masks, sub_cell.possible_mask = values
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(description='Split a kakuro puzzle in independent components and solve them')
+    arg_parser.add_argument('puzzle')
+    arg_parser.add_argument('-w', '--workers', type=int, default=1, help='worker processes, more than 1 solves the components in parallel')
+    arg_parser.add_argument('--info', action='store_true', help='only print the components and their articulation cells')
+    args = arg_parser.parse_args(argv)
+
+    with open(args.puzzle) as f:
+        lines = f.readlines()
+    if args.info:
+        cell_data = parse_lines(lines, True)
+        cell_data.propagate_to_fixpoint()
+        for k, part in enumerate(components(cell_data)):
+            cuts = ' '.join(f'[{c.position.x}-{c.position.y}]' for c in articulation_cells(part))
+            logger.info('## Component %s: %s cells, %s runs, articulation cells: %s', k, len(part.cells), len(part.runs), cuts or '-')
+        return 0
+
+    if args.workers > 1:
+        result = solve_parallel_components(lines, args.workers)
+    else:
+        from basic.solver import solve
+        result = solve(parse_lines(lines, True))
+    result.cell_data.print_res()
+    logger.info('## %s %s', result.status.name, result.stats)
+    return 0 if result.status == SolveStatus.SOLVED else 1
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    sys.exit(main())
@@ -0,0 +1,236 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
+from basic.cell import Cell, CellData, CellType, get_cell_type
+from basic.parser import handle_cell, fill_cell_data
+from basic.solver import solve
+
+CORPUS_MAGIC = b'KKPC'
+CORPUS_VERSION = 1
+
+# one byte per cell: 0 blank, 1..9 fixed digit, INSTRUCTION with the runs it starts, PADDING outside a short row
+INSTRUCTION = 0x80
+RIGHT_RUN = 0x01
+DOWN_RUN = 0x02
+PADDING = 0x40
+
+_HEADER = struct.Struct('<4sHHQQ')  # magic, version, unused, number of puzzles, position of the offsets
+_RECORD = struct.Struct('<HHH')  # rows, columns, runs, followed by the rows * columns codes and the run targets
+
+
+# ##### ENCODE - CSV lines to a record #####
+def encode_lines(lines: List[str]) -> bytes:
+    targets = bytearray()  # right then down target of each instruction, in reading order
+    rows = [[_cell_code(c, targets) for c in line.split(',')] for line in lines]
+    nb_cols = max((len(row) for row in rows), default=0)
+    codes = bytearray()
+    for row in rows:
+        codes.extend(row)
+        codes.extend([PADDING] * (nb_cols - len(row)))
+    return _RECORD.pack(len(rows), nb_cols, len(targets)) + codes + targets
+
+
+def _cell_code(value: str, targets: bytearray) -> int:
+    value = value.strip()
+    cell_type = get_cell_type(value)
+    if cell_type == CellType.INSTRUCTION:
+        right = down = 0
+        for part in value.split(';'):
+            if part.startswith('d'):
+                right = int(part[1:])
+            if part.startswith('b'):
+                down = int(part[1:])
+        if not (0 <= right <= 0xFF and 0 <= down <= 0xFF):
+            raise ValueError(f'Run target out of range [{value}]')
+        targets.extend(t for t in (right, down) if t)
+        return INSTRUCTION | (RIGHT_RUN if right else 0) | (DOWN_RUN if down else 0)
+    if cell_type == CellType.FIXED:
+        if not 1 <= int(value) <= 9:
+            raise ValueError(f'Fixed value out of range [{value}]')
+        return int(value)
+    return 0
+
+
+# ##### DECODE - record to CellData, the cells are built from the codes without any text #####
+def decode(data: bytes, use_mask: bool = True) -> CellData:
+    nb_rows, nb_cols, nb_targets = _RECORD.unpack_from(data)
+    end = _RECORD.size + nb_rows * nb_cols
+    codes = data[_RECORD.size:end]
+    targets = iter(data[end:end + nb_targets])
+    if len(data) < end + nb_targets:
+        raise ValueError('Truncated puzzle record')
+
+    cell_data = CellData(use_mask)
+    col_list: Dict[int, Cell] = {}
+    line_list: Dict[int, Cell] = {}
+    k = 0
+    for i in range(1, nb_rows + 1):
+        for j in range(1, nb_cols + 1):
+            code = codes[k]
+            k += 1
+            if code == PADDING:
+                continue
+            if code & INSTRUCTION:
+                right = next(targets) if code & RIGHT_RUN else None
+                down = next(targets) if code & DOWN_RUN else None
+                cell = Cell.from_values(CellType.INSTRUCTION, i, j, right, down, use_mask=use_mask)
+            elif code:
+                cell = Cell.from_values(CellType.FIXED, i, j, fixed=code, use_mask=use_mask)
+            else:
+                cell = Cell.from_values(CellType.TARGET, i, j, use_mask=use_mask)
+            handle_cell(cell, i, j, cell_data, col_list, line_list)
+    fill_cell_data(cell_data, use_mask)
+    return cell_data
+
+
+# ##### CORPUS - records one after the other, then the offsets of the records #####
+class CorpusWriter(object):
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path + '.tmp', 'wb')
+        self.file.write(_HEADER.pack(CORPUS_MAGIC, CORPUS_VERSION, 0, 0, 0))
+        self.offsets = array('Q', [_HEADER.size])
+
+    def add(self, lines: List[str]):
+        record = encode_lines(lines)
+        self.file.write(record)
+        self.offsets.append(self.offsets[-1] + len(record))
+
+    def add_file(self, filename: str):
+        with open(filename) as f:
+            self.add(f.readlines())
+
+    def close(self):
+        # the offsets are aligned so that the reader can map them in place
+        position = self.offsets[-1]
+        padding = -position % self.offsets.itemsize
+        self.file.write(bytes(padding))
+        self.file.write(self.offsets.tobytes())
+        self.file.seek(0)
+        self.file.write(_HEADER.pack(CORPUS_MAGIC, CORPUS_VERSION, 0, len(self.offsets) - 1, position + padding))
+        self.file.close()
+        os.replace(self.path + '.tmp', self.path)
+
+    def __enter__(self) -> 'CorpusWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+            os.remove(self.path + '.tmp')
+
+
+class Corpus(object):
+    # memory-mapped, a puzzle is only read and decoded when it is asked for
+    def __init__(self, path: str, use_mask: bool = True):
+        self.use_mask = use_mask
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, _, self.size, position = _HEADER.unpack_from(self.map)
+            if magic != CORPUS_MAGIC or version != CORPUS_VERSION:
+                raise ValueError(f'Invalid corpus [{magic}/{version}]')
+            if position + 8 * (self.size + 1) > len(self.map):
+                raise ValueError('Truncated corpus')
+            self.offsets = memoryview(self.map)[position:position + 8 * (self.size + 1)].cast('Q')
+        except (ValueError, struct.error):
+            self.map.close()
+            raise
+
+    def __len__(self) -> int:
+        return self.size
+
+    def record(self, index: int) -> bytes:
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        return self.map[self.offsets[index]:self.offsets[index + 1]]
+
+    def __getitem__(self, index: int) -> CellData:
+        return decode(self.record(index), self.use_mask)
+
+    def __iter__(self) -> Iterator[CellData]:
+        for index in range(self.size):
+            yield self[index]
+
+    def close(self):
+        self.offsets.release()
+        self.map.close()
+
+    def __enter__(self) -> 'Corpus':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def pack(path: str, filenames: List[str]) -> int:
+    with CorpusWriter(path) as writer:
+        for filename in filenames:
+            writer.add_file(filename)
+    return len(filenames)
+
+
+_worker_corpus: Optional[Corpus] = None
+
+
+def _solve_range(path: str, start: int, stop: int, timeout: Optional[float]) -> List[dict]:
+    global _worker_corpus
+    if _worker_corpus is None:
+        _worker_corpus = Corpus(path)
+    res = []
+    for index in range(start, stop):
+        start_time = time.time()
+        try:
+            result = solve(_worker_corpus[index], timeout=timeout).to_dict()
+        except Exception as e:
+            result = {'status': f'error: {e}', 'grid': []}
+        res.append({'index': index, **result, 'time': time.time() - start_time})
+    return res
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from basic.batch import list_puzzles
+
+    arg_parser = argparse.ArgumentParser(description='Pack kakuro puzzles in a binary corpus, solve the puzzles of a corpus')
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+    pack_parser = commands.add_parser('pack', help='write the puzzles to a corpus file')
+    pack_parser.add_argument('corpus')
+    pack_parser.add_argument('puzzles', nargs='+', help='puzzle files, directories or glob patterns')
+    solve_parser = commands.add_parser('solve', help='solve the puzzles of a corpus, one JSON line per puzzle')
+    solve_parser.add_argument('corpus')
+    solve_parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    solve_parser.add_argument('-t', '--timeout', type=float, default=None, help='timeout per puzzle in seconds')
+    solve_parser.add_argument('--chunk', type=int, default=64, help='puzzles per task')
+    args = arg_parser.parse_args(argv)
+
+    if args.command == 'pack':
+        start_time = time.time()
+        nb = pack(args.corpus, list_puzzles(args.puzzles))
+        print(f'## {nb} puzzles written to {args.corpus} in {time.time() - start_time:.3f}s ({os.path.getsize(args.corpus)} bytes)')
+        return 0
+
+    with Corpus(args.corpus) as corpus:
+        size = len(corpus)
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        # the workers map the corpus themselves, only indexes and results cross the process boundary
+        ranges = [(start, min(start + args.chunk, size)) for start in range(0, size, args.chunk)]
+        for results in executor.map(_solve_range, *zip(*[(args.corpus, a, b, args.timeout) for a, b in ranges])):
+            for res in results:
+                sys.stdout.write(json.dumps(res) + '\n')
+                failed += res['status'] != 'solved'
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,220 @@
+import argparse
+import random
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from basic.budget import SearchLimit
+from basic.cell import _cell_mask
+from basic.mask import mask_size
+from basic.parser import parse_lines
+from basic.solver import count_solutions, SolutionCount
+
+MAX_SIZE = 50
+
+
+class GeneratorError(Exception):
+    pass
+
+
+def generate(rows: int, cols: int, density: float = 0.3, seed: Optional[int] = None, max_run: int = 9,
+             run_weights: Optional[Dict[int, float]] = None, max_tries: int = 20, max_nodes: int = 200) -> str:
+    if not 3 <= rows <= MAX_SIZE or not 3 <= cols <= MAX_SIZE:
+        raise GeneratorError(f'Size must be between 3 and {MAX_SIZE} [{rows}x{cols}]')
+    if not 2 <= max_run <= 9:
+        raise GeneratorError(f'Run length must be between 2 and 9 [{max_run}]')
+
+    rnd = random.Random(seed)
+    for _ in range(max_tries):
+        blocks = _layout(rnd, rows, cols, density, max_run, run_weights)
+        digits = _fill(rnd, blocks)
+        if digits is None:
+            continue
+        return _make_unique(rnd, blocks, digits, max_nodes)
+    raise GeneratorError(f'No valid grid found after {max_tries} tries')
+
+
+# ##### LAYOUT - blocks, every white cell in an across and a down run of 2 to max_run cells #####
+def _layout(rnd: random.Random, rows: int, cols: int, density: float, max_run: int,
+            run_weights: Optional[Dict[int, float]]) -> List[List[bool]]:
+    blocks = [[i == 0 or j == 0 or rnd.random() < density for j in range(cols)] for i in range(rows)]
+    lengths = [i for i in range(2, max_run + 1) if not run_weights or run_weights.get(i, 0) > 0] or [max_run]
+    weights = [run_weights.get(i, 0) for i in lengths] if run_weights else None
+
+    # run lengths are drawn on the first pass only, later passes just fix what the other direction broke
+    has_changed = True
+    sample = True
+    while has_changed:
+        has_changed = _layout_lines(rnd, blocks, lengths, weights, sample)
+        transposed = [list(i) for i in zip(*blocks)]
+        if _layout_lines(rnd, transposed, lengths, weights, sample):
+            blocks = [list(i) for i in zip(*transposed)]
+            has_changed = True
+        sample = False
+    return blocks
+
+
+def _layout_lines(rnd: random.Random, blocks: List[List[bool]], lengths: List[int], weights: Optional[List[float]], sample: bool) -> bool:
+    has_changed = False
+    for line in blocks:
+        for start, length in _segments(line):
+            if length == 1:
+                line[start] = True
+                has_changed = True
+                continue
+            wanted = rnd.choices(lengths, weights)[0] if sample else lengths[-1]
+            if length <= wanted:
+                continue
+            # split so that both parts keep at least 2 cells, or drop the last cell
+            split = min(wanted, length - 3)
+            line[start + split if split >= 2 else start + length - 1] = True
+            has_changed = True
+    return has_changed
+
+
+def _segments(line: List[bool]) -> List[Tuple[int, int]]:
+    res = []
+    start = None
+    for j, block in enumerate(line + [True]):
+        if not block and start is None:
+            start = j
+        elif block and start is not None:
+            res.append((start, j - start))
+            start = None
+    return res
+
+
+# ##### FILL - random digits, all different in each run #####
+def _fill(rnd: random.Random, blocks: List[List[bool]], max_steps: int = 200000) -> Optional[Dict[Tuple[int, int], int]]:
+    cells = [(i, j) for i in range(len(blocks)) for j in range(len(blocks[i])) if not blocks[i][j]]
+    if not cells:
+        return None
+    peers = {c: _peers(blocks, c) for c in cells}
+    digits: Dict[Tuple[int, int], int] = {}
+    choices: List[List[int]] = []
+    k = 0
+    steps = 0
+    while k < len(cells):
+        steps += 1
+        if steps > max_steps:
+            return None
+        cell = cells[k]
+        if len(choices) <= k:
+            used = {digits[p] for p in peers[cell] if p in digits}
+            candidates = [i for i in range(1, 10) if i not in used]
+            rnd.shuffle(candidates)
+            choices.append(candidates)
+        if choices[k]:
+            digits[cell] = choices[k].pop()
+            k += 1
+            continue
+        choices.pop()
+        digits.pop(cell, None)
+        k -= 1
+        if k < 0:
+            return None
+        digits.pop(cells[k], None)
+    return digits
+
+
+def _peers(blocks: List[List[bool]], cell: Tuple[int, int]) -> List[Tuple[int, int]]:
+    res = []
+    for di, dj in ((0, 1), (0, -1), (1, 0), (-1, 0)):
+        i, j = cell[0] + di, cell[1] + dj
+        while 0 <= i < len(blocks) and 0 <= j < len(blocks[i]) and not blocks[i][j]:
+            res.append((i, j))
+            i, j = i + di, j + dj
+    return res
+
+
+# ##### UNIQUE - fix cells where two solutions differ until only one solution is left #####
+def _make_unique(rnd: random.Random, blocks: List[List[bool]], digits: Dict[Tuple[int, int], int], max_nodes: int) -> str:
+    fixed: Dict[Tuple[int, int], int] = {}
+    while True:
+        csv = to_csv(blocks, digits, fixed)
+        try:
+            result = count_solutions(parse_lines(csv.splitlines(), True), 2, max_nodes)
+        except SearchLimit:
+            # too expensive to prove, give away some of the widest cells left by propagation
+            for cell in _widest_cells(rnd, csv):
+                fixed[cell] = digits[cell]
+            continue
+        if result.outcome == SolutionCount.UNSAT:
+            raise GeneratorError('Generated grid has no solution')
+        if result.outcome == SolutionCount.UNIQUE:
+            return csv
+        first, second = result.solutions
+        different = [(i, j) for i in range(len(first)) for j in range(len(first[i])) if first[i][j] != second[i][j]]
+        cell = rnd.choice(different)
+        fixed[cell] = digits[cell]
+
+
+def _widest_cells(rnd: random.Random, csv: str) -> List[Tuple[int, int]]:
+    cell_data = parse_lines(csv.splitlines(), True)
+    cell_data.propagate_to_fixpoint()
+    cells = cell_data.active_cells()
+    rnd.shuffle(cells)
+    cells.sort(key=lambda c: -mask_size(_cell_mask(c)))
+    return [(c.position.x - 1, c.position.y - 1) for c in cells[:1 + len(cells) // 50]]
+
+
+def to_csv(blocks: List[List[bool]], digits: Dict[Tuple[int, int], int], fixed: Dict[Tuple[int, int], int]) -> str:
+    rows = []
+    for i, line in enumerate(blocks):
+        row = []
+        for j, block in enumerate(line):
+            if not block:
+                row.append(str(fixed[(i, j)]) if (i, j) in fixed else '')
+                continue
+            right = _run_sum(blocks, digits, i, j, 0, 1)
+            down = _run_sum(blocks, digits, i, j, 1, 0)
+            instr = ([f'd{right}'] if right else []) + ([f'b{down}'] if down else [])
+            if instr:
+                row.append(';'.join(instr))
+            elif (j > 0 and not line[j - 1]) or (i > 0 and not blocks[i - 1][j]):
+                row.append('d0')  # closes the run on its left or above
+            else:
+                row.append('x')
+        rows.append(','.join(row))
+    return '\n'.join(rows) + '\n'
+
+
+def _run_sum(blocks: List[List[bool]], digits: Dict[Tuple[int, int], int], i: int, j: int, di: int, dj: int) -> int:
+    res = 0
+    i, j = i + di, j + dj
+    while i < len(blocks) and j < len(blocks[i]) and not blocks[i][j]:
+        res += digits[(i, j)]
+        i, j = i + di, j + dj
+    return res
+
+
+def _parse_weights(value: str) -> Dict[int, float]:
+    res = {}
+    for item in value.split(','):
+        length, _, weight = item.partition('=')
+        res[int(length)] = float(weight or 1)
+    return res
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(description='Generate a uniquely solvable kakuro puzzle as CSV')
+    arg_parser.add_argument('-r', '--rows', type=int, default=12, help=f'rows including the clue row (max {MAX_SIZE})')
+    arg_parser.add_argument('-c', '--cols', type=int, default=12, help=f'columns including the clue column (max {MAX_SIZE})')
+    arg_parser.add_argument('-d', '--density', type=float, default=0.3, help='probability of a block before the layout is fixed')
+    arg_parser.add_argument('-s', '--seed', type=int, default=None)
+    arg_parser.add_argument('--max-run', type=int, default=9, help='longest run')
+    arg_parser.add_argument('--run-weights', type=_parse_weights, default=None, help='run length weights, e.g. 2=1,3=2,4=2')
+    arg_parser.add_argument('--max-nodes', type=int, default=200, help='search nodes per uniqueness check before adding givens')
+    arg_parser.add_argument('-o', '--output', help='output file, stdout by default')
+    args = arg_parser.parse_args(argv)
+
+    csv = generate(args.rows, args.cols, args.density, args.seed, args.max_run, args.run_weights, max_nodes=args.max_nodes)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(csv)
+    else:
+        sys.stdout.write(csv)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,34 @@
+from functools import reduce
+from operator import or_
+from typing import Iterable, List
+
+# digit d (1..9) is stored on bit (d - 1)
+ALL_DIGITS = 0b111111111
+
+
+def to_mask(values: Iterable[int]) -> int:
+    return reduce(or_, (1 << (v - 1) for v in values), 0)
+
+
+def mask_values(mask: int) -> List[int]:
+    return [i for i in range(1, 10) if mask & (1 << (i - 1))]
+
+
+def mask_size(mask: int) -> int:
+    return mask.bit_count()
+
+
+def mask_is_single(mask: int) -> bool:
+    return mask != 0 and mask & (mask - 1) == 0
+
+
+def mask_value(mask: int) -> int:
+    return mask.bit_length()
+
+
+def mask_lowest(mask: int) -> int:
+    return mask & -mask
+
+
+def union_masks(masks: Iterable[int]) -> int:
+    return reduce(or_, masks, 0)
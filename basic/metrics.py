@@ -0,0 +1,72 @@
+import json
+import time
+from typing import Callable, Dict, Optional
+
+from basic.mask import mask_size
+
+RULES = {
+    'a': 'a_intersection_internal',
+    'b': 'b_intersection_target_instruction',
+    'c': 'c_remove_value_from_lines',
+    'd': 'd_remove_empty_possibility',
+    'e': 'e_restore_from_backup',
+    'f': 'f_hidden_single',
+    'g': 'g_naked_subset',
+    'h': 'h_sum_bounds',
+}
+
+
+class RuleMetrics(object):
+    def __init__(self):
+        self.calls = 0
+        self.pruned = 0  # candidate digits removed
+        self.combinations = 0  # run combinations removed
+        self.time = 0.0
+
+    def to_dict(self) -> dict:
+        return {'calls': self.calls, 'pruned': self.pruned, 'combinations': self.combinations, 'time': self.time}
+
+
+class Metrics(object):
+    def __init__(self):
+        self.rules: Dict[str, RuleMetrics] = {rule: RuleMetrics() for rule in RULES}
+        self.current: Optional[RuleMetrics] = None  # rule being applied, what gets pruned is counted on it
+        self.max_depth = 0
+        self.peak_open_branches = 0
+        self.restores = 0
+
+    def measure(self, rule: str, func: Callable[..., bool], *args) -> bool:
+        rule_metrics = self.rules[rule]
+        previous, self.current = self.current, rule_metrics
+        start_time = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            rule_metrics.time += time.perf_counter() - start_time
+            rule_metrics.calls += 1
+            self.current = previous
+
+    def prune(self, sub_cell, masks, mask: int):
+        rule_metrics = self.current
+        if rule_metrics is None:
+            return
+        rule_metrics.pruned += mask_size(sub_cell.possible_mask & ~mask)
+        if sub_cell.run is sub_cell:
+            rule_metrics.combinations += len(sub_cell.possible_masks) - len(masks)
+
+    def branch(self, depth: int, open_branches: int):
+        if depth > self.max_depth:
+            self.max_depth = depth
+        if open_branches > self.peak_open_branches:
+            self.peak_open_branches = open_branches
+
+    def to_dict(self) -> dict:
+        return {
+            'rules': {name: self.rules[rule].to_dict() for rule, name in RULES.items()},
+            'max_depth': self.max_depth,
+            'peak_open_branches': self.peak_open_branches,
+            'restores': self.restores,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
@@ -0,0 +1,199 @@
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional engine
+    np = None
+
+from basic.budget import Budget
+from basic.cell import CellData, CellType, CellDirection
+from basic.mask import ALL_DIGITS
+from basic.sum_table import sum_table
+
+MAX_RUN = 9
+
+
+class NpGrid(object):
+    # flat arrays, cells are the TARGET and FIXED cells, runs have one extra row (padding / no run) at index nb_runs
+    def __init__(self, positions: List[Tuple[int, int]], candidates, cell_runs, run_cells, run_lengths, run_targets, run_combinations):
+        self.positions = positions  # (x, y) of each cell in cell_map
+        self.candidates = candidates  # uint16[nb_cells + 1], digit d on bit d-1, last one is the padding cell
+        self.cell_runs = cell_runs  # int[nb_cells, 2], across and down run of each cell
+        self.run_cells = run_cells  # int[nb_runs + 1, 9], cells of each run padded with the padding cell
+        self.run_lengths = run_lengths
+        self.run_targets = run_targets
+        self.run_combinations = run_combinations  # uint16[nb_runs + 1, max combinations], padded with 0
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError('The numpy engine needs numpy (pip install numpy)')
+
+
+_POPCOUNT = None
+_BITS = None
+
+
+def _tables():
+    global _POPCOUNT, _BITS
+    if _POPCOUNT is None:
+        _POPCOUNT = np.array([bin(i).count('1') for i in range(ALL_DIGITS + 1)], dtype=np.uint8)
+        _BITS = (1 << np.arange(9)).astype(np.uint16)
+    return _POPCOUNT, _BITS
+
+
+# ##### COMPILE - CellData to arrays #####
+def compile_grid(cell_data: CellData) -> NpGrid:
+    _require_numpy()
+    index: Dict[Tuple[int, int], int] = {}
+    positions = []
+    for x in range(1, len(cell_data.cell_map) + 1):
+        for y in range(1, len(cell_data.cell_map[x]) + 1):
+            cell = cell_data.cell_map[x][y]
+            if cell.type in (CellType.TARGET, CellType.FIXED):
+                index[(x, y)] = len(positions)
+                positions.append((x, y))
+    nb_cells = len(positions)
+
+    runs = [sub_cell for instr in cell_data.instr for sub_cell in (instr.right, instr.down) if sub_cell]
+    nb_runs = len(runs)
+    run_cells = np.full((nb_runs + 1, MAX_RUN), nb_cells, dtype=np.int64)
+    cell_runs = np.full((nb_cells, 2), nb_runs, dtype=np.int64)
+    run_lengths = np.zeros(nb_runs + 1, dtype=np.int64)
+    run_targets = np.zeros(nb_runs + 1, dtype=np.int64)
+    combinations = []
+    candidates = np.full(nb_cells + 1, ALL_DIGITS, dtype=np.uint16)
+    candidates[nb_cells] = 0
+
+    for r, run in enumerate(runs):
+        cells = [index[(c.position.x, c.position.y)] for c in run.associated_cells]
+        run_lengths[r] = len(cells)
+        run_targets[r] = run.fixed_value
+        combinations.append(sum_table.get_combinations(len(cells), run.fixed_value) if len(cells) <= MAX_RUN else ())
+        run_cells[r, :min(len(cells), MAX_RUN)] = cells[:MAX_RUN]
+        for k in cells:
+            cell_runs[k, 0 if run.direction == CellDirection.RIGHT else 1] = r
+
+    for k, (x, y) in enumerate(positions):
+        cell = cell_data.cell_map[x][y]
+        if cell.type == CellType.FIXED:
+            sub_cell = cell.down if cell.down else cell.right
+            candidates[k] = 1 << (sub_cell.fixed_value - 1)
+
+    width = max((len(i) for i in combinations), default=0) or 1
+    run_combinations = np.zeros((nb_runs + 1, width), dtype=np.uint16)
+    for r, masks in enumerate(combinations):
+        run_combinations[r, :len(masks)] = masks
+    return NpGrid(positions, candidates, cell_runs, run_cells, run_lengths, run_targets, run_combinations)
+
+
+# ##### PROPAGATE - every rule is applied to all the runs at once, until nothing changes #####
+def propagate(grid: NpGrid, candidates, budget: Optional[Budget] = None) -> bool:
+    # candidates is reduced in place, False on conflict
+    popcount, bits = _tables()
+    run_cells = grid.run_cells
+    combinations = grid.run_combinations
+    across, down = grid.cell_runs[:, 0], grid.cell_runs[:, 1]
+    padding = (run_cells == len(grid.positions))[:, None, :]
+    while True:
+        if budget is not None:
+            budget.step()
+        # combinations still possible: each cell of the run keeps one of its digits, all of them are somewhere in the run
+        in_run = candidates[run_cells]
+        union = np.bitwise_or.reduce(in_run, axis=1)
+        hits = ((in_run[:, None, :] & combinations[:, :, None]) != 0) | padding
+        valid = (combinations != 0) & hits.all(axis=2) & ((combinations & ~union[:, None]) == 0)
+        allowed = np.bitwise_or.reduce(np.where(valid, combinations, 0), axis=1)
+        must = np.bitwise_and.reduce(np.where(valid, combinations, ALL_DIGITS), axis=1)
+        allowed[-1] = ALL_DIGITS
+        must[-1] = 0
+        if not allowed.all():
+            return False
+
+        # solved digits are removed from the other cells of both runs, the same digit twice is a conflict
+        singles = np.where(popcount[candidates] == 1, candidates, 0).astype(np.uint16)
+        singles_in_run = singles[run_cells]
+        run_singles = np.bitwise_or.reduce(singles_in_run, axis=1)
+        if (popcount[run_singles] != (singles_in_run != 0).sum(axis=1)).any():
+            return False
+        taken = (run_singles[across] | run_singles[down]) & ~singles[:-1]
+        reduced = candidates.copy()
+        reduced[:-1] &= allowed[across] & allowed[down] & ~taken
+
+        # a digit every combination needs that fits in a single cell of the run goes there
+        has_digit = (reduced[run_cells][:, :, None] & bits) != 0
+        counts = has_digit.sum(axis=1)
+        needed = (must[:, None] & bits) != 0
+        if (needed & (counts == 0)).any():
+            return False
+        runs, digits = np.nonzero(needed & (counts == 1))
+        if len(runs):
+            cells = run_cells[runs, has_digit[runs, :, digits].argmax(axis=1)]
+            np.bitwise_and.at(reduced, cells, bits[digits])
+
+        if not reduced[:-1].all():
+            return False
+        if np.array_equal(reduced, candidates):
+            return True
+        candidates[:] = reduced
+
+
+# ##### SEARCH - depth first, fewest candidates first, one candidates array per level #####
+def search(grid: NpGrid, cell_data: Optional[CellData] = None, candidates=None):
+    # returns the solved candidates or None, node counts are added to cell_data; candidates may be already propagated
+    popcount, _ = _tables()
+    budget = cell_data.budget if cell_data is not None else None
+    if candidates is None:
+        candidates = grid.candidates.copy()
+        if not propagate(grid, candidates, budget):
+            return None
+    cell = _next_cell(candidates, popcount)
+    if cell is None:
+        return candidates
+    stack = [[candidates, cell, int(candidates[cell])]]  # [candidates, branch cell, values not tried yet]
+    while stack:
+        frame = stack[-1]
+        if frame[2] == 0:
+            stack.pop()
+            continue
+        if budget is not None:
+            budget.node()
+        bit = frame[2] & -frame[2]
+        frame[2] &= ~bit
+        candidates = frame[0].copy()
+        candidates[frame[1]] = bit
+        if cell_data is not None:
+            cell_data.branch_count += 1
+        if not propagate(grid, candidates, budget):
+            if cell_data is not None:
+                cell_data.failed_branch += 1
+            continue
+        cell = _next_cell(candidates, popcount)
+        if cell is None:
+            return candidates
+        stack.append([candidates, cell, int(candidates[cell])])
+    return None
+
+
+def _next_cell(candidates, popcount) -> Optional[int]:
+    sizes = popcount[candidates[:-1]]
+    sizes = np.where(sizes > 1, sizes, 99)
+    cell = int(sizes.argmin()) if len(sizes) else 0
+    return cell if len(sizes) and sizes[cell] != 99 else None
+
+
+def solve_cell_data(cell_data: CellData) -> bool:
+    # solves with the arrays and writes the digits back into the SubCells
+    grid = compile_grid(cell_data)
+    candidates = search(grid, cell_data)
+    if candidates is None:
+        return False
+    for (x, y), bit in zip(grid.positions, candidates[:-1].tolist()):
+        cell = cell_data.cell_map[x][y]
+        for sub_cell in (cell.down, cell.right):
+            if sub_cell:
+                sub_cell.possible_values = [[j for j in i if 1 << (j - 1) == bit] for i in sub_cell.possible_values]
+                sub_cell.build_set()
+                sub_cell.possible_masks = [m & bit for m in sub_cell.possible_masks]
+                sub_cell.possible_mask = bit
+    return True
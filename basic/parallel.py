@@ -0,0 +1,142 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed, TimeoutError
+from typing import List, Optional, Tuple
+
+from basic.budget import Budget, SearchLimit
+from basic.cell import CellData, BranchIndex, _cell_mask, _search_assign
+from basic.mask import mask_lowest
+from basic.parser import parse_lines
+from basic.solver import SolveResult, SolveStatus
+
+logger = logging.getLogger(__name__)
+
+_worker_cell_data: Optional[CellData] = None
+_worker_stop = None
+
+
+def solve_parallel(filename: str, workers: Optional[int] = None, split_size: Optional[int] = None,
+                   timeout: Optional[float] = None) -> SolveResult:
+    start_time = time.time()
+    with open(filename) as f:
+        lines = f.readlines()
+    cell_data = parse_lines(lines, True)
+    parse_time = time.time()
+
+    workers = workers or os.cpu_count()
+    tasks, solution = split(cell_data, split_size or workers * 8)
+    status = SolveStatus.SOLVED if solution is not None else SolveStatus.UNSAT
+    logger.debug('## %s subproblems for %s workers', len(tasks), workers)
+    if tasks:
+        context = multiprocessing.get_context()
+        stop = context.Event()
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(lines, stop)) as executor:
+            # many more subproblems than workers, an idle worker takes the next one
+            futures = [executor.submit(_solve_task, data) for data in tasks]
+            try:
+                for future in as_completed(futures, timeout=timeout - (time.time() - start_time) if timeout else None):
+                    found, branch_count, failed_branch = future.result()
+                    cell_data.branch_count += branch_count
+                    cell_data.failed_branch += failed_branch
+                    if found is not None:
+                        solution = found
+                        status = SolveStatus.SOLVED
+                        break
+            except TimeoutError:
+                status = SolveStatus.TIMEOUT
+            finally:
+                stop.set()
+                for future in futures:
+                    future.cancel()
+
+    if solution is not None:
+        cell_data.restore(solution)
+    solve_time = time.time()
+    return SolveResult(status, cell_data, {
+        'parse_time': parse_time - start_time,
+        'solve_time': solve_time - parse_time,
+        'branch_count': cell_data.branch_count,
+        'failed_branch': cell_data.failed_branch,
+        'subproblems': len(tasks),
+    })
+
+
+# ##### SPLIT - expand the first choice points breadth first until there are enough open subproblems #####
+def split(cell_data: CellData, size: int) -> Tuple[List[bytes], Optional[bytes]]:
+    # returns the snapshots of the open subproblems, or the snapshot of a solution met on the way
+    cell_data.propagate_to_fixpoint()
+    if cell_data.conflict:
+        cell_data.clear_queue()
+        return [], None
+
+    frontier = [cell_data.snapshot()]
+    while len(frontier) < size:
+        next_frontier = []
+        for data in frontier:
+            cell_data.restore(data)
+            cell = BranchIndex(cell_data).pop()
+            if cell is None:
+                return [], data
+            mask = _cell_mask(cell)
+            while mask:
+                bit = mask_lowest(mask)
+                mask &= ~bit
+                cell_data.branch_count += 1
+                cell_data.push_mark()
+                _search_assign(cell_data, cell, bit)
+                cell_data.propagate_to_fixpoint()
+                if cell_data.conflict:
+                    cell_data.failed_branch += 1
+                    cell_data.clear_queue()
+                else:
+                    next_frontier.append(cell_data.snapshot())
+                cell_data.undo()
+        if not next_frontier:
+            return [], None
+        frontier = next_frontier
+    return frontier, None
+
+
+def _init_worker(lines: List[str], stop):
+    global _worker_cell_data, _worker_stop
+    _worker_cell_data = parse_lines(lines, True)
+    _worker_stop = stop
+
+
+def _solve_task(data: bytes) -> Tuple[Optional[bytes], int, int]:
+    cell_data = _worker_cell_data
+    if _worker_stop.is_set():
+        return None, 0, 0
+    cell_data.restore(data)
+    branch_count, failed_branch = cell_data.branch_count, cell_data.failed_branch
+    cell_data.budget = Budget(cancel=_worker_stop)
+    try:
+        solved = cell_data.search()
+    except SearchLimit:
+        solved = False
+    finally:
+        cell_data.budget = None
+    return cell_data.snapshot() if solved else None, cell_data.branch_count - branch_count, cell_data.failed_branch - failed_branch
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(description='Solve one kakuro puzzle with the search tree split across processes')
+    arg_parser.add_argument('puzzle')
+    arg_parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    arg_parser.add_argument('-s', '--split', type=int, default=None, help='number of subproblems to create (8 per worker by default)')
+    arg_parser.add_argument('-t', '--timeout', type=float, default=None, help='timeout in seconds')
+    args = arg_parser.parse_args(argv)
+
+    result = solve_parallel(args.puzzle, args.workers, args.split, args.timeout)
+    result.cell_data.print_res()
+    logger.info('## %s %s', result.status.name, result.stats)
+    return 0 if result.status == SolveStatus.SOLVED else 1
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    sys.exit(main())
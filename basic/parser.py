@@ -1,31 +1,39 @@
-from collections import defaultdict
 from typing import Dict, List
 
 from basic.cell import Cell, CellType, SubCell, CellData, CellDirection
+from basic.mask import to_mask, mask_values, union_masks
+from basic.sum_table import sum_table
 
-sum_map: Dict[int, Dict[int, List[List[int]]]] = defaultdict(dict)
+
+def parser(filename: str, use_mask: bool = False) -> CellData:
+    with open(filename) as f:
+        return parse_lines(f.readlines(), use_mask)
 
 
-def parser(filename: str) -> CellData:
-    cell_data = CellData()
+def parse_lines(lines: List[str], use_mask: bool = False) -> CellData:
+    cell_data = CellData(use_mask)
     col_list: Dict[int, Cell] = {}
     line_list: Dict[int, Cell] = {}
-    with open(filename) as f:
-        lines = f.readlines()
-        i = 0
-        for line in lines:
-            i += 1
-            j = 0
-            for c in line.split(','):
-                j += 1
-                cell = Cell(c, i, j)
-                handle_cell(cell, i, j, cell_data, col_list, line_list)
+    i = 0
+    for line in lines:
+        i += 1
+        j = 0
+        for c in line.split(','):
+            j += 1
+            cell = Cell(c, i, j, use_mask)
+            handle_cell(cell, i, j, cell_data, col_list, line_list)
+    fill_cell_data(cell_data, use_mask)
+    return cell_data
 
-    for cell in cell_data.instr:
-        _fill_possibilities(cell.right, CellDirection.RIGHT)
-        _fill_possibilities(cell.down, CellDirection.DOWN)
 
-    return cell_data
+def fill_cell_data(cell_data: CellData, use_mask: bool = False):
+    # once every cell is placed: combinations of the runs, initial candidates of the cells
+    fill_possibilities = _fill_possibilities_mask if use_mask else _fill_possibilities
+    for cell in cell_data.instr:
+        fill_possibilities(cell.right, CellDirection.RIGHT)
+        fill_possibilities(cell.down, CellDirection.DOWN)
+    if use_mask:
+        cell_data.schedule_all()
 
 
 def handle_cell(cell: Cell, i: int, j: int, cell_data: CellData, col_list: Dict[int, Cell], line_list: Dict[int, Cell]):
@@ -44,9 +52,17 @@ def handle_cell(cell: Cell, i: int, j: int, cell_data: CellData, col_list: Dict[
         if col_instr and col_instr.down:
             col_instr.down.associated_cells.append(cell)
             cell.down.associated_cells.append(col_instr)
+            cell.down.run = col_instr.down
         if line_instr and line_instr.right:
             line_instr.right.associated_cells.append(cell)
             cell.right.associated_cells.append(line_instr)
+            cell.right.run = line_instr.right
+        if cell.type != CellType.EMPTY:
+            # a cell covered by a single run is not constrained in the other direction
+            if not (col_instr and col_instr.down):
+                cell.down = None
+            if not (line_instr and line_instr.right):
+                cell.right = None
 
 
 def _fill_possibilities(instr: SubCell, direction: CellDirection):
@@ -71,22 +87,28 @@ def _fill_possibilities(instr: SubCell, direction: CellDirection):
         sub_cell.build_set()
 
 
+def _fill_possibilities_mask(instr: SubCell, direction: CellDirection):
+    if instr is None:
+        return
+
+    nb = len(instr.associated_cells)
+    sums = sum_table.get_combinations(nb, instr.fixed_value)
+
+    fixed_mask = to_mask(f.get_sub_cell(direction).fixed_value for f in instr.associated_cells if f.type == CellType.FIXED)
+    filtered_sums = tuple(s for s in sums if s & fixed_mask) if fixed_mask else sums
+
+    # one immutable tuple for the instruction and one for all its cells, the table one when no digit is fixed
+    instr.possible_masks = filtered_sums
+    instr.build_mask()
+    target_sums = tuple(s & ~fixed_mask for s in filtered_sums) if fixed_mask else filtered_sums
+    target_mask = union_masks(target_sums)
+    for cell in instr.associated_cells:
+        if cell.type == CellType.FIXED:
+            continue
+        sub_cell = cell.get_sub_cell(direction)
+        sub_cell.possible_masks = target_sums
+        sub_cell.possible_mask = target_mask
+
+
 def _get_possibilities(nb: int, target: int) -> List[List[int]]:
-    res_list = sum_map[target].get(nb)
-    if res_list:
-        return res_list
-    sums = _get_sums(nb, target, [])
-    sum_map[target][nb] = sums
-    return sums
-
-
-def _get_sums(nb: int, target: int, res: list[int]) -> List[List[int]]:
-    first = res[-1] + 1 if len(res) > 0 else 1
-    if len(res) == nb:
-        return [res] if sum(res) == target else []
-    if first > 9 or len(res) > nb or sum(res) > target:
-        return []
-
-    possibilities = [res + [i] for i in range(first, 10)]
-    sums_possibilities = [_get_sums(nb, target, i) for i in possibilities]
-    return [i for j in sums_possibilities for i in j]
+    return [mask_values(m) for m in sum_table.get_combinations(nb, target)]
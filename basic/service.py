@@ -0,0 +1,233 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+from basic.parser import parse_lines
+from basic.budget import Budget, SearchLimit
+from basic.solver import solve, count_solutions
+from basic.sum_table import sum_table
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY = 1024 * 1024
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+           500: 'Internal Server Error', 503: 'Service Unavailable', 504: 'Gateway Timeout'}
+
+
+class RequestError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+class SolverService(object):
+    # HTTP/1.1 front, the solves run in a process pool whose workers keep the tables loaded
+    def __init__(self, workers: Optional[int] = None, max_pending: int = 64, timeout: float = 10.0):
+        self.workers = workers or os.cpu_count()
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.executor = ProcessPoolExecutor(self.workers, initializer=_init_worker)
+        self.pending = 0
+        self.started = time.time()
+        self.counters = {'requests': 0, 'solved': 0, 'unsat': 0, 'timeout': 0, 'rejected': 0, 'errors': 0}
+        self.solve_time = 0.0
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                try:
+                    code, res = await self.route(method, path, headers, body)
+                except RequestError as e:
+                    code, res = e.code, {'error': str(e)}
+                except Exception as e:
+                    # a broken pool or a bug: the client still gets an answer and the connection stays usable
+                    logger.exception('## Request %s %s failed', method, path)
+                    self.counters['errors'] += 1
+                    code, res = 500, {'error': f'{type(e).__name__}: {e}'}
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                _write_response(writer, code, res, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except RequestError as e:
+            _write_response(writer, e.code, {'error': str(e)}, False)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method: str, path: str, headers: dict, body: bytes) -> Tuple[int, dict]:
+        path = path.split('?')[0]
+        if path == '/health':
+            return 200, {'status': 'ok', 'workers': self.workers, 'pending': self.pending, 'max_pending': self.max_pending}
+        if path == '/metrics':
+            return 200, self.metrics()
+        if path not in ('/solve', '/count'):
+            raise RequestError(404, f'Unknown path {path}')
+        if method != 'POST':
+            raise RequestError(405, f'{path} expects a POST')
+        self.counters['requests'] += 1
+        return await self.solve(path == '/count', headers, body)
+
+    async def solve(self, count: bool, headers: dict, body: bytes) -> Tuple[int, dict]:
+        lines, timeout, rules, limit = _read_payload(headers, body, self.timeout)
+        if self.pending >= self.max_pending:
+            self.counters['rejected'] += 1
+            raise RequestError(503, 'Too many pending requests')
+
+        self.pending += 1
+        start_time = time.time()
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self.executor, _solve_lines, lines, timeout, rules, limit if count else None)
+            # the worker stops itself at the deadline, the margin covers the queueing
+            res = await asyncio.wait_for(future, timeout + 1)
+        except asyncio.TimeoutError:
+            self.counters['timeout'] += 1
+            raise RequestError(504, f'No answer within {timeout}s')
+        finally:
+            self.pending -= 1
+            self.solve_time += time.time() - start_time
+
+        status = res.get('outcome' if count else 'status', '')
+        if status.startswith('error'):
+            self.counters['errors'] += 1
+            return 400, res
+        key = 'solved' if status in ('solved', 'unique', 'multiple') else status
+        self.counters[key] = self.counters.get(key, 0) + 1
+        return 200, res
+
+    def metrics(self) -> dict:
+        done = sum(self.counters[k] for k in ('solved', 'unsat', 'timeout', 'errors'))
+        return {
+            **self.counters,
+            'pending': self.pending,
+            'uptime': time.time() - self.started,
+            'average_time': self.solve_time / done if done else 0.0,
+        }
+
+    async def warm_up(self):
+        # starts every worker now rather than on the first requests
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(self.executor, _init_worker) for _ in range(self.workers)])
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+def _init_worker():
+    sum_table.get_combinations(2, 3)  # loaded on import, kept for the life of the worker
+
+
+def _solve_lines(lines: List[str], timeout: float, rules: Optional[List[str]], limit: Optional[int]) -> dict:
+    budget = Budget(timeout)
+    try:
+        cell_data = parse_lines(lines, True)
+        if rules:
+            cell_data.set_rules(rules)
+        if limit:
+            return count_solutions(cell_data, limit, budget=budget).to_dict()
+        res = solve(cell_data, budget=budget).to_dict()
+        res.pop('metrics', None)
+        return res
+    except SearchLimit:
+        return {'outcome': budget.exhausted}
+    except Exception as e:
+        return {'outcome' if limit else 'status': f'error: {e}'}
+
+
+def _read_payload(headers: dict, body: bytes, default_timeout: float) -> Tuple[List[str], float, Optional[List[str]], int]:
+    # CSV as is, or JSON {"puzzle": "<csv>" | [[cell, ...], ...], "timeout": s, "rules": [...], "limit": n}
+    try:
+        text = body.decode()
+    except UnicodeDecodeError:
+        raise RequestError(400, 'Body is not UTF-8')
+    if 'json' not in headers.get('content-type', ''):
+        return text.splitlines(), default_timeout, None, 2
+    try:
+        payload = json.loads(text)
+        puzzle = payload['puzzle']
+        lines = puzzle.splitlines() if isinstance(puzzle, str) else [','.join(str(c) for c in row) for row in puzzle]
+        timeout = min(float(payload.get('timeout', default_timeout)), default_timeout)
+        return lines, timeout, payload.get('rules'), int(payload.get('limit', 2))
+    except (ValueError, KeyError, TypeError) as e:
+        raise RequestError(400, f'Invalid JSON payload: {e}')
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, dict, bytes]]:
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, path, _ = line.decode('latin-1').split(' ', 2)
+    except ValueError:
+        raise RequestError(400, 'Invalid request line')
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get('content-length', 0) or 0)
+    except ValueError:
+        raise RequestError(400, 'Invalid Content-Length')
+    if length > MAX_BODY:
+        raise RequestError(413, f'Body larger than {MAX_BODY} bytes')
+    body = await reader.readexactly(length) if length else b''
+    return method.upper(), path, headers, body
+
+
+def _write_response(writer: asyncio.StreamWriter, code: int, res: dict, keep_alive: bool):
+    body = json.dumps(res).encode()
+    head = [f'HTTP/1.1 {code} {REASONS.get(code, "")}', 'Content-Type: application/json', f'Content-Length: {len(body)}',
+            f'Connection: {"keep-alive" if keep_alive else "close"}']
+    if code == 503:
+        head.append('Retry-After: 1')
+    writer.write(('\r\n'.join(head) + '\r\n\r\n').encode() + body)
+
+
+async def serve(service: SolverService, host: str = '127.0.0.1', port: int = 8765, unix: Optional[str] = None):
+    await service.warm_up()
+    if unix:
+        server = await asyncio.start_unix_server(service.handle_client, unix)
+    else:
+        server = await asyncio.start_server(service.handle_client, host, port)
+    logger.info('## Listening on %s', unix or f'http://{host}:{port}')
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(description='Kakuro solver service: POST /solve, POST /count, GET /health, GET /metrics')
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('-p', '--port', type=int, default=8765)
+    arg_parser.add_argument('--unix', help='listen on this unix socket instead')
+    arg_parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    arg_parser.add_argument('--max-pending', type=int, default=64, help='requests solving or waiting before answering 503')
+    arg_parser.add_argument('-t', '--timeout', type=float, default=10.0, help='default and maximum time per request in seconds')
+    args = arg_parser.parse_args(argv)
+
+    service = SolverService(args.workers, args.max_pending, args.timeout)
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    sys.exit(main())
@@ -0,0 +1,144 @@
+from typing import List, Optional, Tuple
+
+from basic.budget import Budget, SearchLimit
+from basic.cell import CellData, CellType, Cell, _cell_mask, _search_assign
+from basic.mask import mask_is_single, mask_lowest, mask_value, mask_values
+from basic.solver import get_grid
+
+Move = Tuple[int, int, int, bool]  # x, y, digit, consistent with the puzzle and the moves before it
+
+
+class Session(object):
+    # a puzzle filled in by hand: every move is a choice point on the CellData trail, only the runs of the cell are
+    # propagated again and reverting a move is an undo; positions are the cell_map ones, row x and column y from 1
+    def __init__(self, cell_data: CellData):
+        if not cell_data.use_mask:
+            raise ValueError('A session needs a puzzle parsed with use_mask=True')
+        self.cell_data = cell_data
+        self.moves: List[Move] = []
+        cell_data.propagate_to_fixpoint()
+        self.unsat = cell_data.conflict  # no solution whatever the moves
+        cell_data.clear_queue()
+
+    def assign(self, x: int, y: int, digit: int) -> bool:
+        # False when the digit conflicts with the puzzle or the previous moves, the move is kept all the same
+        cell = self._cell(x, y)
+        if not 1 <= digit <= 9:
+            raise ValueError(f'Invalid digit [{digit}]')
+        if self._move_index(x, y) is not None:
+            self.unassign(x, y)
+        cell_data = self.cell_data
+        bit = 1 << (digit - 1)
+        cell_data.push_mark()
+        consistent = bool(_cell_mask(cell) & bit)
+        if consistent:
+            _search_assign(cell_data, cell, bit)
+            cell_data.propagate_to_fixpoint()
+            consistent = not cell_data.conflict
+            cell_data.clear_queue()
+        self.moves.append((x, y, digit, consistent))
+        return consistent
+
+    def unassign(self, x: int, y: int) -> bool:
+        # the moves made after this one are undone and played again
+        index = self._move_index(x, y)
+        if index is None:
+            return False
+        later = self.moves[index + 1:]
+        for _ in range(len(self.moves) - index):
+            self.cell_data.undo()
+        del self.moves[index:]
+        for move in later:
+            self.assign(*move[:3])
+        return True
+
+    def revert(self) -> Optional[Move]:
+        if not self.moves:
+            return None
+        self.cell_data.undo()
+        return self.moves.pop()
+
+    def is_consistent(self) -> bool:
+        # propagation found no conflict, the puzzle may still have no solution
+        return not self.unsat and all(move[3] for move in self.moves)
+
+    def candidates(self, x: int, y: int) -> List[int]:
+        return mask_values(_cell_mask(self._cell(x, y)))
+
+    def is_solvable(self, budget: Optional[Budget] = None) -> Optional[bool]:
+        # None when the budget ran out first
+        if not self.is_consistent():
+            return False
+        res = self._search(budget)
+        return None if res is None else bool(res)
+
+    def solution(self, budget: Optional[Budget] = None) -> Optional[List[List[int]]]:
+        # a solution keeping every move, None if there is none or the budget ran out
+        if not self.is_consistent():
+            return None
+        return self._search(budget) or None
+
+    def next_forced(self, probe: bool = True) -> Optional[Tuple[int, int, int]]:
+        # first cell without a move whose digit is known: a single candidate left, else (probe) a single candidate
+        # that does not fail at once when assigned
+        if not self.is_consistent():
+            return None
+        cells = self._open_cells()
+        for cell in cells:
+            mask = _cell_mask(cell)
+            if mask_is_single(mask):
+                return cell.position.x, cell.position.y, mask_value(mask)
+        if not probe:
+            return None
+        cell_data = self.cell_data
+        for cell in sorted(cells, key=lambda c: _cell_mask(c).bit_count()):
+            mask = left = _cell_mask(cell)
+            while mask:
+                bit = mask_lowest(mask)
+                mask &= ~bit
+                cell_data.push_mark()
+                _search_assign(cell_data, cell, bit)
+                cell_data.propagate_to_fixpoint()
+                if cell_data.conflict:
+                    left &= ~bit
+                cell_data.clear_queue()
+                cell_data.undo()
+            if mask_is_single(left):
+                return cell.position.x, cell.position.y, mask_value(left)
+        return None
+
+    def _search(self, budget: Optional[Budget]) -> Optional[List[List[int]]]:
+        # grid of the first solution, [] when there is none, None when the budget ran out; the session is left as it was
+        cell_data = self.cell_data
+        depth = len(cell_data.trail_marks)
+        cell_data.push_mark()
+        cell_data.budget = budget
+        try:
+            return get_grid(cell_data) if cell_data.search() else []
+        except SearchLimit:
+            return None
+        finally:
+            cell_data.budget = None
+            cell_data.clear_queue()
+            while len(cell_data.trail_marks) > depth:
+                cell_data.undo()
+            # what the search learned holds with the current moves only
+            cell_data.nogoods.clear()
+            cell_data.nogood_count = 0
+
+    def _open_cells(self) -> List[Cell]:
+        moved = {(move[0], move[1]) for move in self.moves}
+        return [cell for line in self.cell_data.cell_map.values() for cell in line.values()
+                if cell.type == CellType.TARGET and (cell.down or cell.right) and (cell.position.x, cell.position.y) not in moved]
+
+    def _cell(self, x: int, y: int) -> Cell:
+        cell = self.cell_data.cell_map.get(x, {}).get(y)
+        if cell is None or cell.type != CellType.TARGET or not (cell.down or cell.right):
+            raise ValueError(f'No cell to fill at [{x}-{y}]')
+        return cell
+
+    def _move_index(self, x: int, y: int) -> Optional[int]:
+        for index in range(len(self.moves) - 1, -1, -1):
+            if self.moves[index][:2] == (x, y):
+                return index
+        return None
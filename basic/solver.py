@@ -0,0 +1,260 @@
+import logging
+import time
+from enum import Enum
+from typing import List, Optional, Set, Tuple, Union
+
+from basic.budget import Budget, SearchLimit
+from basic.cell import CellData, CellType, NoSolution, SubCell, get_cells, cell_filter_target, _cell_mask
+from basic.mask import mask_values
+from basic.metrics import Metrics
+from basic.parser import parser
+from basic import trace as tracing
+
+logger = logging.getLogger(__name__)
+
+
+class SolveStatus(Enum):
+    SOLVED = 1
+    UNSAT = 2
+    TIMEOUT = 3
+    LIMIT = 4  # node or step budget spent
+    CANCELLED = 5
+
+
+STOPPED = {'timeout': SolveStatus.TIMEOUT, 'nodes': SolveStatus.LIMIT, 'steps': SolveStatus.LIMIT, 'cancelled': SolveStatus.CANCELLED}
+
+
+class SolveResult(object):
+    def __init__(self, status: SolveStatus, cell_data: Optional[CellData], stats: dict, grid: Optional[List[List[int]]] = None,
+                 domains: Optional[List[List[List[int]]]] = None):
+        self.status = status
+        self.cell_data = cell_data
+        if grid is None:
+            grid = get_grid(cell_data) if cell_data and status == SolveStatus.SOLVED else []
+        self.grid: List[List[int]] = grid
+        # stopped by the budget: candidates of every cell, as far as the solver got without any choice
+        if domains is None:
+            domains = get_domains(cell_data) if cell_data and status in STOPPED.values() else []
+        self.domains: List[List[List[int]]] = domains
+        self.stats = stats
+
+    def to_dict(self) -> dict:
+        res = {'status': self.status.name.lower(), 'grid': self.grid, **self.stats}
+        if self.domains:
+            res['domains'] = self.domains
+        return res
+
+    @staticmethod
+    def from_dict(data: dict) -> 'SolveResult':
+        stats = {k: v for k, v in data.items() if k not in ('status', 'grid', 'domains')}
+        return SolveResult(SolveStatus[data['status'].upper()], None, stats, [list(line) for line in data['grid']],
+                           [[list(cell) for cell in line] for line in data.get('domains', [])])
+
+
+class SolutionCount(Enum):
+    UNSAT = 0
+    UNIQUE = 1
+    MULTIPLE = 2
+
+
+class CountResult(object):
+    def __init__(self, outcome: SolutionCount, solutions: List[List[List[int]]], stats: dict):
+        self.outcome = outcome
+        self.solutions = solutions  # grids of the solutions found, at most limit
+        self.stats = stats
+
+    def to_dict(self) -> dict:
+        return {'outcome': self.outcome.name.lower(), 'count': len(self.solutions), 'solutions': self.solutions, **self.stats}
+
+
+def solve(puzzle: Union[str, CellData], use_mask: bool = True, timeout: Optional[float] = None, metrics: bool = False,
+          use_numpy: bool = False, rules: Optional[List[str]] = None, budget: Optional[Budget] = None) -> SolveResult:
+    # timeout is a shortcut for a budget with only a deadline
+    start_time = time.time()
+    cell_data = parser(puzzle, use_mask) if isinstance(puzzle, str) else puzzle
+    if rules:
+        cell_data.set_rules(rules)
+    if metrics:
+        cell_data.metrics = Metrics()
+    if budget is None and timeout is not None:
+        budget = Budget(timeout)
+    cell_data.budget = budget
+    parse_time = time.time()
+    logger.debug('## Parsing OK %s', parse_time - start_time)
+
+    trace = cell_data.trace
+    if trace is not None:
+        trace.event(tracing.START)
+    try:
+        status = SolveStatus.SOLVED if _solve(cell_data, use_numpy) else SolveStatus.UNSAT
+    except SearchLimit as e:
+        logger.debug('## Stopped: %s', e)
+        status = STOPPED[budget.exhausted]
+    finally:
+        cell_data.budget = None
+    if trace is not None:
+        # a stop may come before any search, during the first propagation
+        outcome = tracing.SOLVED if status == SolveStatus.SOLVED else tracing.UNSAT if status == SolveStatus.UNSAT else tracing.STOPPED
+        trace.event(tracing.END, digit=outcome)
+
+    solve_time = time.time()
+    logger.debug('## Solve %s %s', status.name, solve_time - parse_time)
+    stats = {
+        'parse_time': parse_time - start_time,
+        'solve_time': solve_time - parse_time,
+        'branch_count': cell_data.branch_count,
+        'failed_branch': cell_data.failed_branch,
+        'backjumps': cell_data.backjumps,
+        'nogoods': cell_data.nogood_count,
+    }
+    if budget is not None:
+        stats['budget'] = budget.to_dict()
+    if cell_data.metrics is not None:
+        stats['metrics'] = cell_data.metrics.to_dict()
+    return SolveResult(status, cell_data, stats)
+
+
+def _solve(cell_data: CellData, use_numpy: bool = False) -> bool:
+    if use_numpy:
+        from basic.np_engine import solve_cell_data
+        return solve_cell_data(cell_data)
+    if cell_data.use_mask:
+        from basic.components import search_components
+        return search_components(cell_data)
+
+    trace = cell_data.trace
+    root = None  # the lists before the first choice, a budget stop goes back to them
+    try:
+        cells_size = len(cell_data.active_cells())
+        if not cells_size and cell_data.is_invalid():
+            return False  # the fixed digits alone break a run, the loop below would not look at it
+        while cells_size > 0:
+            has_changed = _reduce_loop(cell_data)
+            if not has_changed:
+                if trace is not None and cell_data.active_branch:
+                    trace.event(tracing.FIXPOINT, cell_data.active_branch - 1)
+                if not cell_data.active_branch:
+                    root = _save_lists(cell_data)
+                cell_data.create_branches()
+            if cell_data.is_invalid():
+                if trace is not None and cell_data.active_branch:
+                    trace.event(tracing.CONFLICT, cell_data.active_branch - 1)
+                cell_data.restore_from_backup()
+            cells_size = len(cell_data.active_cells())
+    except NoSolution as e:
+        logger.debug('## No solution: %s', e)
+        return False
+    except SearchLimit:
+        if root is not None:
+            _restore_lists(cell_data, root)
+        raise
+    return True
+
+
+def _save_lists(cell_data: CellData) -> List[Tuple[SubCell, List[List[int]], Set[int]]]:
+    # the inner lists are edited in place, the sets are only ever replaced
+    return [(sub_cell, [list(values) for values in sub_cell.possible_values], sub_cell.possible_values_set)
+            for cell in get_cells(cell_data.cell_map) for sub_cell in (cell.down, cell.right) if sub_cell]
+
+
+def _restore_lists(cell_data: CellData, saved: List[Tuple[SubCell, List[List[int]], Set[int]]]):
+    # the branches taken below the root are guesses, nothing of them is kept
+    for sub_cell, values, values_set in saved:
+        sub_cell.possible_values = values
+        sub_cell.possible_values_set = values_set
+        sub_cell.possible_values_backup.clear()
+    cell_data.active_branch = 0
+
+
+def count_solutions(puzzle: Union[str, CellData], limit: int = 2, max_nodes: Optional[int] = None,
+                    timeout: Optional[float] = None, budget: Optional[Budget] = None) -> CountResult:
+    # the search goes on after each solution and stops as soon as limit solutions are found
+    # SearchLimit once the budget (or max_nodes / timeout) is spent, the count would not mean anything
+    start_time = time.time()
+    cell_data = parser(puzzle, True) if isinstance(puzzle, str) else puzzle
+    if not cell_data.use_mask:
+        raise ValueError('Counting solutions needs a puzzle parsed with use_mask=True')
+    solutions = []
+
+    def on_solution() -> bool:
+        solutions.append(get_grid(cell_data))
+        return len(solutions) >= limit
+
+    if budget is None and (max_nodes is not None or timeout is not None):
+        budget = Budget(timeout, max_nodes)
+    cell_data.budget = budget
+    try:
+        cell_data.search(on_solution)
+    finally:
+        cell_data.budget = None
+    outcome = SolutionCount.UNSAT if not solutions else SolutionCount.UNIQUE if len(solutions) == 1 else SolutionCount.MULTIPLE
+    return CountResult(outcome, solutions, {
+        'time': time.time() - start_time,
+        'branch_count': cell_data.branch_count,
+        'failed_branch': cell_data.failed_branch,
+        'backjumps': cell_data.backjumps,
+        'nogoods': cell_data.nogood_count,
+    })
+
+
+def _reduce_loop(cell_data: CellData) -> bool:
+    if cell_data.budget is not None:
+        cell_data.budget.step()
+    if cell_data.metrics is not None:
+        return _reduce_loop_measured(cell_data, cell_data.metrics)
+    has_changed = cell_data.a_intersection_internal()
+    has_changed = cell_data.b_intersection_target_instruction() or has_changed
+    has_changed = cell_data.d_remove_empty_possibility() or has_changed
+    has_changed = cell_data.c_remove_value_from_lines() or has_changed
+    has_changed = cell_data.e_restore_from_backup() or has_changed
+    return has_changed
+
+
+def _reduce_loop_measured(cell_data: CellData, metrics: Metrics) -> bool:
+    has_changed = False
+    for rule, reduce in (('a', cell_data.a_intersection_internal), ('b', cell_data.b_intersection_target_instruction),
+                         ('d', cell_data.d_remove_empty_possibility), ('c', cell_data.c_remove_value_from_lines),
+                         ('e', cell_data.e_restore_from_backup)):
+        candidates = _count_candidates(cell_data)
+        has_changed = metrics.measure(rule, reduce) or has_changed
+        metrics.rules[rule].pruned += max(0, candidates - _count_candidates(cell_data))
+    return has_changed
+
+
+def _count_candidates(cell_data: CellData) -> int:
+    res = 0
+    for cell in get_cells(cell_data.cell_map, cell_filter_target):
+        for sub_cell in (cell.down, cell.right):
+            if sub_cell:
+                res += len(sub_cell.possible_values_set)
+    return res
+
+
+def get_grid(cell_data: CellData) -> List[List[int]]:
+    res = []
+    for i in range(1, len(cell_data.cell_map) + 1):
+        line = []
+        for j in range(1, len(cell_data.cell_map[i]) + 1):
+            cell = cell_data.cell_map[i][j]
+            value = cell_data.cell_value(cell) if cell.type in (CellType.TARGET, CellType.FIXED) else 0
+            line.append(value if isinstance(value, int) else 0)
+        res.append(line)
+    return res
+
+
+def get_domains(cell_data: CellData) -> List[List[List[int]]]:
+    # candidates of the TARGET and FIXED cells, empty for the others
+    res = []
+    for i in range(1, len(cell_data.cell_map) + 1):
+        line = []
+        for j in range(1, len(cell_data.cell_map[i]) + 1):
+            cell = cell_data.cell_map[i][j]
+            if cell.type not in (CellType.TARGET, CellType.FIXED) or not (cell.down or cell.right):
+                line.append([])
+            elif cell_data.use_mask:
+                line.append(mask_values(_cell_mask(cell)))
+            else:
+                sets = [sub_cell.possible_values_set for sub_cell in (cell.down, cell.right) if sub_cell]
+                line.append(sorted(set(sets[0]).intersection(*sets[1:])))
+        res.append(line)
+    return res
@@ -0,0 +1,97 @@
+import os
+import struct
+from array import array
+from typing import Tuple, List
+
+from basic.mask import ALL_DIGITS, mask_values
+
+TABLE_PATH = os.path.join(os.path.dirname(__file__), 'sum_table.bin')
+TABLE_MAGIC = b'KKST'
+TABLE_VERSION = 2  # 1 also held per allowed mask digit tables, never read
+
+MAX_LENGTH = 9
+MAX_TARGET = 45
+_HEADER = struct.Struct('<4sHH')
+
+
+class SumTable(object):
+    def __init__(self, offsets: array, masks: array):
+        self.offsets = offsets  # combinations of (length, target) are masks[offsets[k]:offsets[k + 1]]
+        self.masks = masks
+        self.combinations: List[Tuple[int, ...]] = [tuple(masks[offsets[k]:offsets[k + 1]]) for k in range(len(offsets) - 1)]
+
+    def get_combinations(self, length: int, target: int) -> Tuple[int, ...]:
+        if not 1 <= length <= MAX_LENGTH or not 1 <= target <= MAX_TARGET:
+            return ()
+        return self.combinations[_key(length, target)]
+
+    def to_bytes(self) -> bytes:
+        return _HEADER.pack(TABLE_MAGIC, TABLE_VERSION, len(self.masks)) + b''.join(
+            a.tobytes() for a in (self.offsets, self.masks))
+
+
+def _key(length: int, target: int) -> int:
+    return (length - 1) * MAX_TARGET + target - 1
+
+
+def build_table() -> SumTable:
+    nb_keys = MAX_LENGTH * MAX_TARGET
+    by_key: List[List[int]] = [[] for _ in range(nb_keys)]
+    # lexicographic order of the digit lists, as the recursive search used to produce them
+    for combination in sorted(range(1, ALL_DIGITS + 1), key=mask_values):
+        digits = mask_values(combination)
+        by_key[_key(len(digits), sum(digits))].append(combination)
+
+    offsets = array('H', [0])
+    masks = array('H')
+    for combinations in by_key:
+        masks.extend(combinations)
+        offsets.append(len(masks))
+    return SumTable(offsets, masks)
+
+
+def read_table(data: bytes) -> SumTable:
+    magic, version, nb_masks = _HEADER.unpack_from(data)
+    if magic != TABLE_MAGIC or version != TABLE_VERSION:
+        raise ValueError(f'Invalid sum table [{magic}/{version}]')
+    nb_keys = MAX_LENGTH * MAX_TARGET
+    sizes = [nb_keys + 1, nb_masks]
+    arrays = []
+    position = _HEADER.size
+    for size in sizes:
+        a = array('H')
+        a.frombytes(data[position:position + 2 * size])
+        if len(a) != size:
+            raise ValueError('Truncated sum table')
+        arrays.append(a)
+        position += 2 * size
+    return SumTable(*arrays)
+
+
+def load_table(path: str = TABLE_PATH) -> SumTable:
+    try:
+        with open(path, 'rb') as f:
+            return read_table(f.read())
+    except (OSError, ValueError, struct.error):
+        pass
+
+    table = build_table()
+    # one temporary file per process, the workers of a pool may all build the table at the same time
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(table.to_bytes())
+        os.replace(tmp_path, path)
+    except OSError:
+        pass  # read-only install, keep the generated table in memory
+    return table
+
+
+sum_table = load_table()
+
+
+if __name__ == '__main__':
+    if os.path.exists(TABLE_PATH):
+        os.remove(TABLE_PATH)
+    load_table()
+    print(f'## Sum table written to {TABLE_PATH}')
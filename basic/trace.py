@@ -0,0 +1,259 @@
+import argparse
+import json
+import struct
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+TRACE_MAGIC = b'KKTR'
+TRACE_VERSION = 1
+
+# event kinds, one record each: kind, digit, depth, x, y, nanoseconds since the start of the trace
+START = 1  # a solve or a search begins, depth: choice points already made by the caller (components, session moves)
+DECIDE = 2  # digit tried on the cell x, y at this depth
+FIXPOINT = 3  # the propagation of the decision at this depth is done
+CONFLICT = 4  # the decision at this depth failed
+BACKTRACK = 5  # every value at a depth failed, depth: choice points kept
+SOLUTION = 6
+END = 7  # a solve or a search returns, digit: one of the outcomes below
+
+UNSAT = 0
+SOLVED = 1
+STOPPED = 2  # budget spent
+
+_HEADER = struct.Struct('<4sHI')  # magic, version, size of the JSON description of the puzzle that follows
+_EVENT = struct.Struct('<BBHHHQ')
+
+Event = Tuple[int, int, int, int, int, int]  # kind, digit, depth, x, y, time in ns
+
+
+class Tracer(object):
+    # set on CellData.trace: every choice of the search, 16 bytes each, kept in memory until saved
+    def __init__(self, lines: Optional[List[str]] = None):
+        self.lines = lines  # puzzle, for the replay
+        self.use_mask = True
+        self.rules: List[str] = []
+        self.data = bytearray()
+        self.start = time.perf_counter_ns()
+
+    def attach(self, cell_data):
+        from basic.cell import EXTRA_RULES
+        names = {rule: name for name, (rule, _) in EXTRA_RULES.items()}
+        self.use_mask = cell_data.use_mask
+        self.rules = [names[rule] for rule, _ in cell_data.extra_rules]
+        cell_data.trace = self
+
+    def event(self, kind: int, depth: int = 0, x: int = 0, y: int = 0, digit: int = 0):
+        self.data += _EVENT.pack(kind, digit, depth, x, y, time.perf_counter_ns() - self.start)
+
+    def events(self) -> Iterator[Event]:
+        return _EVENT.iter_unpack(self.data)
+
+    def save(self, path: str):
+        meta = json.dumps({'lines': self.lines, 'use_mask': self.use_mask, 'rules': self.rules}).encode()
+        with open(path, 'wb') as f:
+            f.write(_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, len(meta)))
+            f.write(meta)
+            f.write(self.data)
+
+    @staticmethod
+    def load(path: str) -> 'Tracer':
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, size = _HEADER.unpack_from(data)
+        if magic != TRACE_MAGIC or version != TRACE_VERSION:
+            raise ValueError(f'Invalid trace [{magic}/{version}]')
+        meta = json.loads(data[_HEADER.size:_HEADER.size + size])
+        events = data[_HEADER.size + size:]
+        if len(events) % _EVENT.size:
+            raise ValueError('Truncated trace')
+        trace = Tracer(meta['lines'])
+        trace.use_mask = meta['use_mask']
+        trace.rules = meta['rules']
+        trace.data = bytearray(events)
+        return trace
+
+
+# ##### SPANS - a decision lasts until the search comes back above its depth #####
+class Span(object):
+    def __init__(self, event: Event):
+        self.kind, self.digit, self.depth, self.x, self.y, self.start = event
+        self.propagated = self.start  # end of the propagation of the decision
+        self.end = self.start
+        self.conflict = False
+        self.children = 0  # time of the decisions below
+
+    def name(self) -> str:
+        return f'd{self.depth} [{self.x}-{self.y}]={self.digit}'
+
+
+def spans(events: Iterator[Event]) -> List[Span]:
+    res: List[Span] = []
+    stack: List[Span] = []
+    now = 0
+
+    def close(depth: int):
+        while stack and stack[-1].depth >= depth:
+            span = stack.pop()
+            span.end = now
+            if stack:
+                stack[-1].children += span.end - span.start
+
+    for event in events:
+        kind, _, depth, _, _, now = event
+        if kind == START:
+            close(0)
+        elif kind == DECIDE:
+            close(depth)
+            span = Span(event)
+            stack.append(span)
+            res.append(span)
+        elif kind in (FIXPOINT, CONFLICT) and stack and stack[-1].depth == depth:
+            stack[-1].propagated = now
+            stack[-1].conflict = kind == CONFLICT
+        elif kind == BACKTRACK:
+            close(depth)
+    close(0)
+    return res
+
+
+def breakdown(trace: Tracer) -> List[dict]:
+    # per depth: decisions, failures, time propagating, time below the decisions of that depth
+    depths: Dict[int, dict] = {}
+    for span in spans(trace.events()):
+        res = depths.setdefault(span.depth, {'depth': span.depth, 'decisions': 0, 'conflicts': 0, 'propagate': 0, 'self': 0, 'total': 0})
+        res['decisions'] += 1
+        res['conflicts'] += span.conflict
+        res['propagate'] += span.propagated - span.start
+        res['self'] += span.end - span.start - span.children
+        res['total'] += span.end - span.start
+    return [depths[k] for k in sorted(depths)]
+
+
+def print_breakdown(trace: Tracer):
+    events = list(trace.events())
+    total = events[-1][-1] if events else 0
+    print(f"## {sum(1 for e in events if e[0] == DECIDE)} decisions, {sum(1 for e in events if e[0] == BACKTRACK)} backtracks, "
+          f"{total / 1e6:.2f}ms")
+    print(f"{'depth':>5} {'decisions':>9} {'conflicts':>9} {'propagate':>11} {'self':>11} {'total':>11}")
+    for res in breakdown(trace):
+        print(f"{res['depth']:>5} {res['decisions']:>9} {res['conflicts']:>9} {res['propagate'] / 1e6:>9.2f}ms "
+              f"{res['self'] / 1e6:>9.2f}ms {res['total'] / 1e6:>9.2f}ms")
+
+
+# ##### EXPORT - Chrome trace events (chrome://tracing, Perfetto, speedscope) and folded stacks (flamegraph.pl) #####
+def to_chrome(trace: Tracer) -> dict:
+    events = []
+    for span in spans(trace.events()):
+        args = {'depth': span.depth, 'conflict': span.conflict}
+        events.append({'name': span.name(), 'ph': 'X', 'ts': span.start / 1e3, 'dur': (span.end - span.start) / 1e3,
+                       'pid': 1, 'tid': 1, 'args': args})
+        events.append({'name': 'propagate', 'ph': 'X', 'ts': span.start / 1e3, 'dur': (span.propagated - span.start) / 1e3,
+                       'pid': 1, 'tid': 1})
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def to_folded(trace: Tracer) -> List[str]:
+    # one line per decision: the decisions above it, then its own time in microseconds
+    res = []
+    path: List[str] = []
+    for span in spans(trace.events()):
+        del path[span.depth:]
+        path.extend(['?'] * (span.depth - len(path)))
+        path.append(span.name())
+        self_time = (span.end - span.start - span.children) // 1000
+        if self_time:
+            res.append(f"{';'.join(path)} {self_time}")
+    return res
+
+
+# ##### REPLAY - the search is deterministic, solving the puzzle again follows the same path #####
+def replay(trace: Tracer) -> Tuple[Tracer, Optional[int]]:
+    # new trace of the same search, index of the first event that differs (None when the path is the same)
+    from basic.budget import Budget
+    from basic.parser import parse_lines
+    from basic.solver import solve
+
+    recorded = list(trace.events())
+    decisions = sum(1 for event in recorded if event[0] == DECIDE)
+    stopped = any(event[0] == END and event[1] == STOPPED for event in recorded)
+    cell_data = parse_lines(trace.lines, trace.use_mask)
+    if trace.rules:
+        cell_data.set_rules(trace.rules)
+    new_trace = Tracer(trace.lines)
+    new_trace.attach(cell_data)
+    # a search cut by its deadline stops at the same decision
+    solve(cell_data, budget=Budget(max_nodes=decisions) if stopped else None)
+
+    if stopped:
+        # the deadline may have come in the middle of a propagation, only the decisions made are compared
+        last = max((k for k, event in enumerate(recorded) if event[0] == DECIDE), default=-1)
+        recorded = recorded[:last + 1]
+    replayed = list(new_trace.events())
+    for index, (old, new) in enumerate(zip(recorded, replayed)):
+        if old[:5] != new[:5]:
+            return new_trace, index
+    if len(replayed) < len(recorded) or (len(replayed) > len(recorded) and not stopped):
+        return new_trace, min(len(replayed), len(recorded))
+    return new_trace, None
+
+
+def record(filename: str, rules: Optional[List[str]] = None, timeout: Optional[float] = None, use_mask: bool = True) -> Tracer:
+    from basic.parser import parse_lines
+    from basic.solver import solve
+
+    with open(filename) as f:
+        lines = f.readlines()
+    cell_data = parse_lines(lines, use_mask)
+    if rules:
+        cell_data.set_rules(rules)
+    trace = Tracer(lines)
+    trace.attach(cell_data)
+    solve(cell_data, timeout=timeout)
+    return trace
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(description='Record, replay and export search traces of kakuro puzzles')
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+    record_parser = commands.add_parser('record', help='solve a puzzle and write the trace of its search')
+    record_parser.add_argument('puzzle')
+    record_parser.add_argument('trace')
+    record_parser.add_argument('-t', '--timeout', type=float, default=None, help='timeout in seconds')
+    record_parser.add_argument('--rules', nargs='*', default=[], help='optional propagation rules to enable')
+    record_parser.add_argument('--list', action='store_true', help='solve with the lists instead of the masks')
+    show_parser = commands.add_parser('show', help='per depth timings of a trace, as recorded')
+    replay_parser = commands.add_parser('replay', help='run the search of a trace again, check the path and time it here')
+    for sub_parser in (show_parser, replay_parser):
+        sub_parser.add_argument('trace')
+        sub_parser.add_argument('--chrome', help='also write the decisions as Chrome trace events (JSON)')
+        sub_parser.add_argument('--folded', help='also write the decisions as folded stacks for flamegraph.pl')
+    args = arg_parser.parse_args(argv)
+
+    if args.command == 'record':
+        trace = record(args.puzzle, args.rules, args.timeout, not args.list)
+        trace.save(args.trace)
+        print(f'## {len(trace.data) // _EVENT.size} events written to {args.trace}')
+        return 0
+
+    trace = Tracer.load(args.trace)
+    code = 0
+    if args.command == 'replay':
+        trace, index = replay(trace)
+        if index is not None:
+            print(f'## The search differs from the recording at event {index}')
+            code = 1
+        else:
+            print('## Same search path as the recording')
+    print_breakdown(trace)
+    if args.chrome:
+        with open(args.chrome, 'w') as f:
+            json.dump(to_chrome(trace), f)
+    if args.folded:
+        with open(args.folded, 'w') as f:
+            f.write('\n'.join(to_folded(trace)) + '\n')
+    return code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
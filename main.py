@@ -1,7 +1,10 @@
 # This is a sample Python script.
+import logging
+
 from basic.handle import handle
 
 # Press the green button in the gutter to run the script.
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     handle('data/normal.csv')
 
@@ -0,0 +1,50 @@
+import glob
+import os
+from typing import List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA = os.path.join(ROOT, 'data')
+TEST_DATA = os.path.join(ROOT, 'tests', 'data')
+
+
+def corpus() -> List[str]:
+    return sorted(glob.glob(os.path.join(DATA, '*.csv')))
+
+
+def test_data(name: str) -> str:
+    return os.path.join(TEST_DATA, name)
+
+
+def read_lines(filename: str) -> List[str]:
+    with open(filename) as f:
+        return f.readlines()
+
+
+def cell_mask(cell) -> int:
+    # candidates of a cell in mask mode, on both of its runs
+    from basic.mask import ALL_DIGITS
+
+    mask = ALL_DIGITS
+    for sub_cell in (cell.down, cell.right):
+        if sub_cell:
+            mask &= sub_cell.possible_mask
+    return mask
+
+
+def is_solution(filename: str, grid: List[List[int]]) -> bool:
+    # every run adds up to its target without a digit twice, the fixed digits are kept
+    from basic.cell import CellType
+    from basic.parser import parser
+
+    cell_data = parser(filename)
+    for line in cell_data.cell_map.values():
+        for cell in line.values():
+            if cell.type == CellType.FIXED and grid[cell.position.x - 1][cell.position.y - 1] != cell.down.fixed_value:
+                return False
+    for instr in cell_data.instr:
+        for run in (instr.down, instr.right):
+            if run:
+                values = [grid[c.position.x - 1][c.position.y - 1] for c in run.associated_cells]
+                if sum(values) != run.fixed_value or len(set(values)) != len(values) or not all(1 <= v <= 9 for v in values):
+                    return False
+    return True
@@ -0,0 +1,79 @@
+import contextlib
+import io
+import json
+import os
+import unittest
+from unittest import mock
+
+from basic.analysis import Difficulty, analyze
+from basic.batch import main, solve_file
+from basic.parser import parser
+from basic.solver import SolveStatus, solve
+from tests.helpers import DATA, is_solution, test_data
+
+
+class AnalysisTest(unittest.TestCase):
+    def test_trivial(self):
+        # propagation alone solves it
+        analysis = analyze(parser(os.path.join(DATA, 'normal.csv'), True))
+        self.assertEqual((analysis.difficulty, analysis.open_cells, analysis.components), (Difficulty.TRIVIAL, 0, []))
+        self.assertFalse(analysis.unsat)
+        self.assertGreater(analysis.combinations, len(analysis.runs))
+
+    def test_open(self):
+        filename = test_data('backjump.csv')
+        cell_data = parser(filename, True)
+        analysis = analyze(cell_data)
+        self.assertEqual(analysis.difficulty, Difficulty.EASY)
+        self.assertGreater(analysis.score, 0)
+        self.assertEqual(sum(analysis.components), analysis.open_cells)
+        self.assertEqual(sum(analysis.domains.values()), analysis.open_cells)
+        self.assertNotIn(1, analysis.domains)
+        data = json.loads(json.dumps(analysis.to_dict()))
+        self.assertEqual((data['difficulty'], data['open_cells']), ('easy', analysis.open_cells))
+        # the solve goes on from the propagated state
+        res = solve(cell_data)
+        self.assertEqual(res.status, SolveStatus.SOLVED)
+        self.assertTrue(is_solution(filename, res.grid))
+
+    def test_step_budget(self):
+        analysis = analyze(parser(os.path.join(DATA, 'normal.csv'), True), max_steps=1)
+        self.assertFalse(analysis.complete)
+        self.assertNotEqual(analysis.difficulty, Difficulty.TRIVIAL)
+
+    def test_lists(self):
+        self.assertRaises(ValueError, analyze, parser(os.path.join(DATA, 'normal.csv')))
+
+    def test_unsat_stays_unsat(self):
+        # the propagation refutes the puzzle, the solve that goes on from the analysis must not report it solved
+        cell_data = parser(test_data('unsat_propagation.csv'), True)
+        analysis = analyze(cell_data)
+        self.assertTrue(analysis.unsat)
+        self.assertEqual(analysis.difficulty, Difficulty.TRIVIAL)
+        self.assertEqual(solve(cell_data).status, SolveStatus.UNSAT)
+
+    def test_route(self):
+        res = solve_file(os.path.join(DATA, 'normal.csv'), route=True)
+        self.assertEqual((res['status'], res['difficulty']), ('solved', 'trivial'))
+        res = solve_file(test_data('unsat_propagation.csv'), route=True)
+        self.assertEqual((res['status'], res['difficulty']), ('unsat', 'trivial'))
+        with mock.patch('basic.analysis.HARD_SCORE', 10.0):
+            res = solve_file(test_data('backjump.csv'), route=True, defer_hard=True)
+        self.assertEqual((res['difficulty'], res['deferred']), ('hard', True))
+        self.assertNotIn('grid', res)
+
+    def test_routed_batch(self):
+        # every puzzle is answered once, the hard ones by their own pool
+        filenames = [os.path.join(DATA, 'normal.csv'), os.path.join(DATA, 'normal_3.csv'), test_data('backjump.csv')]
+        output = io.StringIO()
+        with mock.patch('basic.analysis.HARD_SCORE', 10.0), contextlib.redirect_stdout(output):
+            self.assertEqual(main(filenames + ['-w', '1', '-r', '--hard-workers', '1']), 0)
+        results = {res['file']: res for res in map(json.loads, output.getvalue().splitlines())}
+        self.assertEqual(sorted(results), sorted(filenames))
+        self.assertEqual(results[filenames[0]]['difficulty'], 'trivial')
+        for filename, res in results.items():
+            self.assertTrue(is_solution(filename, res['grid']))
+
+
+if __name__ == '__main__':
+    unittest.main()
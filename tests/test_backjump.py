@@ -0,0 +1,41 @@
+import unittest
+
+from basic.parser import parser
+from basic.solver import SolutionCount, SolveStatus, count_solutions, get_grid, solve
+from tests.helpers import is_solution, test_data
+
+
+class BackjumpTest(unittest.TestCase):
+    def test_search(self):
+        # a generated puzzle whose search fails deep under choices it does not depend on
+        filename = test_data('backjump.csv')
+        cell_data = parser(filename, True)
+        self.assertTrue(cell_data.search())
+        self.assertTrue(is_solution(filename, get_grid(cell_data)))
+        self.assertGreater(cell_data.backjumps, 0)
+        self.assertGreater(cell_data.nogood_count, 0)
+        res = solve(filename)
+        self.assertEqual(res.status, SolveStatus.SOLVED)
+        self.assertTrue(is_solution(filename, res.grid))
+        self.assertIn('backjumps', res.stats)
+        self.assertIn('nogoods', res.stats)
+
+    def test_count(self):
+        # the nogoods learned before the first solution do not hide a second one
+        self.assertEqual(count_solutions(parser(test_data('backjump.csv'), True)).outcome, SolutionCount.UNIQUE)
+        filename = test_data('split_nogoods.csv')
+        res = count_solutions(parser(filename, True), 100)
+        self.assertEqual(res.outcome, SolutionCount.MULTIPLE)
+        for grid in res.solutions:
+            self.assertTrue(is_solution(filename, grid))
+        self.assertEqual(len({str(grid) for grid in res.solutions}), len(res.solutions))
+
+    def test_lists(self):
+        for name in ('backjump.csv', 'split_nogoods.csv'):
+            res = solve(test_data(name), False)
+            self.assertEqual(res.status, SolveStatus.SOLVED)
+            self.assertTrue(is_solution(test_data(name), res.grid))
+
+
+if __name__ == '__main__':
+    unittest.main()
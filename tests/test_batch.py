@@ -0,0 +1,80 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from basic.batch import count_file, list_puzzles, main, solve_file
+from tests.helpers import DATA, corpus, is_solution, test_data
+
+
+class BatchTest(unittest.TestCase):
+    def test_list_puzzles(self):
+        easy = os.path.join(DATA, 'easy.csv')
+        self.assertEqual(list_puzzles([DATA, os.path.join(DATA, 'normal*.csv'), easy]), corpus())
+
+    def test_solve_file(self):
+        filename = os.path.join(DATA, 'normal_3.csv')
+        res = solve_file(filename)
+        self.assertEqual(res['status'], 'solved')
+        self.assertTrue(is_solution(filename, res['grid']))
+        self.assertEqual(solve_file(test_data('unsat_runs.csv'))['status'], 'unsat')
+        self.assertTrue(solve_file(os.path.join(DATA, 'missing.csv'))['status'].startswith('error'))
+
+    def test_main(self):
+        # one JSON line per puzzle, the exit code says whether one of them was not solved
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(main([DATA, '-w', '2']), 0)
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(sorted(res['file'] for res in results), corpus())
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(main([test_data('unsat_runs.csv'), '-w', '1']), 1)
+
+    def test_main_cache(self):
+        # the second run answers every puzzle from the cache
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'solutions.db')
+            for cached in (False, True):
+                output = io.StringIO()
+                with contextlib.redirect_stdout(output):
+                    self.assertEqual(main([DATA, '-w', '2', '-c', path]), 0)
+                results = [json.loads(line) for line in output.getvalue().splitlines()]
+                self.assertEqual(len(results), len(corpus()))
+                self.assertEqual([res.get('cached', False) for res in results], [cached] * len(results))
+
+    def test_count(self):
+        self.assertEqual(count_file(os.path.join(DATA, 'easy.csv'))['outcome'], 'unique')
+        self.assertEqual(count_file(os.path.join(DATA, 'test_2_3.csv'), 10)['count'], 6)
+        self.assertTrue(count_file(os.path.join(DATA, 'missing.csv'))['outcome'].startswith('error'))
+        # exit code 1 as soon as one puzzle is not unique
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(main([os.path.join(DATA, 'easy.csv'), '-w', '1', '-u', '2']), 0)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(main([DATA, '-w', '2', '-u', '2']), 1)
+        outcomes = {os.path.basename(res['file']): res['outcome'] for res in map(json.loads, output.getvalue().splitlines())}
+        self.assertEqual((outcomes['normal.csv'], outcomes['test_3_3.csv']), ('unique', 'multiple'))
+
+    def test_budget(self):
+        res = solve_file(test_data('split_nogoods.csv'), max_nodes=1)
+        self.assertEqual((res['status'], res['budget']['exhausted']), ('limit', 'nodes'))
+        self.assertTrue(res['domains'])
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(main([test_data('split_nogoods.csv'), '-w', '1', '-n', '1']), 1)
+        self.assertEqual(json.loads(output.getvalue())['status'], 'limit')
+
+    def test_count_budget(self):
+        res = count_file(test_data('split_nogoods.csv'), 100, max_nodes=1)
+        self.assertEqual((res['outcome'], res['budget']['exhausted']), ('limit', 'nodes'))
+        self.assertEqual(count_file(test_data('split_nogoods.csv'), 100, timeout=0.0)['outcome'], 'timeout')
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(main([test_data('split_nogoods.csv'), '-w', '1', '-u', '100', '-n', '1']), 1)
+        self.assertEqual(json.loads(output.getvalue())['outcome'], 'limit')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from basic.bench import bench_puzzle, compare, generate_puzzles, main
+from basic.solver import SolveStatus, solve
+from tests.helpers import DATA, is_solution, read_lines, test_data
+
+
+class BenchTest(unittest.TestCase):
+    def test_generated(self):
+        # the same seed writes the same grids, a baseline compares them from one run to the next
+        with tempfile.TemporaryDirectory() as first, tempfile.TemporaryDirectory() as second:
+            filenames = generate_puzzles([8, 12], 0, first)
+            self.assertEqual([os.path.basename(f) for f in filenames], ['generated_8x8_0.csv', 'generated_12x12_0.csv'])
+            for filename, again in zip(filenames, generate_puzzles([8, 12], 0, second)):
+                self.assertEqual(read_lines(filename), read_lines(again))
+                res = solve(filename)
+                self.assertEqual(res.status, SolveStatus.SOLVED)
+                self.assertTrue(is_solution(filename, res.grid))
+
+    def test_lists(self):
+        for filename in (os.path.join(DATA, 'normal_3.csv'), test_data('backjump.csv')):
+            res = bench_puzzle(filename, 1, metrics=True, use_mask=False)
+            self.assertEqual(res['status'], 'solved')
+            self.assertGreater(res['bytes_per_cell'], bench_puzzle(filename, 1)['bytes_per_cell'])
+            self.assertGreater(res['metrics']['rules']['a_intersection_internal']['calls'], 0)
+        self.assertEqual(bench_puzzle(test_data('unsat_runs.csv'), 1, use_mask=False)['status'], 'unsat')
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(main([os.path.join(DATA, 'normal_3.csv'), '-r', '1', '--sizes', '8', '--list']), 0)
+        self.assertIn('generated_8x8_0.csv', output.getvalue())
+        with contextlib.redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+            main(['--list', '--rules', 'sum_bounds'])
+
+    def test_bench_and_compare(self):
+        res = bench_puzzle(os.path.join(DATA, 'normal_3.csv'), 2)
+        self.assertEqual(res['status'], 'solved')
+        self.assertGreater(res['peak_memory'], 0)
+        self.assertGreater(res['bytes_per_cell'], 0)
+        self.assertAlmostEqual(res['total_time'], res['parse_time'] + res['propagate_time'] + res['search_time'])
+        self.assertEqual(compare([res], [res], 0.2, 0.001), [])
+        slower = dict(res, total_time=res['total_time'] * 2 + 1, peak_memory=res['peak_memory'] * 2)
+        self.assertEqual(len(compare([slower], [res], 0.2, 0.001)), 2)
+        self.assertEqual(compare([slower], [res], 0.2, 10), [f"normal_3.csv: memory {res['peak_memory']} -> {slower['peak_memory']}"])
+        bigger = dict(res, bytes_per_cell=res['bytes_per_cell'] * 2)
+        self.assertEqual(len(compare([bigger], [res], 0.2, 10)), 1)
+        # baselines from before the column are still compared
+        self.assertEqual(compare([bigger], [{k: v for k, v in res.items() if k != 'bytes_per_cell'}], 0.2, 10), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
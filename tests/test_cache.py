@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+
+from basic.cache import SolutionCache, puzzle_key
+from basic.parser import parse_lines
+from basic.solver import SolveStatus, solve
+from tests.helpers import DATA, is_solution, read_lines
+
+
+class KeyTest(unittest.TestCase):
+    def test_layout_noise(self):
+        lines = read_lines(os.path.join(DATA, 'normal_3.csv'))
+        key = puzzle_key(parse_lines(lines, True))
+        # blank fields on the clue row and blank lines are outside any run
+        self.assertEqual(puzzle_key(parse_lines([lines[0].rstrip('\n') + ',,\n'] + lines[1:] + ['\n'], True)), key)
+        # a blank after an open run is one more target cell
+        self.assertNotEqual(puzzle_key(parse_lines(lines[:1] + [lines[1].rstrip('\n') + ',\n'] + lines[2:], True)), key)
+        self.assertNotEqual(puzzle_key(parse_lines(read_lines(os.path.join(DATA, 'normal_4.csv')), True)), key)
+
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'solutions.db')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_hit(self):
+        filename = os.path.join(DATA, 'normal_3.csv')
+        cache = SolutionCache(self.path)
+        first = cache.solve(filename)
+        second = cache.solve(filename)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(second.status, SolveStatus.SOLVED)
+        self.assertEqual(second.grid, first.grid)
+        self.assertEqual(second.grid, solve(filename).grid)
+        cache.close()
+
+        # a new cache on the same file answers from SQLite
+        cache = SolutionCache(self.path)
+        self.assertEqual(cache.solve(filename).grid, first.grid)
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+        cache.close()
+
+    def test_key_per_engine_and_rules(self):
+        # a result found by one engine or set of rules is not served to another one
+        filename = os.path.join(DATA, 'normal_2.csv')
+        cache = SolutionCache(self.path)
+        for use_mask, rules in ((False, None), (True, None), (True, ['hidden_single']), (True, ['hidden_single', 'sum_bounds'])):
+            with self.subTest(use_mask=use_mask, rules=rules):
+                res = cache.solve(filename, use_mask, rules=rules)
+                self.assertNotIn('cached', res.stats)
+                again = cache.solve(filename, use_mask, rules=list(reversed(rules or [])))
+                self.assertTrue(again.stats['cached'])
+                self.assertEqual(again.grid, res.grid)
+                self.assertTrue(is_solution(filename, again.grid))
+        self.assertEqual((cache.hits, cache.misses), (4, 4))
+        cache.close()
+
+    def test_timeout_not_cached(self):
+        cache = SolutionCache(None)
+        cache.put('key', {'status': SolveStatus.TIMEOUT.name.lower(), 'grid': None})
+        self.assertIsNone(cache.get('key'))
+
+    def test_eviction(self):
+        cache = SolutionCache(self.path, max_bytes=1)
+        cache.put('first', {'status': 'solved', 'grid': [[1]]})
+        cache.put('second', {'status': 'solved', 'grid': [[2]]})
+        rows = cache.db.execute('SELECT key FROM solution').fetchall()
+        self.assertEqual(rows, [])
+        cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+
+from basic.cell import CellDirection, CellType
+from basic.corpus import decode, encode_lines
+from basic.parser import parser
+from basic.solver import solve
+from basic.sum_table import sum_table
+from tests.helpers import DATA, read_lines
+
+
+class ParseTest(unittest.TestCase):
+    def test_zero_means_no_run(self):
+        # d0 / b0: an instruction cell without a run in that direction, the same puzzle as without it
+        filename = os.path.join(DATA, 'easy.csv')
+        lines = read_lines(filename)
+        with tempfile.TemporaryDirectory() as directory:
+            blocked = os.path.join(directory, 'blocked.csv')
+            with open(blocked, 'w') as f:
+                f.writelines(['d0;b0,b9;d0,b12\n'] + lines[1:])
+            cell_data = parser(blocked, True)
+        corner = cell_data.cell_map[1][1]
+        self.assertIsNone(corner.right)
+        self.assertIsNone(corner.down)
+        self.assertIsNone(cell_data.cell_map[1][2].right)
+        self.assertEqual(cell_data.cell_map[1][2].down.fixed_value, 9)
+        self.assertEqual(solve(cell_data).grid, solve(filename).grid)
+
+
+class ModelTest(unittest.TestCase):
+    def test_shared_combinations(self):
+        # in mask mode a run and all its open cells hold one tuple, the sum table one when no digit is given
+        cell_data = parser(os.path.join(DATA, 'normal_3.csv'), True)
+        shared = 0
+        for instr in cell_data.instr:
+            for run, direction in ((instr.right, CellDirection.RIGHT), (instr.down, CellDirection.DOWN)):
+                if run is None:
+                    continue
+                sub_cells = [cell.get_sub_cell(direction) for cell in run.associated_cells if cell.type != CellType.FIXED]
+                self.assertIsInstance(run.possible_masks, tuple)
+                self.assertEqual(len({id(sub_cell.possible_masks) for sub_cell in sub_cells}), 1)
+                if len(sub_cells) == len(run.associated_cells):
+                    self.assertIs(run.possible_masks, sum_table.get_combinations(len(sub_cells), run.fixed_value))
+                    self.assertIs(sub_cells[0].possible_masks, run.possible_masks)
+                    shared += 1
+        self.assertGreater(shared, 0)
+
+    def test_mask_cells_without_lists(self):
+        # the mask engine never reads the value lists, every SubCell shares the empty tuple
+        filename = os.path.join(DATA, 'normal_3.csv')
+        for cell_data in (parser(filename, True), decode(encode_lines(read_lines(filename)), True)):
+            sub_cells = [sub_cell for line in cell_data.cell_map.values() for cell in line.values()
+                         for sub_cell in (cell.down, cell.right) if sub_cell]
+            self.assertTrue(all(s.possible_values == () and s.possible_values_backup == () for s in sub_cells))
+        list_data = parser(filename)
+        self.assertTrue(any(cell.down.possible_values for line in list_data.cell_map.values() for cell in line.values() if cell.down))
+
+    def test_slots(self):
+        cell_data = parser(os.path.join(DATA, 'easy.csv'), True)
+        cell = cell_data.cell_map[2][2]
+        for obj in (cell, cell.position, cell.right):
+            self.assertFalse(hasattr(obj, '__dict__'), type(obj).__name__)
+
+    def test_identity(self):
+        # cells compare and hash on their position
+        first = parser(os.path.join(DATA, 'normal_3.csv'), True).cell_map
+        second = parser(os.path.join(DATA, 'normal_3.csv'), False).cell_map
+        self.assertEqual(first[2][3], second[2][3])
+        self.assertEqual(hash(first[2][3]), hash(second[2][3]))
+        self.assertNotEqual(first[2][3], first[3][2])
+        self.assertEqual(len({cell for line in first.values() for cell in line.values()}), sum(len(line) for line in first.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
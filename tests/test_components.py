@@ -0,0 +1,48 @@
+import os
+import unittest
+
+from basic.components import articulation_cells, components, search_components, solve_parallel_components
+from basic.parser import parse_lines, parser
+from basic.solver import SolveStatus, get_grid
+from tests.helpers import corpus, is_solution, read_lines, test_data
+
+# a row run and a column run crossing at [3-3], which is the only cell linking them
+CROSS = ['x,x,b15,x,x\n', 'x,x,,x,x\n', 'd15,,,,d0\n', 'x,x,,x,x\n']
+
+
+class ComponentsTest(unittest.TestCase):
+    def test_components(self):
+        cell_data = parse_lines([line.rstrip('\n') + ',' + line for line in CROSS], True)
+        cell_data.propagate_to_fixpoint()
+        parts = components(cell_data)
+        self.assertEqual(sorted(sorted(part.positions()) for part in parts),
+                         [[(2, 3), (3, 2), (3, 3), (3, 4), (4, 3)], [(2, 8), (3, 7), (3, 8), (3, 9), (4, 8)]])
+        for part in parts:
+            self.assertEqual(len(part.runs), 2)
+
+    def test_articulation_cells(self):
+        cell_data = parse_lines(CROSS, True)
+        cell_data.propagate_to_fixpoint()
+        parts = components(cell_data)
+        self.assertEqual(len(parts), 1)
+        self.assertEqual([(cell.position.x, cell.position.y) for cell in articulation_cells(parts[0])], [(3, 3)])
+        # in a full 2x2 block every cell is on a cycle
+        cell_data = parse_lines([',b10,b10\n', 'd10,,\n', 'd10,,\n'], True)
+        cell_data.propagate_to_fixpoint()
+        self.assertEqual([articulation_cells(part) for part in components(cell_data)], [[]])
+
+    def test_parallel(self):
+        # the components solved by the workers give the grid of the serial search
+        for filename in corpus() + [test_data('split_nogoods.csv'), test_data('backjump.csv'), test_data('unsat_runs.csv')]:
+            with self.subTest(file=os.path.basename(filename)):
+                cell_data = parser(filename, True)
+                solved = search_components(cell_data)
+                res = solve_parallel_components(read_lines(filename), 2)
+                self.assertEqual(res.status, SolveStatus.SOLVED if solved else SolveStatus.UNSAT)
+                if solved:
+                    self.assertEqual(res.grid, get_grid(cell_data))
+                    self.assertTrue(is_solution(filename, res.grid))
+
+
+if __name__ == '__main__':
+    unittest.main()
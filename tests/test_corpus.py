@@ -0,0 +1,64 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from basic.cache import puzzle_key
+from basic.corpus import Corpus, CorpusWriter, main
+from basic.parser import parser
+from basic.solver import SolveStatus, solve
+from tests.helpers import corpus, is_solution, test_data
+
+
+class CorpusTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'puzzles.kkc')
+        self.filenames = corpus() + [test_data('unsat_runs.csv')]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        with CorpusWriter(self.path) as writer:
+            for filename in self.filenames:
+                writer.add_file(filename)
+        for use_mask in (True, False):
+            with Corpus(self.path, use_mask) as puzzles:
+                self.assertEqual(len(puzzles), len(self.filenames))
+                for filename, cell_data in zip(self.filenames, puzzles):
+                    with self.subTest(file=os.path.basename(filename), use_mask=use_mask):
+                        self.assertEqual(cell_data.use_mask, use_mask)
+                        self.assertEqual(puzzle_key(cell_data), puzzle_key(parser(filename, use_mask)))
+                        res = solve(cell_data, use_mask)
+                        self.assertEqual(res.status, solve(filename, use_mask).status)
+                        if res.status == SolveStatus.SOLVED:
+                            self.assertTrue(is_solution(filename, res.grid))
+                self.assertRaises(IndexError, puzzles.__getitem__, len(self.filenames))
+
+    def test_invalid(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'KKST' + bytes(60))
+        self.assertRaises(ValueError, Corpus, self.path)
+        # nothing is left behind when the writer fails
+        with self.assertRaises(ValueError):
+            with CorpusWriter(self.path) as writer:
+                raise ValueError()
+        self.assertEqual(os.listdir(self.directory.name), ['puzzles.kkc'])
+
+    def test_main(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(main(['pack', self.path] + self.filenames[:-1]), 0)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(main(['solve', self.path, '-w', '2', '--chunk', '3']), 0)
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(sorted(res['index'] for res in results), list(range(len(self.filenames) - 1)))
+        for res in results:
+            self.assertTrue(is_solution(self.filenames[res['index']], res['grid']))
+
+
+if __name__ == '__main__':
+    unittest.main()
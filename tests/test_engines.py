@@ -0,0 +1,36 @@
+import os
+import unittest
+from unittest import mock
+
+from basic import np_engine
+from basic.solver import SolveStatus, solve
+from tests.helpers import corpus, is_solution, test_data
+
+
+class EnginesTest(unittest.TestCase):
+    def test_modes_agree(self):
+        # the lists and the masks: same status, each one a valid grid
+        for filename in corpus() + [test_data('unsat_runs.csv'), test_data('unsat_propagation.csv')]:
+            with self.subTest(file=os.path.basename(filename)):
+                results = [solve(filename, use_mask) for use_mask in (False, True)]
+                self.assertEqual(results[0].status, results[1].status)
+                for res in results:
+                    if res.status == SolveStatus.SOLVED:
+                        self.assertTrue(is_solution(filename, res.grid))
+
+    @unittest.skipIf(np_engine.np is None, 'numpy is not installed')
+    def test_numpy(self):
+        for filename in corpus() + [test_data('unsat_runs.csv'), test_data('unsat_propagation.csv')]:
+            with self.subTest(file=os.path.basename(filename)):
+                res = solve(filename, use_numpy=True)
+                self.assertEqual(res.status, solve(filename).status)
+                if res.status == SolveStatus.SOLVED:
+                    self.assertTrue(is_solution(filename, res.grid))
+
+    def test_numpy_missing(self):
+        with mock.patch.object(np_engine, 'np', None):
+            self.assertRaises(ImportError, solve, corpus()[0], use_numpy=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
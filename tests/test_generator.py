@@ -0,0 +1,57 @@
+import unittest
+
+from basic.budget import Budget, SearchLimit
+from basic.generator import GeneratorError, generate
+from basic.parser import parse_lines
+from basic.solver import SolveStatus, solve
+from tests.helpers import corpus, read_lines
+
+
+def count_solutions(csv: str, limit: int = 2) -> int:
+    cell_data = parse_lines(csv.splitlines(), True)
+    found = []
+
+    def on_solution() -> bool:
+        found.append(True)
+        return len(found) >= limit
+
+    cell_data.search(on_solution)
+    return len(found)
+
+
+class GeneratorTest(unittest.TestCase):
+    def test_same_seed(self):
+        self.assertEqual(generate(9, 9, seed=7), generate(9, 9, seed=7))
+        self.assertNotEqual(generate(9, 9, seed=7), generate(9, 9, seed=8))
+
+    def test_unique(self):
+        for seed in range(5):
+            csv = generate(8, 10, seed=seed, max_run=6)
+            self.assertEqual(count_solutions(csv), 1, seed)
+            self.assertEqual(solve(parse_lines(csv.splitlines(), True)).status, SolveStatus.SOLVED)
+
+    def test_run_lengths(self):
+        csv = generate(12, 12, seed=1, max_run=3)
+        for line in csv.splitlines():
+            for run in ''.join('o' if c == '' or c.isdigit() else '.' for c in line.split(',')).split('.'):
+                self.assertLessEqual(len(run), 3)
+
+    def test_bad_size(self):
+        self.assertRaises(GeneratorError, generate, 2, 9)
+        self.assertRaises(GeneratorError, generate, 9, 51)
+        self.assertRaises(GeneratorError, generate, 9, 9, max_run=10)
+
+
+class SearchTest(unittest.TestCase):
+    def test_parse_lines(self):
+        for filename in corpus():
+            self.assertEqual(solve(parse_lines(read_lines(filename), True)).grid, solve(filename).grid)
+
+    def test_max_nodes(self):
+        cell_data = parse_lines([',b3,b5,b7', 'd7,x,x,x', 'd8,x,x,x'], True)
+        cell_data.budget = Budget(max_nodes=0)
+        self.assertRaises(SearchLimit, cell_data.search, lambda: False)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,25 @@
+import unittest
+
+from basic.mask import (ALL_DIGITS, mask_is_single, mask_lowest, mask_size, mask_value, mask_values, to_mask,
+                        union_masks)
+
+
+class MaskTest(unittest.TestCase):
+    def test_round_trip(self):
+        for mask in range(ALL_DIGITS + 1):
+            values = mask_values(mask)
+            self.assertEqual(to_mask(values), mask)
+            self.assertEqual(mask_size(mask), len(values))
+            self.assertEqual(mask_is_single(mask), len(values) == 1)
+            if values:
+                self.assertEqual(mask_lowest(mask), 1 << (values[0] - 1))
+
+    def test_single_digit(self):
+        for digit in range(1, 10):
+            self.assertEqual(mask_value(to_mask([digit])), digit)
+        self.assertEqual(union_masks([to_mask([1, 2]), to_mask([2, 9])]), to_mask([1, 2, 9]))
+        self.assertEqual(union_masks([]), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import json
+import os
+import unittest
+
+from basic.metrics import RULES
+from basic.solver import SolveStatus, solve
+from tests.helpers import DATA
+
+KEYS = {'calls', 'pruned', 'combinations', 'time'}
+
+
+class MetricsTest(unittest.TestCase):
+    def test_counters(self):
+        filename = os.path.join(DATA, 'normal_2.csv')
+        for use_mask in (True, False):
+            res = solve(filename, use_mask, metrics=True)
+            self.assertEqual(res.status, SolveStatus.SOLVED)
+            self.assertEqual(res.grid, solve(filename, use_mask).grid)
+            metrics = res.stats['metrics']
+            self.assertEqual(set(metrics), {'rules', 'max_depth', 'peak_open_branches', 'restores'})
+            self.assertEqual(set(metrics['rules']), set(RULES.values()))
+            for rule in metrics['rules'].values():
+                self.assertEqual(set(rule), KEYS)
+            for name in ('a_intersection_internal', 'c_remove_value_from_lines', 'd_remove_empty_possibility'):
+                self.assertGreater(metrics['rules'][name]['calls'], 0, name)
+                self.assertGreater(metrics['rules'][name]['pruned'], 0, name)
+                self.assertGreater(metrics['rules'][name]['time'], 0, name)
+            self.assertGreater(metrics['max_depth'], 0)
+            self.assertGreater(metrics['peak_open_branches'], 0)
+            self.assertEqual(json.loads(json.dumps(res.to_dict()))['metrics'], metrics)
+        # in mask mode D removes the run combinations the other rules emptied
+        self.assertGreater(solve(filename, metrics=True).stats['metrics']['rules']['d_remove_empty_possibility']['combinations'], 0)
+
+    def test_disabled(self):
+        res = solve(os.path.join(DATA, 'normal_2.csv'))
+        self.assertNotIn('metrics', res.stats)
+        self.assertIsNone(res.cell_data.metrics)
+
+
+if __name__ == '__main__':
+    unittest.main()
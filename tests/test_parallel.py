@@ -0,0 +1,58 @@
+import os
+import threading
+import unittest
+
+from basic import parallel
+from basic.parallel import solve_parallel, split
+from basic.parser import parse_lines, parser
+from basic.solver import SolveStatus, get_grid
+from tests.helpers import DATA, TEST_DATA, corpus, is_solution, read_lines, test_data
+
+
+class ParallelTest(unittest.TestCase):
+    def test_corpus(self):
+        for filename in corpus():
+            res = solve_parallel(filename, 2, 4)
+            self.assertEqual(res.status, SolveStatus.SOLVED, filename)
+            self.assertTrue(is_solution(filename, res.grid), filename)
+
+    def test_unsat(self):
+        self.assertEqual(solve_parallel(os.path.join(TEST_DATA, 'unsat_runs.csv'), 2).status, SolveStatus.UNSAT)
+
+    def test_split(self):
+        # the subproblems restore on a fresh parse and share the 6 solutions of the puzzle between them
+        filename = os.path.join(DATA, 'test_3_3.csv')
+        tasks, solution = split(parser(filename, True), 4)
+        self.assertIsNone(solution)
+        self.assertGreaterEqual(len(tasks), 4)
+        found = []
+        for data in tasks:
+            cell_data = parser(filename, True)
+            cell_data.restore(data)
+            self.assertEqual(cell_data.snapshot(), data)
+            cell_data.search(lambda: found.append(get_grid(cell_data)) and False)
+        self.assertEqual(len(found), 6)
+        self.assertEqual(len({str(grid) for grid in found}), 6)
+        for grid in found:
+            self.assertTrue(is_solution(filename, grid))
+
+    def test_worker_reused(self):
+        # one CellData per worker solves every subproblem, nothing learned on one may leak into the next
+        lines = read_lines(test_data('split_nogoods.csv'))
+        tasks, _ = split(parse_lines(lines, True), 64)
+        self.assertTrue(tasks)
+        parallel._init_worker(lines, threading.Event())
+        for data in tasks:
+            fresh = parse_lines(lines, True)
+            fresh.restore(data)
+            self.assertEqual(parallel._solve_task(data)[0] is not None, fresh.search())
+
+    def test_split_nogoods(self):
+        filename = test_data('split_nogoods.csv')
+        res = solve_parallel(filename, 1, 16)
+        self.assertEqual(res.status, SolveStatus.SOLVED)
+        self.assertTrue(is_solution(filename, res.grid))
+
+
+if __name__ == '__main__':
+    unittest.main()
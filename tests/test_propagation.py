@@ -0,0 +1,44 @@
+import os
+import unittest
+
+from basic.cell import CellType
+from basic.mask import mask_values
+from basic.parser import parser
+from basic.solver import SolveStatus, solve
+from tests.helpers import cell_mask, corpus, test_data
+
+
+class PropagationTest(unittest.TestCase):
+    def test_keeps_the_solution(self):
+        # the worklist only removes digits that no solution uses
+        for filename in corpus():
+            res = solve(filename, False)
+            if res.status != SolveStatus.SOLVED:
+                continue
+            grid = res.grid
+            with self.subTest(file=os.path.basename(filename)):
+                cell_data = parser(filename, True)
+                cell_data.propagate_to_fixpoint()
+                self.assertFalse(cell_data.queue)
+                for x, line in cell_data.cell_map.items():
+                    for y, cell in line.items():
+                        if cell.type == CellType.TARGET:
+                            digits = mask_values(cell_mask(cell))
+                            self.assertIn(grid[x - 1][y - 1], digits)
+
+    def test_fixpoint(self):
+        cell_data = parser(corpus()[0], True)
+        self.assertTrue(cell_data.propagate_to_fixpoint())
+        self.assertFalse(cell_data.propagate_to_fixpoint())
+        cell_data.schedule_all()
+        self.assertFalse(cell_data.propagate_to_fixpoint())
+
+    def test_conflict(self):
+        # the top right cell needs a 1 or a 2 for the across run 3 and an 8 or a 9 for the down run 17
+        cell_data = parser(test_data('unsat_runs.csv'), True)
+        cell_data.propagate_to_fixpoint()
+        self.assertTrue(cell_data.conflict)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import unittest
+
+from basic.cell import EXTRA_RULES
+from basic.parser import parse_lines, parser
+from basic.solver import SolveStatus, count_solutions, solve
+from tests.helpers import DATA, corpus, is_solution, read_lines, test_data
+from tests.test_solver import SMALL
+
+RULE_SETS = [[name] for name in EXTRA_RULES] + [list(EXTRA_RULES)]
+
+
+class RulesTest(unittest.TestCase):
+    def test_solve(self):
+        for filename in corpus() + [test_data('unsat_runs.csv')]:
+            status = solve(filename).status
+            for rules in RULE_SETS:
+                with self.subTest(file=os.path.basename(filename), rules=rules):
+                    res = solve(filename, rules=rules)
+                    self.assertEqual(res.status, status)
+                    if res.status == SolveStatus.SOLVED:
+                        self.assertTrue(is_solution(filename, res.grid))
+
+    def test_no_solution_lost(self):
+        # the rules only prune, every solution is still counted
+        puzzles = [read_lines(os.path.join(DATA, name)) for name in ('test_2_3.csv', 'test_3_3.csv', 'normal_2.csv')] + SMALL
+        for lines in puzzles:
+            expected = sorted(count_solutions(parse_lines(lines, True), 100).solutions)
+            for rules in RULE_SETS:
+                with self.subTest(puzzle=lines[0].strip(), rules=rules):
+                    cell_data = parse_lines(lines, True)
+                    cell_data.set_rules(rules)
+                    self.assertEqual(sorted(count_solutions(cell_data, 100).solutions), expected)
+
+    def test_metrics(self):
+        res = solve(os.path.join(DATA, 'normal_3.csv'), rules=list(EXTRA_RULES), metrics=True)
+        rules = res.stats['metrics']['rules']
+        for name in ('f_hidden_single', 'g_naked_subset', 'h_sum_bounds'):
+            self.assertGreater(rules[name]['calls'], 0, name)
+        self.assertGreater(rules['f_hidden_single']['pruned'], 0)
+        self.assertGreater(rules['f_hidden_single']['combinations'], 0)
+        self.assertGreater(rules['h_sum_bounds']['pruned'], 0)
+        # off by default
+        rules = solve(os.path.join(DATA, 'normal_3.csv'), metrics=True).stats['metrics']['rules']
+        self.assertEqual([rules[name]['calls'] for name in ('f_hidden_single', 'g_naked_subset', 'h_sum_bounds')], [0, 0, 0])
+
+    def test_unknown(self):
+        self.assertRaises(ValueError, parser(os.path.join(DATA, 'easy.csv'), True).set_rules, ['hidden_single', 'x_wing'])
+
+    def test_lists(self):
+        # the list engine never runs the extra rules, asking for them is an error rather than a no-op
+        filename = os.path.join(DATA, 'easy.csv')
+        self.assertRaises(ValueError, solve, filename, False, rules=['hidden_single'])
+        self.assertRaises(ValueError, parser(filename).set_rules, ['sum_bounds'])
+        self.assertEqual(solve(filename, False, rules=[]).status, SolveStatus.SOLVED)
+
+
+if __name__ == '__main__':
+    unittest.main()
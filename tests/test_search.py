@@ -0,0 +1,64 @@
+import os
+import unittest
+
+from basic.cell import BranchIndex
+from basic.mask import mask_size
+from basic.parser import parser
+from basic.solver import get_grid
+from tests.helpers import DATA, cell_mask, corpus, is_solution, test_data
+
+
+class SearchTest(unittest.TestCase):
+    def test_corpus(self):
+        # normal_5 included, which the sweeps gave up on
+        for filename in corpus():
+            with self.subTest(file=os.path.basename(filename)):
+                cell_data = parser(filename, True)
+                self.assertTrue(cell_data.search())
+                self.assertTrue(is_solution(filename, get_grid(cell_data)))
+
+    def test_unsat(self):
+        cell_data = parser(test_data('unsat_runs.csv'), True)
+        self.assertFalse(cell_data.search())
+        self.assertFalse(cell_data.conflict)
+
+    def test_backtracks(self):
+        # the first value tried is not always the right one, the failed ones are undone
+        cell_data = parser(os.path.join(DATA, 'normal_3.csv'), True)
+        self.assertTrue(cell_data.search())
+        self.assertGreater(cell_data.branch_count, cell_data.failed_branch)
+        self.assertLessEqual(len(cell_data.trail_marks), cell_data.branch_count)
+
+    def test_reproducible(self):
+        # ties are broken on the position, two runs branch on the same cells
+        filename = os.path.join(DATA, 'normal_2.csv')
+        first, second = parser(filename, True), parser(filename, True)
+        self.assertTrue(first.search() and second.search())
+        self.assertEqual((first.branch_count, first.failed_branch), (second.branch_count, second.failed_branch))
+        self.assertEqual(get_grid(first), get_grid(second))
+
+
+class BranchIndexTest(unittest.TestCase):
+    def test_smallest_domain_first(self):
+        cell_data = parser(os.path.join(DATA, 'normal_3.csv'), True)
+        cell_data.propagate_to_fixpoint()
+        cell = BranchIndex(cell_data).pop()
+        size = min(mask_size(cell_mask(c)) for c in cell_data.active_cells())
+        self.assertEqual(mask_size(cell_mask(cell)), size)
+
+    def test_compaction(self):
+        # the stale entries pile up until the heap is rebuilt from the live ones, the choice stays the same
+        cell_data = parser(os.path.join(DATA, 'normal_3.csv'), True)
+        cell_data.propagate_to_fixpoint()
+        index = BranchIndex(cell_data)
+        cell = index.pop()
+        self.assertIsNotNone(cell)
+        live = len(index.heap)
+        stale = [(entry[0] + 1, *entry[1:]) for entry in index.heap]
+        index.heap.extend(stale * (4 * index.size // live + 2) + stale[:65])
+        self.assertIs(index.pop(), cell)
+        self.assertEqual(len(index.heap), live)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import unittest
+from typing import Awaitable, Callable
+
+from basic.service import SolverService
+from tests.helpers import DATA, is_solution, read_lines
+
+
+async def _request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, method: str, path: str, body: bytes = b'',
+                   content_type: str = 'text/csv'):
+    writer.write(f'{method} {path} HTTP/1.1\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n\r\n'.encode() + body)
+    await writer.drain()
+    code = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line == b'\r\n':
+            break
+        name, _, value = line.decode().partition(':')
+        headers[name.strip().lower()] = value.strip()
+    res = json.loads(await reader.readexactly(int(headers['content-length'])))
+    res['headers'] = headers
+    return code, res
+
+
+def _json(payload) -> dict:
+    return {'body': json.dumps(payload).encode(), 'content_type': 'application/json'}
+
+
+class ServiceTest(unittest.TestCase):
+    def _run(self, test: Callable[[SolverService, asyncio.StreamReader, asyncio.StreamWriter], Awaitable[None]], **options):
+        # one service on a free port, one connection kept alive for the whole test
+        async def run():
+            service = SolverService(**{'workers': 1, 'timeout': 30, **options})
+            await service.warm_up()  # as serve() does, the workers do not inherit the sockets
+            server = await asyncio.start_server(service.handle_client, '127.0.0.1', 0)
+            reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+            try:
+                await test(service, reader, writer)
+            finally:
+                writer.close()
+                await writer.wait_closed()
+                server.close()
+                await server.wait_closed()
+                service.close()
+
+        logging.disable(logging.CRITICAL)
+        try:
+            asyncio.run(run())
+        finally:
+            logging.disable(logging.NOTSET)
+
+    def test_solve(self):
+        filename = os.path.join(DATA, 'normal_3.csv')
+        lines = read_lines(filename)
+
+        async def test(service, reader, writer):
+            code, res = await _request(reader, writer, 'GET', '/health')
+            self.assertEqual((code, res['status']), (200, 'ok'))
+            code, res = await _request(reader, writer, 'POST', '/solve', ''.join(lines).encode())
+            self.assertEqual((code, res['status']), (200, 'solved'))
+            self.assertTrue(is_solution(filename, res['grid']))
+            # JSON with the puzzle as rows of cells
+            rows = [line.rstrip('\n').split(',') for line in lines]
+            code, res = await _request(reader, writer, 'POST', '/solve', **_json({'puzzle': rows, 'rules': ['hidden_single']}))
+            self.assertEqual(code, 200)
+            self.assertTrue(is_solution(filename, res['grid']))
+            code, res = await _request(reader, writer, 'GET', '/metrics')
+            self.assertEqual((code, res['requests'], res['solved']), (200, 2, 2))
+
+        self._run(test)
+
+    def test_bad_requests(self):
+        async def test(service, reader, writer):
+            for payload, message in ((b'{"puzzle"', 'Invalid JSON'), (b'{"rows": []}', 'Invalid JSON'),
+                                     (json.dumps({'puzzle': ',b3\nd3,x\n', 'timeout': 'soon'}).encode(), 'Invalid JSON')):
+                code, res = await _request(reader, writer, 'POST', '/solve', payload, 'application/json')
+                self.assertEqual(code, 400)
+                self.assertIn(message, res['error'])
+            code, res = await _request(reader, writer, 'POST', '/solve', **_json({'puzzle': ',b3\nd3,x\n', 'rules': ['x_wing']}))
+            self.assertEqual(code, 400)
+            self.assertTrue(res['status'].startswith('error'))
+            self.assertEqual((await _request(reader, writer, 'GET', '/solve'))[0], 405)
+            self.assertEqual((await _request(reader, writer, 'GET', '/nothing'))[0], 404)
+            code, res = await _request(reader, writer, 'GET', '/metrics')
+            self.assertEqual(res['errors'], 1)
+
+        self._run(test)
+
+    def test_count(self):
+        lines = read_lines(os.path.join(DATA, 'test_2_3.csv'))
+
+        async def test(service, reader, writer):
+            code, res = await _request(reader, writer, 'POST', '/count', ''.join(lines).encode())
+            self.assertEqual((code, res['outcome'], res['count']), (200, 'multiple', 2))
+            code, res = await _request(reader, writer, 'POST', '/count', **_json({'puzzle': ''.join(lines), 'limit': 10}))
+            self.assertEqual((code, res['outcome'], res['count']), (200, 'multiple', 6))
+            code, res = await _request(reader, writer, 'POST', '/count', ''.join(read_lines(os.path.join(DATA, 'easy.csv'))).encode())
+            self.assertEqual((code, res['outcome']), (200, 'unique'))
+
+        self._run(test)
+
+    def test_queue_full(self):
+        async def test(service, reader, writer):
+            code, res = await _request(reader, writer, 'POST', '/solve', ''.join(read_lines(os.path.join(DATA, 'easy.csv'))).encode())
+            self.assertEqual((code, res['headers']['retry-after']), (503, '1'))
+            code, res = await _request(reader, writer, 'GET', '/metrics')
+            self.assertEqual(res['rejected'], 1)
+
+        self._run(test, max_pending=0)
+
+    def test_over_budget(self):
+        # the only worker is busy, the request waits past its deadline in the queue
+        async def test(service, reader, writer):
+            busy = service.executor.submit(time.sleep, 2)
+            code, res = await _request(reader, writer, 'POST', '/solve', ''.join(read_lines(os.path.join(DATA, 'easy.csv'))).encode())
+            self.assertEqual(code, 504)
+            code, res = await _request(reader, writer, 'GET', '/metrics')
+            self.assertEqual(res['timeout'], 1)
+            busy.cancel()
+
+        self._run(test, timeout=0.1)
+
+    def test_error_answered(self):
+        # an unexpected failure while solving gives a 500 on the same connection, which stays open
+        filename = os.path.join(DATA, 'normal_3.csv')
+        body = ''.join(read_lines(filename)).encode()
+
+        async def test(service, reader, writer):
+            code, res = await _request(reader, writer, 'POST', '/solve', body)
+            self.assertEqual(code, 200)
+            self.assertTrue(is_solution(filename, res['grid']))
+            service.close()  # no pool any more
+            code, res = await _request(reader, writer, 'POST', '/solve', body)
+            self.assertEqual(code, 500)
+            self.assertIn('error', res)
+            code, res = await _request(reader, writer, 'GET', '/metrics')
+            self.assertEqual((code, res['errors']), (200, 1))
+
+        self._run(test)
+
+
+if __name__ == '__main__':
+    unittest.main()
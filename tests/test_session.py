@@ -0,0 +1,110 @@
+import unittest
+
+from basic.budget import Budget
+from basic.parser import parser
+from basic.session import Session
+from basic.solver import solve
+from tests.helpers import test_data
+
+
+class SessionTest(unittest.TestCase):
+    def setUp(self):
+        # unique solution, and propagation alone does not get there
+        self.filename = test_data('backjump.csv')
+        self.solution = solve(self.filename).grid
+        self.session = Session(parser(self.filename, True))
+        self.open = [(cell.position.x, cell.position.y) for cell in self.session._open_cells()
+                     if len(self.session.candidates(cell.position.x, cell.position.y)) > 1]
+
+    def _digit(self, x: int, y: int) -> int:
+        return self.solution[x - 1][y - 1]
+
+    def _wrong_move(self):
+        # a digit of another solution than the puzzle's, that propagation does not reject at once
+        for x, y in self.open:
+            for digit in self.session.candidates(x, y):
+                if digit != self._digit(x, y):
+                    if self.session.assign(x, y, digit):
+                        return x, y, digit
+                    self.session.revert()
+        self.fail('No wrong move accepted by propagation')
+
+    def test_assign_revert(self):
+        x, y = self.open[0]
+        before = self.session.cell_data.snapshot()
+        self.assertTrue(self.session.assign(x, y, self._digit(x, y)))
+        self.assertEqual(self.session.candidates(x, y), [self._digit(x, y)])
+        self.assertEqual(self.session.revert(), (x, y, self._digit(x, y), True))
+        self.assertEqual(self.session.cell_data.snapshot(), before)
+        self.assertIsNone(self.session.revert())
+
+    def test_conflict(self):
+        x, y = self.open[0]
+        digit = next(i for i in range(1, 10) if i not in self.session.candidates(x, y))
+        self.assertFalse(self.session.assign(x, y, digit))
+        self.assertFalse(self.session.is_consistent())
+        self.assertFalse(self.session.is_solvable())
+        self.assertIsNone(self.session.solution())
+        self.assertIsNone(self.session.next_forced())
+        self.session.revert()
+        self.assertTrue(self.session.is_consistent())
+
+    def test_unassign_replays(self):
+        moves = [(x, y, self._digit(x, y)) for x, y in self.open[:3]]
+        for move in moves:
+            self.assertTrue(self.session.assign(*move))
+        self.assertTrue(self.session.unassign(*moves[0][:2]))
+        self.assertEqual([move[:3] for move in self.session.moves], moves[1:])
+        self.assertFalse(self.session.unassign(*moves[0][:2]))
+        # same state as a session where the first move was never played
+        other = Session(parser(self.filename, True))
+        for move in moves[1:]:
+            other.assign(*move)
+        self.assertEqual(self.session.cell_data.snapshot(), other.cell_data.snapshot())
+        # assigning a cell again replaces its move
+        x, y, digit = moves[1]
+        self.session.assign(x, y, digit)
+        self.assertEqual([move[:3] for move in self.session.moves], [moves[2], moves[1]])
+
+    def test_is_solvable(self):
+        self.assertTrue(self.session.is_solvable())
+        x, y, digit = self._wrong_move()
+        before = self.session.cell_data.snapshot()
+        self.assertTrue(self.session.is_consistent())
+        self.assertFalse(self.session.is_solvable())
+        self.assertIsNone(self.session.solution())
+        # the search leaves the session as it was and forgets the nogoods it learned under the wrong move
+        self.assertEqual(self.session.cell_data.snapshot(), before)
+        self.assertEqual((len(self.session.cell_data.nogoods), self.session.cell_data.nogood_count), (0, 0))
+        self.session.revert()
+        self.assertTrue(self.session.is_solvable())
+        self.assertEqual(self.session.solution(), self.solution)
+
+    def test_budget(self):
+        before = self.session.cell_data.snapshot()
+        self.assertIsNone(self.session.is_solvable(Budget(max_nodes=0)))
+        self.assertEqual(self.session.cell_data.snapshot(), before)
+        self.assertIsNone(self.session.cell_data.budget)
+
+    def test_next_forced(self):
+        # the hints only give digits of the solution
+        moves = 0
+        forced = self.session.next_forced()
+        while forced:
+            x, y, digit = forced
+            self.assertEqual(digit, self._digit(x, y))
+            self.assertTrue(self.session.assign(x, y, digit))
+            moves += 1
+            forced = self.session.next_forced()
+        self.assertGreater(moves, len(self.open))
+        self.assertEqual(self.session.solution(), self.solution)
+
+    def test_invalid(self):
+        x, y = self.open[0]
+        self.assertRaises(ValueError, self.session.assign, x, y, 10)
+        self.assertRaises(ValueError, self.session.assign, 1, 1, 1)
+        self.assertRaises(ValueError, Session, parser(self.filename))
+
+
+if __name__ == '__main__':
+    unittest.main()
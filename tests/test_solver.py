@@ -0,0 +1,186 @@
+import os
+import threading
+import unittest
+from typing import List
+
+from basic.budget import Budget, CancelToken, SearchLimit
+from basic.cell import CellType
+from basic.parser import parse_lines, parser
+from basic.solver import SolutionCount, SolveStatus, count_solutions, get_domains, get_grid, solve
+from tests.helpers import DATA, is_solution, read_lines, test_data
+
+# small puzzles with several solutions, the brute force has to go through all of them
+SMALL = [
+    [',b3,b5,b7\n', 'd7,x,x,x\n', 'd8,x,x,x\n'],
+    [',b4,b9,b10\n', 'd9,x,x,x\n', 'd14,x,x,x\n'],
+    [',b10,b10\n', 'd10,x,x\n', 'd10,x,x\n'],
+]
+
+
+def brute_force(lines: List[str]) -> List[List[List[int]]]:
+    # every grid where each run adds up without a digit twice, nothing shared with the solver but the parser
+    cell_data = parse_lines(lines)
+    grid = [[0] * len(cell_data.cell_map[x]) for x in range(1, len(cell_data.cell_map) + 1)]
+    runs = [[(c.position.x - 1, c.position.y - 1) for c in run.associated_cells] + [run.fixed_value]
+            for instr in cell_data.instr for run in (instr.right, instr.down) if run]
+    cells = []
+    for line in cell_data.cell_map.values():
+        for cell in line.values():
+            if cell.type == CellType.FIXED:
+                grid[cell.position.x - 1][cell.position.y - 1] = cell.down.fixed_value
+            elif cell.type == CellType.TARGET:
+                cells.append((cell.position.x - 1, cell.position.y - 1))
+    res = []
+
+    def valid() -> bool:
+        for run in runs:
+            values = [grid[x][y] for x, y in run[:-1] if grid[x][y]]
+            if len(set(values)) != len(values) or sum(values) > run[-1] or (len(values) == len(run) - 1 and sum(values) != run[-1]):
+                return False
+        return True
+
+    def assign(k: int):
+        if k == len(cells):
+            res.append([list(line) for line in grid])
+            return
+        x, y = cells[k]
+        for digit in range(1, 10):
+            grid[x][y] = digit
+            if valid():
+                assign(k + 1)
+        grid[x][y] = 0
+
+    assign(0)
+    return res
+
+
+class SolveTest(unittest.TestCase):
+    def test_result(self):
+        res = solve(os.path.join(DATA, 'normal_3.csv'))
+        self.assertEqual(res.status, SolveStatus.SOLVED)
+        self.assertEqual(res.grid, get_grid(res.cell_data))
+        data = res.to_dict()
+        self.assertEqual(data['status'], 'solved')
+        self.assertEqual(data['grid'], res.grid)
+        for key in ('parse_time', 'solve_time', 'branch_count', 'failed_branch'):
+            self.assertIn(key, data)
+
+    def test_parsed_puzzle(self):
+        # a CellData already parsed is solved as is
+        filename = os.path.join(DATA, 'normal_3.csv')
+        cell_data = parser(filename, True)
+        res = solve(cell_data)
+        self.assertIs(res.cell_data, cell_data)
+        self.assertEqual(res.grid, solve(filename).grid)
+
+    def test_unsat(self):
+        res = solve(test_data('unsat_runs.csv'))
+        self.assertEqual((res.status, res.grid), (SolveStatus.UNSAT, []))
+        self.assertEqual(res.to_dict()['status'], 'unsat')
+
+    def test_unsat_fixed(self):
+        # no cell is left open, the fixed digits alone break the run
+        for use_mask in (False, True):
+            self.assertEqual(solve(test_data('unsat_propagation.csv'), use_mask).status, SolveStatus.UNSAT)
+
+    def test_count_brute_force(self):
+        puzzles = [read_lines(os.path.join(DATA, name)) for name in ('easy.csv', 'test_2_3.csv', 'test_3_3.csv')] + SMALL
+        for lines in puzzles:
+            with self.subTest(puzzle=lines[0].strip()):
+                expected = brute_force(lines)
+                res = count_solutions(parse_lines(lines, True), limit=len(expected) + 1)
+                self.assertEqual(sorted(res.solutions), sorted(expected))
+                self.assertEqual(res.outcome, SolutionCount(min(len(expected), 2)))
+
+    def test_count_limit(self):
+        lines = SMALL[2]
+        self.assertGreater(len(brute_force(lines)), 2)
+        res = count_solutions(parse_lines(lines, True), limit=2)
+        self.assertEqual((res.outcome, len(res.solutions)), (SolutionCount.MULTIPLE, 2))
+        self.assertEqual(res.to_dict()['outcome'], 'multiple')
+
+    def test_count_unsat(self):
+        res = count_solutions(test_data('unsat_runs.csv'))
+        self.assertEqual((res.outcome, res.solutions), (SolutionCount.UNSAT, []))
+
+    def test_count_max_nodes(self):
+        self.assertRaises(SearchLimit, count_solutions, parse_lines(SMALL[2], True), 100, 1)
+
+    def test_count_lists(self):
+        # the list engine has no search to go on after a solution, it must not report UNSAT
+        self.assertRaises(ValueError, count_solutions, parse_lines(SMALL[2], False))
+
+
+class BudgetTest(unittest.TestCase):
+    def test_timeout(self):
+        for use_mask in (True, False):
+            with self.subTest(use_mask=use_mask):
+                res = solve(test_data('split_nogoods.csv'), use_mask=use_mask, timeout=0.0)
+                self.assertEqual(res.status, SolveStatus.TIMEOUT)
+                self.assertEqual(res.grid, [])
+                self.assertTrue(res.domains)
+                self.assertEqual(res.to_dict()['budget']['exhausted'], 'timeout')
+
+    def test_nodes_and_steps(self):
+        res = solve(test_data('split_nogoods.csv'), budget=Budget(max_nodes=1))
+        self.assertEqual(res.status, SolveStatus.LIMIT)
+        self.assertEqual(res.stats['budget']['exhausted'], 'nodes')
+        res = solve(test_data('split_nogoods.csv'), budget=Budget(max_steps=1))
+        self.assertEqual(res.status, SolveStatus.LIMIT)
+        self.assertEqual(res.stats['budget']['exhausted'], 'steps')
+
+    def test_domains(self):
+        # stopped at the root: the domains are what propagation alone knows, the givens are single digits
+        res = solve(test_data('split_nogoods.csv'), budget=Budget(max_nodes=1))
+        for line, cells in zip(parser(test_data('split_nogoods.csv'), True).cell_map.values(), res.domains):
+            for cell, domain in zip(line.values(), cells):
+                if cell.type == CellType.FIXED:
+                    self.assertEqual(domain, [cell.down.fixed_value if cell.down else cell.right.fixed_value])
+                elif cell.type == CellType.TARGET:
+                    self.assertTrue(domain)
+                    self.assertTrue(set(domain) <= set(range(1, 10)))
+
+    def test_domains_lists(self):
+        # the list engine stops inside its branches, the domains are still the ones of the root
+        filename = test_data('backjump.csv')
+        root = solve(filename, False, budget=Budget(max_nodes=0))
+        self.assertEqual(root.stats['branch_count'], 0)
+        for max_nodes in (1, 5):
+            res = solve(filename, False, budget=Budget(max_nodes=max_nodes))
+            self.assertEqual((res.status, res.stats['branch_count']), (SolveStatus.LIMIT, max_nodes))
+            self.assertEqual(res.domains, root.domains)
+            self.assertEqual(res.cell_data.active_branch, 0)
+
+    def test_shared_sets(self):
+        # without masks the candidates of a cell may be the shared frozensets of the cell model
+        cell_data = parser(test_data('split_nogoods.csv'))
+        cell = next(cell for line in cell_data.cell_map.values() for cell in line.values() if cell.type == CellType.FIXED)
+        digit = (cell.down or cell.right).fixed_value
+        for sub_cell in (cell.down, cell.right):
+            if sub_cell:
+                sub_cell.possible_values_set = frozenset((digit,))
+        self.assertEqual(get_domains(cell_data)[cell.position.x - 1][cell.position.y - 1], [digit])
+
+    def test_enough_budget(self):
+        filename = os.path.join(DATA, 'normal_3.csv')
+        res = solve(filename, budget=Budget(timeout=60, max_nodes=10 ** 6, max_steps=10 ** 8))
+        self.assertEqual(res.status, SolveStatus.SOLVED)
+        self.assertTrue(is_solution(filename, res.grid))
+
+    def test_cancel(self):
+        for cancel in (CancelToken(), threading.Event()):
+            with self.subTest(cancel=type(cancel).__name__):
+                cancel.set() if isinstance(cancel, threading.Event) else cancel.cancel()
+                res = solve(test_data('split_nogoods.csv'), budget=Budget(cancel=cancel))
+                self.assertEqual(res.status, SolveStatus.CANCELLED)
+
+    def test_count_stopped(self):
+        # a count cut short does not mean anything, the caller gets the exception
+        with self.assertRaises(SearchLimit):
+            count_solutions(parser(test_data('split_nogoods.csv'), True), max_nodes=1)
+        with self.assertRaises(SearchLimit):
+            count_solutions(parser(test_data('split_nogoods.csv'), True), budget=Budget(timeout=0.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from itertools import combinations
+
+from basic.mask import mask_values
+from basic.sum_table import build_table, load_table, read_table
+
+
+class SumTableTest(unittest.TestCase):
+    def test_combinations(self):
+        table = build_table()
+        for length in range(1, 10):
+            for target in range(1, 46):
+                expected = [list(c) for c in combinations(range(1, 10), length) if sum(c) == target]
+                self.assertEqual([mask_values(m) for m in table.get_combinations(length, target)], expected)
+        self.assertEqual(table.get_combinations(10, 45), ())
+
+    def test_cache_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'sum_table.bin')
+            table = load_table(path)
+            self.assertEqual(os.listdir(directory), ['sum_table.bin'])
+            with open(path, 'rb') as f:
+                self.assertEqual(read_table(f.read()).combinations, table.combinations)
+            with open(path, 'wb') as f:
+                f.write(b'KKST\x01\x00')  # older or broken table: built again
+            self.assertEqual(load_table(path).combinations, table.combinations)
+
+    def test_temp_file_per_process(self):
+        # the workers of a pool may all build the table at once, each one writes its own file
+        replaced = []
+        replace = os.replace
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch('basic.sum_table.os.replace', side_effect=lambda src, dst: replaced.append(src) or replace(src, dst)):
+            path = os.path.join(directory, 'sum_table.bin')
+            load_table(path)
+            self.assertEqual(replaced, [f'{path}.{os.getpid()}.tmp'])
+            self.assertEqual(os.listdir(directory), ['sum_table.bin'])
+
+
+if __name__ == '__main__':
+    unittest.main()
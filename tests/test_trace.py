@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+
+from basic import trace
+from basic.parser import parser
+from basic.solver import SolveStatus, solve
+from tests.helpers import DATA, test_data
+
+
+class TraceTest(unittest.TestCase):
+    def test_stopped_list_solve(self):
+        # the budget stops the legacy loop, the trace ends on it instead of hiding the stop
+        cell_data = parser(os.path.join(DATA, 'normal_3.csv'))
+        tracer = trace.Tracer()
+        tracer.attach(cell_data)
+        res = solve(cell_data, use_mask=False, timeout=0.0)
+        self.assertEqual(res.status, SolveStatus.TIMEOUT)
+        last = list(tracer.events())[-1]
+        self.assertEqual(last[:2], (trace.END, trace.STOPPED))
+
+    def test_stopped_mask_solve(self):
+        tracer = trace.record(test_data('split_nogoods.csv'), timeout=0.0)
+        self.assertEqual(list(tracer.events())[-1][:2], (trace.END, trace.STOPPED))
+
+    def test_replay_same_path(self):
+        for use_mask in (True, False):
+            with self.subTest(use_mask=use_mask):
+                tracer = trace.record(test_data('split_nogoods.csv'), use_mask=use_mask)
+                self.assertTrue(any(event[0] == trace.DECIDE for event in tracer.events()))
+                with tempfile.TemporaryDirectory() as directory:
+                    path = os.path.join(directory, 'trace.ktr')
+                    tracer.save(path)
+                    loaded = trace.Tracer.load(path)
+                self.assertEqual(loaded.data, tracer.data)
+                _, index = trace.replay(loaded)
+                self.assertIsNone(index)
+
+    def test_replay_stopped(self):
+        tracer = trace.record(test_data('split_nogoods.csv'), timeout=0.0)
+        _, index = trace.replay(tracer)
+        self.assertIsNone(index)
+
+    def test_exports(self):
+        tracer = trace.record(test_data('split_nogoods.csv'))
+        decisions = sum(1 for event in tracer.events() if event[0] == trace.DECIDE)
+        chrome = trace.to_chrome(tracer)['traceEvents']
+        self.assertEqual(len(chrome), 2 * decisions)
+        self.assertTrue(all(event['dur'] >= 0 for event in chrome))
+        self.assertEqual(sum(res['decisions'] for res in trace.breakdown(tracer)), decisions)
+
+
+if __name__ == '__main__':
+    unittest.main()
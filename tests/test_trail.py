@@ -0,0 +1,62 @@
+import os
+import unittest
+
+from basic.mask import mask_lowest
+from basic.parser import parser
+from tests.helpers import DATA, cell_mask
+
+
+def _state(cell_data) -> list:
+    return [(list(sub_cell.possible_masks), sub_cell.possible_mask) for line in cell_data.cell_map.values() for cell in line.values()
+            for sub_cell in (cell.down, cell.right) if sub_cell]
+
+
+class TrailTest(unittest.TestCase):
+    def setUp(self):
+        self.cell_data = parser(os.path.join(DATA, 'normal_3.csv'), True)
+        self.cell_data.propagate_to_fixpoint()
+        self.open = self.cell_data.active_cells()
+
+    def _fix(self, cell):
+        bit = mask_lowest(cell_mask(cell))
+        for sub_cell in (cell.down, cell.right):
+            if sub_cell:
+                self.cell_data.set_masks(sub_cell, [m & bit for m in sub_cell.possible_masks], bit)
+
+    def test_undo_nested(self):
+        # each choice point rewinds only what changed after it
+        cell_data = self.cell_data
+        root = _state(cell_data)
+        cell_data.push_mark()
+        self._fix(self.open[0])
+        first = _state(cell_data)
+        cell_data.push_mark()
+        self._fix(self.open[1])
+        self._fix(self.open[2])
+        self.assertNotEqual(_state(cell_data), first)
+        cell_data.undo()
+        self.assertEqual(_state(cell_data), first)
+        cell_data.undo()
+        self.assertEqual(_state(cell_data), root)
+        self.assertFalse(cell_data.trail)
+
+    def test_saved_once_per_choice_point(self):
+        cell_data = self.cell_data
+        cell_data.push_mark()
+        sub_cell = self.open[0].down or self.open[0].right
+        masks, mask = sub_cell.possible_masks, sub_cell.possible_mask
+        self._fix(self.open[0])
+        size = len(cell_data.trail)
+        self._fix(self.open[0])
+        self.assertEqual(len(cell_data.trail), size)
+        cell_data.undo()
+        self.assertEqual((sub_cell.possible_masks, sub_cell.possible_mask), (masks, mask))
+
+    def test_no_trail_at_the_root(self):
+        # without a choice point nothing can be undone, nothing is saved
+        self._fix(self.open[0])
+        self.assertFalse(self.cell_data.trail)
+
+
+if __name__ == '__main__':
+    unittest.main()